@@ -1,9 +1,25 @@
 import gzip
+import hashlib
+import logging
+import shutil
+import zlib
+from dataclasses import dataclass
 from itertools import islice
+from pathlib import Path
 from typing import Any
 
+from gain.annotation.annotation_pipeline import AnnotationPipeline
 from django.core.files.uploadedfile import UploadedFile
 
+from web_annotation.models import BaseJob
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Rows of an input file kept as its preview, after the header line.
+HEAD_ROWS = 5
+
 
 def is_compressed_filename(path: str) -> bool:
     return path.endswith(".gz") or path.endswith(".bgz")
@@ -32,11 +48,20 @@ def extract_head(
     """Extract first n_lines rows from a file."""
     if is_compressed_filename(path):
         with gzip.open(path, "rt") as infile:
-            lines = list(islice(infile.readlines(), 0, n_lines + 1))
+            lines = list(islice(infile, n_lines + 1))
     else:
         with open(path, "rt") as infile:
-            lines = list(islice(infile.readlines(), 0, n_lines + 1))
+            lines = list(islice(infile, n_lines + 1))
+
+    return head_rows(lines, input_separator, n_lines)
+
 
+def head_rows(
+    lines: list[str],
+    input_separator: str | None,
+    n_lines: int,
+) -> list[dict[str, str]]:
+    """Split the header and first n_lines rows of a file into records."""
     if input_separator:
         col_names = lines[0].strip("\r\n").split(input_separator)
         col_values = [
@@ -89,11 +114,10 @@ def columns_file_preview(
     else:
         raw_content = infile
 
-    lines = []
-    for index, line in enumerate(raw_content.readlines()):
-        lines.append(line.decode().strip("\r\n"))
-        if index >= 20:
-            break
+    lines = [
+        line.decode().strip("\r\n")
+        for line in islice(raw_content, 21)
+    ]
 
     if separator is None:
         separator = get_separator(lines)
@@ -114,3 +138,179 @@ def columns_file_preview(
         "columns": header,
         "preview": preview,
     }
+
+
+def count_input_variants(input_path: str, annotation_type: str) -> int:
+    """Count variant lines in an annotation input file."""
+    path = Path(input_path)
+    if not path.exists():
+        return 0
+    open_fn = gzip.open if str(input_path).endswith((".gz", ".bgz")) else open
+    count = sum(
+        1 for line in open_fn(str(input_path), "rt")
+        if line.strip() and not line.startswith("#")
+    )
+    # Columnar input files have one header line not prefixed with '#'
+    if annotation_type == "columns":
+        return max(0, count - 1)
+    return count
+
+
+def get_input_variant_count(job: BaseJob) -> int:
+    """Return the variant count recorded for a job's input at upload."""
+    if job.variant_count is None:
+        return count_input_variants(job.input_path, job.annotation_type)
+    return job.variant_count
+
+
+def count_pipeline_attributes(pipeline: AnnotationPipeline) -> int:
+    """Return the number of attributes a pipeline adds to each variant."""
+    return sum(
+        1 for annotator in pipeline.annotators
+        for attr in annotator.attributes
+        if not attr.internal
+    )
+
+
+@dataclass
+class UploadStats:
+    """Facts about an uploaded file, gathered while it is saved."""
+    size: int
+    sha256: str
+    compression: str
+    line_count: int | None
+    data_line_count: int | None
+    head_lines: list[str]
+
+    @property
+    def compressed(self) -> bool:
+        """Return whether the file is gzip or bgzip compressed."""
+        return self.compression != ""
+
+    def header(self, separator: str | None) -> list[str]:
+        """Return the column names of a columns file."""
+        if not self.head_lines:
+            return []
+        line = self.head_lines[0].strip("\r\n")
+        names = line.split(separator) if separator else [line]
+        return [name.strip("#") for name in names]
+
+    def variant_count(self, annotation_type: str) -> int | None:
+        """Return the number of variants, like count_input_variants."""
+        if self.data_line_count is None:
+            return None
+        # Columnar input files have one header line not prefixed with '#'
+        if annotation_type == "columns":
+            return max(0, self.data_line_count - 1)
+        return self.data_line_count
+
+
+class _UploadInspector:
+    """
+    Hash, detect compression, count lines and keep the first lines of a
+    stream of chunks.
+    """
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.compression: str | None = None
+        self.lines: int | None = 0
+        self.data_lines = 0
+        self.head_lines: list[str] = []
+        self._sha256 = hashlib.sha256()
+        self._inflater: Any = None
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """Inspect the next chunk of raw file content."""
+        if not chunk:
+            return
+        self.size += len(chunk)
+        self._sha256.update(chunk)
+        if self.compression is None:
+            self.compression = detect_compression(chunk)
+        if self.lines is None:
+            return
+        if not self.compression:
+            self._count(chunk)
+            return
+        try:
+            self._inflate(chunk)
+        except zlib.error:
+            logger.warning("Could not decompress uploaded file")
+            self.lines = None
+
+    def _inflate(self, chunk: bytes) -> None:
+        # Bgzipped files are a series of gzip members.
+        while chunk:
+            if self._inflater is None:
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._count(self._inflater.decompress(chunk))
+            chunk = self._inflater.unused_data
+            if self._inflater.eof:
+                self._inflater = None
+
+    def _count(self, data: bytes) -> None:
+        *lines, self._tail = (self._tail + data).split(b"\n")
+        for line in lines:
+            self._count_line(line)
+
+    def _count_line(self, line: bytes) -> None:
+        assert self.lines is not None
+        self.lines += 1
+        if len(self.head_lines) <= HEAD_ROWS:
+            self.head_lines.append(line.decode("utf-8", errors="replace"))
+        if line.strip() and not line.startswith(b"#"):
+            self.data_lines += 1
+
+    def finish(self) -> UploadStats:
+        """Return the statistics of the whole file."""
+        if self.lines is not None and self._tail:
+            self._count_line(self._tail)
+            self._tail = b""
+        return UploadStats(
+            size=self.size,
+            sha256=self._sha256.hexdigest(),
+            compression=self.compression or "",
+            line_count=self.lines,
+            data_line_count=self.data_lines if self.lines is not None
+            else None,
+            head_lines=self.head_lines,
+        )
+
+
+def detect_compression(start: bytes) -> str:
+    """Detect the compression of a file from its first bytes."""
+    if not start.startswith(GZIP_MAGIC):
+        return ""
+    # Bgzip blocks are gzip members with a "BC" extra subfield.
+    if len(start) >= 14 and start[3] & 4 and start[12:14] == b"BC":
+        return "bgzip"
+    return "gzip"
+
+
+def save_uploaded_file(
+    uploaded_file: UploadedFile, path: Path,
+) -> UploadStats:
+    """
+    Save an uploaded file to disk without loading it into memory.
+
+    Files Django has already spilled to a temporary file are moved in place.
+    The content is inspected in the same pass that copies it, or in a
+    single read of the moved file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    inspector = _UploadInspector()
+    temporary_file_path = getattr(uploaded_file, "temporary_file_path", None)
+    if temporary_file_path is not None:
+        shutil.move(temporary_file_path(), path)
+        with path.open("rb") as infile:
+            while chunk := infile.read(UPLOAD_CHUNK_SIZE):
+                inspector.feed(chunk)
+        return inspector.finish()
+
+    with path.open("wb") as outfile:
+        for chunk in uploaded_file.chunks(UPLOAD_CHUNK_SIZE):
+            outfile.write(chunk)
+            inspector.feed(chunk)
+    return inspector.finish()
@@ -1,6 +1,5 @@
 """Module containing base view for annotation work."""
 from functools import partial
-import gzip
 import logging
 from pathlib import Path
 from typing import Any, cast
@@ -22,18 +21,34 @@ from rest_framework.views import Request, Response
 from rest_framework.request import MultiValueDict
 import yaml
 
+from web_annotation.annotate_helpers import (
+    HEAD_ROWS,
+    UploadStats,
+    count_pipeline_attributes,
+    head_rows,
+    save_uploaded_file,
+)
 from web_annotation.executor import (
+    ProcessPoolTaskExecutor,
     TaskExecutor,
     ThreadedTaskExecutor,
 )
+from web_annotation.job_queue import DatabaseTaskExecutor
 from web_annotation.models import (
     AnonymousJob,
+    BaseJob,
     BasePipeline,
     BaseUser,
     Job,
     User,
 )
 from web_annotation.pipeline_cache import LRUPipelineCache, ThreadSafePipeline
+from web_annotation.scheduler import (
+    HIGH_PRIORITY,
+    NORMAL_PRIORITY,
+    FairShareScheduler,
+)
+from web_annotation.utils import convert_size
 
 logger = logging.getLogger(__name__)
 
@@ -56,22 +71,6 @@ def get_grr_pipelines(grr: GenomicResourceRepo) -> dict[str, dict[str, str]]:
 GRR_PIPELINES = get_grr_pipelines(GRR)
 
 
-def count_input_variants(input_path: str, annotation_type: str) -> int:
-    """Count variant lines in an annotation input file."""
-    path = Path(input_path)
-    if not path.exists():
-        return 0
-    open_fn = gzip.open if str(input_path).endswith((".gz", ".bgz")) else open
-    count = sum(
-        1 for line in open_fn(str(input_path), "rt")
-        if line.strip() and not line.startswith("#")
-    )
-    # Columnar input files have one header line not prefixed with '#'
-    if annotation_type == "columns":
-        return max(0, count - 1)
-    return count
-
-
 def get_grr_genomes(grr: GenomicResourceRepo) -> list[str]:
     """Return pipelines used for file annotation."""
     genomes: list[str] = []
@@ -85,14 +84,67 @@ def get_grr_genomes(grr: GenomicResourceRepo) -> list[str]:
 GRR_GENOMES = get_grr_genomes(GRR)
 
 
+def job_priority(job: BaseJob) -> int:
+    """
+    Return the scheduling priority of a job.
+
+    Uses the variant count recorded at upload, so that no input is read on
+    the submission path. Jobs with an unknown count are not prioritized.
+    """
+    if isinstance(job, Job) and job.owner.is_superuser:
+        return HIGH_PRIORITY
+    variants = job.variant_count
+    if variants is not None \
+            and variants <= settings.ANNOTATION_SMALL_JOB_VARIANTS:
+        return HIGH_PRIORITY
+    return NORMAL_PRIORITY
+
+
+def build_job_executor() -> TaskExecutor:
+    """Build the annotation job executor selected in the settings."""
+    if settings.ANNOTATION_JOB_QUEUE == "database":
+        # Jobs are only queued here. The callbacks passed to execute_job are
+        # not called; workers finish jobs with finish_job_success and
+        # finish_job_failure instead.
+        return DatabaseTaskExecutor()
+    scheduler = FairShareScheduler(
+        max_running_per_owner=settings.ANNOTATION_MAX_JOBS_PER_OWNER,
+        priority_fn=job_priority,
+    )
+    if settings.ANNOTATION_JOB_QUEUE == "processes":
+        preload = settings.ANNOTATION_PROCESS_PRELOAD_PIPELINES
+        return ProcessPoolTaskExecutor(
+            max_workers=settings.ANNOTATION_MAX_WORKERS,
+            job_timeout=settings.ANNOTATION_TASK_TIMEOUT,
+            pipelines_per_process=settings.ANNOTATION_PROCESS_PIPELINES,
+            preload=[
+                GRR_PIPELINES[pipeline_id]["content"]
+                for pipeline_id in preload
+            ],
+            scheduler=scheduler,
+        )
+    return ThreadedTaskExecutor(
+        max_workers=settings.ANNOTATION_MAX_WORKERS,
+        job_timeout=settings.ANNOTATION_TASK_TIMEOUT,
+        scheduler=scheduler,
+    )
+
+
 class AnnotationBaseView(views.APIView):
     """Base view for views which access annotation resources."""
 
-    lru_cache = LRUPipelineCache(GRR, settings.PIPELINES_CACHE_SIZE)
+    lru_cache = LRUPipelineCache(
+        GRR, settings.PIPELINES_CACHE_SIZE,
+        replicas=settings.PIPELINE_REPLICAS,
+        idle_job_replicas=settings.PIPELINE_IDLE_JOB_REPLICAS,
+        result_cache_size=settings.SINGLE_ALLELE_RESULT_CACHE_SIZE,
+        max_bytes=(
+            convert_size(settings.PIPELINES_CACHE_MAX_SIZE)
+            if settings.PIPELINES_CACHE_MAX_SIZE is not None else None
+        ),
+    )
 
-    JOB_EXECUTOR: TaskExecutor = ThreadedTaskExecutor(
-            max_workers=settings.ANNOTATION_MAX_WORKERS,
-            job_timeout=settings.ANNOTATION_TASK_TIMEOUT)\
+    JOB_EXECUTOR: TaskExecutor = build_job_executor()
 
     """Base view for views which access annotation resources."""
     tool_columns = [
@@ -249,6 +301,7 @@ class AnnotationBaseView(views.APIView):
             finish_load_callback=finish_load_callback,
             delete_callback=delete_callback,
             force=force,
+            replicas=settings.PIPELINE_REPLICAS_OVERRIDES.get(pipeline_id),
         )
 
     def get_pipeline(
@@ -307,14 +360,46 @@ class AnnotationBaseView(views.APIView):
         self,
         request: Request,
         input_path: Path,
-    ) -> None:
+    ) -> UploadStats:
         assert isinstance(request.data, QueryDict)
         assert isinstance(request.FILES, MultiValueDict)
         uploaded_file = request.FILES["data"]
         assert isinstance(uploaded_file, UploadedFile)
 
-        input_path.parent.mkdir(parents=True, exist_ok=True)
-        input_path.write_bytes(uploaded_file.read())
+        return save_uploaded_file(uploaded_file, input_path)
+
+    def _save_upload_details(
+        self,
+        request: Request,
+        job: Job | AnonymousJob,
+        upload_stats: UploadStats,
+    ) -> None:
+        """Store the upload inspection of a saved job on its details."""
+        assert isinstance(request.data, QueryDict)
+        details = job.get_job_details()
+        details.compression = upload_stats.compression
+        if job.annotation_type == "columns":
+            separator = request.data.get("separator")
+            assert separator is None or isinstance(separator, str)
+            details.columns = ";".join(upload_stats.header(separator))
+            try:
+                details.head = head_rows(
+                    upload_stats.head_lines, separator, HEAD_ROWS)
+            except (IndexError, ValueError):
+                details.head = None
+        details.save()
+
+    def _reserve_quota(
+        self, job: Job | AnonymousJob, user: User,
+    ) -> Response | None:
+        """Reserve quota for a saved job, deleting it if it does not fit."""
+        if user.is_superuser or job.reserve_quota():
+            return None
+        job.delete()
+        return Response(
+            {"reason": "Job quota exceeded!"},
+            status=views.status.HTTP_403_FORBIDDEN,
+        )
 
     def _cleanup(self, job_name: int, folder_name: str) -> None:
         """Cleanup the files of a failed job."""
@@ -409,7 +494,9 @@ class AnnotationBaseView(views.APIView):
         self,
         request: Request,
         annotation_type: str,
-    ) -> Response | tuple[int, AnnotationPipeline, Job | AnonymousJob]:
+    ) -> Response | tuple[
+        int, AnnotationPipeline, Job | AnonymousJob, UploadStats,
+    ]:
         validation_response = self._validate_request(request)
         if validation_response is not None:
             return validation_response
@@ -457,7 +544,7 @@ class AnnotationBaseView(views.APIView):
         )
 
         try:
-            self._save_input_file(request, input_path)
+            upload_stats = self._save_input_file(request, input_path)
         except OSError:
             logger.exception("Could not write input file")
 
@@ -475,9 +562,12 @@ class AnnotationBaseView(views.APIView):
         )
         result_path.parent.mkdir(parents=True, exist_ok=True)
 
-        job_size = (
-            input_path.stat().st_size + config_path.stat().st_size
+        logger.debug(
+            "Saved input %s: %d bytes, %s lines, sha256 %s",
+            input_path, upload_stats.size, upload_stats.line_count,
+            upload_stats.sha256,
         )
+        job_size = upload_stats.size + config_path.stat().st_size
 
         job = request.user.create_job(
             name=job_name,
@@ -487,5 +577,7 @@ class AnnotationBaseView(views.APIView):
             reference_genome=reference_genome,
             annotation_type=annotation_type,
             disk_size=job_size,
+            variant_count=upload_stats.variant_count(annotation_type),
+            attributes_count=count_pipeline_attributes(pipeline),
         )
-        return (job_name, pipeline, job)
+        return (job_name, pipeline, job, upload_stats)
@@ -0,0 +1,99 @@
+"""Cooperative cancellation of running annotation jobs."""
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from web_annotation.models import BaseJob
+
+# Seconds between two database checks for a user cancellation.
+POLL_INTERVAL = 2.0
+
+_state = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised at a checkpoint of an annotation job that was cancelled."""
+
+
+class JobTimedOut(JobCancelled):
+    """Raised at a checkpoint of an annotation job past its deadline."""
+
+
+@dataclass(frozen=True)
+class CancellationToken:
+    """
+    Picklable handle telling a running job whether it should stop.
+
+    A job stops when it is cancelled in the database or when it runs past
+    its ``deadline``. Tokens are sent along to worker processes, so the
+    same checks apply to jobs and shards running outside the web process.
+    """
+    job_model: str
+    job_pk: int | None
+    deadline: float | None = None
+
+    def is_cancelled(self) -> bool:
+        """Check the database for a cancellation of the job."""
+        # pylint: disable=import-outside-toplevel
+        from django.apps import apps
+
+        from web_annotation.models import BaseJob
+
+        model = apps.get_model(self.job_model)
+        return model.objects.filter(
+            pk=self.job_pk, status=BaseJob.Status.CANCELLED,
+        ).exists()
+
+
+def job_cancellation_token(
+    job: BaseJob, timeout: float | None = None,
+) -> CancellationToken:
+    """Create a cancellation token for a job starting now."""
+    deadline = None if timeout is None else time.time() + timeout
+    return CancellationToken(
+        job._meta.label, job.pk, deadline,  # pylint: disable=protected-access
+    )
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken | None) -> Iterator[None]:
+    """Make checkpoints in the current thread honour a token."""
+    previous = getattr(_state, "token", None), getattr(_state, "next_poll", 0)
+    _state.token = token
+    _state.next_poll = 0.0
+    try:
+        yield
+    finally:
+        _state.token, _state.next_poll = previous
+
+
+def current_token() -> CancellationToken | None:
+    """Return the token of the job running in the current thread."""
+    return getattr(_state, "token", None)
+
+
+def check_cancelled() -> None:
+    """
+    Cancellation checkpoint.
+
+    Raises JobCancelled if the job running in the current thread was
+    cancelled and JobTimedOut if it has run past its deadline. The database
+    is checked at most once every ``POLL_INTERVAL`` seconds.
+    """
+    token = current_token()
+    if token is None:
+        return
+    now = time.time()
+    if token.deadline is not None and now > token.deadline:
+        raise JobTimedOut(f"Job {token.job_pk} timed out.")
+    if token.job_pk is None or now < _state.next_poll:
+        return
+    _state.next_poll = now + POLL_INTERVAL
+    if token.is_cancelled():
+        raise JobCancelled(f"Job {token.job_pk} was cancelled.")
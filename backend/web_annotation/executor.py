@@ -1,18 +1,54 @@
 from __future__ import annotations
 import abc
+import hashlib
 import logging
+import multiprocessing
+import math
 import threading
 import time
-from collections.abc import Callable
-from concurrent.futures import Future, ThreadPoolExecutor
-from typing import Any, cast
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import (
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import yaml
+from django.core.exceptions import ObjectDoesNotExist
+
+from web_annotation.cancellation import (
+    CancellationToken,
+    JobTimedOut,
+    cancellation_scope,
+    job_cancellation_token,
+)
+from web_annotation.scheduler import FairShareScheduler, ScheduledJob
+
+if TYPE_CHECKING:
+    from web_annotation.models import BaseJob
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class QueueStatus:
+    """Place of a waiting job in an executor's queue."""
+    position: int
+    estimated_start: float | None
+
+
 class TaskExecutor(abc.ABC):
     """Abstract base class for job executors."""
 
+    # Seconds an annotation job may run before it is stopped.
+    job_timeout: float | None = None
+
     @abc.abstractmethod
     def execute(
         self, fn: Callable, *,
@@ -22,6 +58,38 @@ class TaskExecutor(abc.ABC):
     ) -> Future[Any]:
         """Run a given function with provided arguments."""
 
+    def execute_job(
+        self, job: BaseJob, fn: Callable, *,
+        callback_start: Callable[[], None] | None = None,
+        callback_success: Callable[[], None] | None = None,
+        callback_failure: Callable[[BaseException], None] | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        """
+        Run an annotation job using a given function and callbacks.
+
+        ``callback_start`` is called right before ``fn`` starts running.
+        ``fn`` runs in the job's cancellation scope, so it stops at a
+        checkpoint when the job is cancelled or exceeds ``job_timeout``.
+        """
+        def run(**fn_kwargs: Any) -> Any:
+            token = job_cancellation_token(job, self.job_timeout)
+            with cancellation_scope(token):
+                if callback_start is not None:
+                    callback_start()
+                return fn(**fn_kwargs)
+
+        return self.execute(
+            run,
+            callback_success=callback_success,
+            callback_failure=callback_failure,
+            **kwargs,
+        )
+
+    def queue_status(self, job: BaseJob) -> QueueStatus | None:
+        """Return the queue position of a waiting job, if it is known."""
+        return None
+
     @abc.abstractmethod
     def wait_all(self, timeout: float) -> None:
         """Wait for given number of seconds."""
@@ -116,19 +184,120 @@ class SequentialTaskExecutor(TaskExecutor):
         return 0
 
 
+def _job_owner(job: BaseJob) -> str:
+    try:
+        return job.owner_identifier
+    except ObjectDoesNotExist:
+        return ""
+
+
 class ThreadedTaskExecutor(TaskExecutor):
-    """Thread pool based job executor."""
+    """
+    Thread pool based job executor.
+
+    Annotation jobs wait in a fair-share scheduler and are started only
+    when a worker is free, so the start order is decided by the scheduler
+    rather than by submission order.
+    """
     def __init__(
         self, max_workers: int = 4, job_timeout: float = 2*60*60,
+        scheduler: FairShareScheduler | None = None,
     ) -> None:
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
         self._futures: list[tuple[float, Future]] = []
         self._lock = threading.Lock()
         self.job_timeout = job_timeout
+        self.max_workers = max_workers
+        self.scheduler = scheduler or FairShareScheduler()
+        self._job_durations: deque[float] = deque(maxlen=20)
 
     def size(self) -> int:
         with self._lock:
-            return len(self._futures)
+            return len(self._futures) + len(self.scheduler)
+
+    def execute_job(
+        self, job: BaseJob, fn: Callable, *,
+        callback_start: Callable[[], None] | None = None,
+        callback_success: Callable[[], None] | None = None,
+        callback_failure: Callable[[BaseException], None] | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        result: Future[Any] = Future()
+        entry: ScheduledJob
+
+        def start() -> None:
+            started = time.time()
+
+            def finished(done: Future[Any] | None) -> None:
+                with self._lock:
+                    self.scheduler.finished(entry.owner)
+                    self._job_durations.append(time.time() - started)
+                self._dispatch()
+                if done is None or done.cancelled():
+                    result.set_exception(CancelledError())
+                elif (exception := done.exception()) is not None:
+                    result.set_exception(exception)
+                else:
+                    result.set_result(done.result())
+
+            try:
+                future = self._start_job(
+                    job, fn,
+                    callback_start=callback_start,
+                    callback_success=callback_success,
+                    callback_failure=callback_failure,
+                    **kwargs,
+                )
+            except RuntimeError:
+                logger.exception("Could not start job %s", job.pk)
+                finished(None)
+                return
+            future.add_done_callback(finished)
+
+        result.set_running_or_notify_cancel()
+        entry = ScheduledJob(
+            key=(job._meta.label, job.pk),  # pylint: disable=protected-access
+            owner=_job_owner(job),
+            priority=self.scheduler.priority(job),
+            submitted=time.time(),
+            start=start,
+        )
+        with self._lock:
+            self.scheduler.push(entry)
+        self._dispatch()
+        return result
+
+    def _start_job(
+        self, job: BaseJob, fn: Callable, **kwargs: Any,
+    ) -> Future[Any]:
+        """Submit a scheduled job to the pool."""
+        return super().execute_job(job, fn, **kwargs)
+
+    def _dispatch(self) -> None:
+        """Start scheduled jobs while there are free workers."""
+        while True:
+            with self._lock:
+                if self.scheduler.running_count() >= self.max_workers:
+                    return
+                entry = self.scheduler.pop_next()
+            if entry is None:
+                return
+            entry.start()
+
+    def queue_status(self, job: BaseJob) -> QueueStatus | None:
+        key = (job._meta.label, job.pk)  # pylint: disable=protected-access
+        with self._lock:
+            position = self.scheduler.position(key)
+            if position is None:
+                return None
+            free = self.max_workers - self.scheduler.running_count()
+            durations = list(self._job_durations)
+        estimated_start = None
+        if durations:
+            average = sum(durations) / len(durations)
+            rounds = math.ceil(max(0, position - free) / self.max_workers)
+            estimated_start = time.time() + rounds * average
+        return QueueStatus(position, estimated_start)
 
     def _callback_wrapper(
         self,
@@ -138,9 +307,8 @@ class ThreadedTaskExecutor(TaskExecutor):
         callback_failure: Callable[[BaseException], None] | None = None,
     ) -> None:
         if future.cancelled():
-            return
-        exception = future.exception()
-        if exception is not None:
+            pass
+        elif (exception := future.exception()) is not None:
             logger.error("Task failed with exception: %s", exception)
             if callback_failure is not None:
                 callback_failure(exception)
@@ -160,19 +328,9 @@ class ThreadedTaskExecutor(TaskExecutor):
         callback_failure: Callable[[BaseException], None] | None = None,
         **kwargs: Any,
     ) -> Future[Any]:
+        # Tasks stay accounted for until they finish. Annotation jobs past
+        # their timeout stop at their next cancellation checkpoint.
         now = time.time()
-        to_remove = []
-        with self._lock:
-            for time_started, future in self._futures:
-                if now - time_started > self.job_timeout:
-                    logger.warning(
-                        "Cancelling long-running task started at %s",
-                        time_started,
-                    )
-                    future.cancel()
-                    to_remove.append((time_started, future))
-            for time_started, future in to_remove:
-                self._futures.remove((time_started, future))
         with self._lock:
             future = self._executor.submit(fn, **kwargs)
             if callback_start is not None:
@@ -194,21 +352,197 @@ class ThreadedTaskExecutor(TaskExecutor):
         elapsed = 0.0
         while self.size() > 0:
             with self._lock:
-                if not self._futures:
-                    return
-                _, future = self._futures[0]
-            try:
-                future.result(timeout=timeout - elapsed)
-            except TimeoutError as ex:
-                raise TimeoutError("Task timed out") from ex
-            except BaseException:
-                pass
+                future = self._futures[0][1] if self._futures else None
+            if future is None:
+                # A finished job is handing its worker to a scheduled one.
+                time.sleep(0.01)
+            else:
+                try:
+                    future.result(timeout=timeout - elapsed)
+                except TimeoutError as ex:
+                    raise TimeoutError("Task timed out") from ex
+                except BaseException:
+                    pass
             elapsed = time.time() - start
             if elapsed >= timeout:
                 raise TimeoutError("Waiting for tasks timed out")
 
 
     def shutdown(self) -> None:
+        with self._lock:
+            self.scheduler.clear()
         self._executor.shutdown(wait=True, cancel_futures=True)
         with self._lock:
             self._futures.clear()
+
+
+# State of a ProcessPoolTaskExecutor worker process.
+_PROCESS_STATE: dict[str, Any] = {}
+
+
+def _pipeline_cache_key(config: str) -> tuple[str, str]:
+    """Normalize a pipeline config and return its cache ID and text."""
+    normalized = yaml.safe_dump(yaml.safe_load(config), sort_keys=False)
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"process-pipeline-{digest}", normalized
+
+
+def _get_process_pipeline(config: str) -> Any:
+    cache = _PROCESS_STATE["cache"]
+    pipeline_id, normalized = _pipeline_cache_key(config)
+    cache.put_pipeline(pipeline_id, normalized)
+    try:
+        return cache.get_pipeline(pipeline_id)
+    except Exception:
+        cache.delete_pipeline(pipeline_id)
+        raise
+
+
+def _init_process(cache_size: int, preload: Sequence[str]) -> None:
+    """Set up Django, the GRR and a warm pipeline cache in a worker."""
+    # pylint: disable=import-outside-toplevel
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from gain.genomic_resources.repository_factory import (
+        build_genomic_resource_repository,
+    )
+    from web_annotation.pipeline_cache import LRUPipelineCache
+
+    grr = build_genomic_resource_repository(
+        file_name=settings.GRR_DEFINITION_PATH)
+    _PROCESS_STATE["grr"] = grr
+    _PROCESS_STATE["cache"] = LRUPipelineCache(grr, cache_size)
+    for config in preload:
+        try:
+            _get_process_pipeline(config)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not preload pipeline in worker process")
+
+
+def _run_in_process(
+    fn: Callable, config_path: str, reference_genome: str | None,
+    kwargs: dict[str, Any], token: CancellationToken | None = None,
+) -> Any:
+    """Run a job function with the worker's copy of the job pipeline."""
+    # pylint: disable=import-outside-toplevel
+    from gain.genomic_resources.reference_genome import (
+        build_reference_genome_from_resource,
+    )
+
+    config = Path(config_path).read_text(encoding="utf-8")
+    kwargs["pipeline"] = _get_process_pipeline(config)
+    if reference_genome is not None:
+        kwargs["reference_genome"] = build_reference_genome_from_resource(
+            _PROCESS_STATE["grr"].get_resource(reference_genome))
+    with cancellation_scope(token):
+        return fn(**kwargs)
+
+
+class ProcessPoolTaskExecutor(ThreadedTaskExecutor):
+    """
+    Job executor running annotation jobs in a pool of worker processes.
+
+    Jobs run outside of the web process, so CPU-heavy annotation does not
+    compete with request handling for the GIL. Each worker process keeps
+    its own cache of opened pipelines, optionally preloaded at start. Job
+    functions must be picklable; the pipeline and reference genome are
+    rebuilt in the worker from the job's stored config. Callbacks run in
+    the parent process.
+    """
+
+    def __init__(
+        self, max_workers: int = 4, job_timeout: float = 2*60*60,
+        pipelines_per_process: int = 4,
+        preload: Sequence[str] = (),
+        scheduler: FairShareScheduler | None = None,
+    ) -> None:
+        super().__init__(
+            max_workers=max_workers, job_timeout=job_timeout,
+            scheduler=scheduler,
+        )
+        self._max_workers = max_workers
+        self._initargs = (pipelines_per_process, tuple(preload))
+        self._processes_lock = threading.Lock()
+        self._processes = self._create_processes()
+
+    def _create_processes(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=self._initargs,
+        )
+
+    def submit_with_pipeline(
+        self, fn: Callable, config_path: str,
+        reference_genome: str | None = None,
+        token: CancellationToken | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        """
+        Run ``fn`` in a worker process.
+
+        ``fn`` gets the worker's opened pipeline for the config stored at
+        ``config_path`` as its ``pipeline`` argument. It runs in the
+        cancellation scope of ``token``, if given.
+        """
+        with self._processes_lock:
+            processes = self._processes
+            future = processes.submit(
+                _run_in_process, fn, config_path, reference_genome, kwargs,
+                token)
+
+        def restart_if_broken(done: Future[Any]) -> None:
+            if done.cancelled() or not isinstance(
+                    done.exception(), BrokenProcessPool):
+                return
+            logger.error("Annotation worker process died, restarting pool")
+            with self._processes_lock:
+                if self._processes is processes:
+                    self._processes = self._create_processes()
+
+        future.add_done_callback(restart_if_broken)
+        return future
+
+    def _start_job(
+        self, job: BaseJob, fn: Callable, *,
+        callback_start: Callable[[], None] | None = None,
+        callback_success: Callable[[], None] | None = None,
+        callback_failure: Callable[[BaseException], None] | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        kwargs.pop("pipeline", None)
+        reference_genome = None
+        if "reference_genome" in kwargs:
+            kwargs.pop("reference_genome")
+            reference_genome = job.reference_genome
+
+        # A parent thread per running job keeps the start callback and the
+        # slot accounting of the threaded executor. The job is stopped in
+        # its worker process at a cancellation checkpoint; should it hang
+        # between checkpoints, the parent thread gives up on it anyway.
+        def run() -> Any:
+            token = job_cancellation_token(job, self.job_timeout)
+            if callback_start is not None:
+                callback_start()
+            future = self.submit_with_pipeline(
+                fn, job.config_path, reference_genome, token=token, **kwargs,
+            )
+            try:
+                return future.result(timeout=self.job_timeout)
+            except TimeoutError as ex:
+                future.cancel()
+                raise JobTimedOut(f"Job {job.pk} timed out.") from ex
+
+        return self.execute(
+            run,
+            callback_success=callback_success,
+            callback_failure=callback_failure,
+        )
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        with self._processes_lock:
+            self._processes.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,222 @@
+"""Persistent annotation job queue backed by the job tables."""
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Any, cast
+
+from django.db.models import F
+from django.utils import timezone
+
+from web_annotation.executor import (
+    FakeFuture,
+    QueueStatus,
+    TaskExecutor,
+    ThreadedTaskExecutor,
+)
+from web_annotation.models import AnonymousJob, BaseJob, Job
+
+logger = logging.getLogger(__name__)
+
+JOB_MODELS: tuple[type[Job] | type[AnonymousJob], ...] = (Job, AnonymousJob)
+
+
+def enqueue_job(job: BaseJob) -> None:
+    """Put a waiting job in the queue."""
+    job.queued_at = timezone.now()
+    job.worker_id = ""
+    job.lease_expires_at = None
+    job.save()
+
+
+def queued_jobs_count() -> int:
+    """Count queued jobs which are waiting or running."""
+    return sum(
+        model.objects.filter(
+            queued_at__isnull=False,
+            status__in=[Job.Status.WAITING, Job.Status.IN_PROGRESS],
+        ).count()
+        for model in JOB_MODELS
+    )
+
+
+def claim_next_job(worker_id: str, lease_seconds: float) -> BaseJob | None:
+    """
+    Claim the oldest queued job for a worker.
+
+    The claim is a conditional update, so when several workers race for the
+    same job only one of them gets it. The claimed job is in progress and
+    leased to the worker for ``lease_seconds``.
+    """
+    while True:
+        candidates: list[BaseJob] = []
+        for model in JOB_MODELS:
+            job = model.objects.filter(
+                status=Job.Status.WAITING,
+                queued_at__isnull=False,
+                worker_id="",
+                is_active=True,
+            ).order_by("queued_at", "pk").first()
+            if job is not None:
+                candidates.append(job)
+        if not candidates:
+            return None
+
+        job = min(candidates, key=lambda job: cast(Any, job.queued_at))
+        claimed = type(job).objects.filter(
+            pk=job.pk,
+            status=Job.Status.WAITING,
+            worker_id="",
+        ).update(
+            status=Job.Status.IN_PROGRESS,
+            worker_id=worker_id,
+            lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        logger.debug("Job %s was claimed by another worker", job.pk)
+
+
+def renew_lease(job: BaseJob, worker_id: str, lease_seconds: float) -> bool:
+    """Extend a worker's lease on a running job."""
+    return type(job).objects.filter(
+        pk=job.pk,
+        status=Job.Status.IN_PROGRESS,
+        worker_id=worker_id,
+    ).update(
+        lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds),
+    ) == 1
+
+
+def release_lease(job: BaseJob, worker_id: str) -> None:
+    """Drop a worker's lease on a job it has finished."""
+    type(job).objects.filter(
+        pk=job.pk,
+        worker_id=worker_id,
+    ).update(lease_expires_at=None)
+
+
+def recover_orphaned_jobs(
+    max_attempts: int, lease_seconds: float,
+) -> list[BaseJob]:
+    """
+    Recover running jobs whose worker lease has expired.
+
+    An orphaned job goes back to the queue, unless it has already been
+    attempted ``max_attempts`` times, in which case it fails. The recovering
+    worker holds a lease on the orphan while it does so. Returns the
+    recovered jobs.
+    """
+    recovered: list[BaseJob] = []
+    now = timezone.now()
+    for model in JOB_MODELS:
+        orphans = model.objects.filter(
+            status=Job.Status.IN_PROGRESS,
+            queued_at__isnull=False,
+            lease_expires_at__lt=now,
+        )
+        for job in orphans:
+            # Take the orphan over first, so that only one worker recovers it.
+            stolen = model.objects.filter(
+                pk=job.pk,
+                status=Job.Status.IN_PROGRESS,
+                worker_id=job.worker_id,
+                lease_expires_at__lt=now,
+            ).update(
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+            )
+            if not stolen:
+                continue
+            job.refresh_from_db()
+            logger.warning(
+                "Recovering job %s abandoned by worker %s (attempt %d)",
+                job.pk, job.worker_id, job.attempts,
+            )
+            if job.attempts < max_attempts:
+                job.status = Job.Status.WAITING
+                job.worker_id = ""
+                job.lease_expires_at = None
+                job.save()
+            else:
+                job.lease_expires_at = None
+                job.release_quota()
+                job.update_job_failed(
+                    job.command_line,
+                    f"Job was abandoned by its worker {job.attempts} times.",
+                )
+            recovered.append(job)
+    return recovered
+
+
+class DatabaseTaskExecutor(TaskExecutor):
+    """
+    Job executor that queues annotation jobs in the job tables.
+
+    Queued jobs are run by ``annotation_worker`` processes, so they survive
+    restarts of the web process. The job callbacks are not used; workers run
+    the whole job lifecycle from the stored job. Other tasks are run by an
+    in-process executor.
+    """
+
+    def __init__(self, executor: TaskExecutor | None = None) -> None:
+        self._executor = executor or ThreadedTaskExecutor(max_workers=1)
+
+    def execute(
+        self, fn: Callable, *,
+        callback_success: Callable[[], None] | None = None,
+        callback_failure: Callable[[BaseException], None] | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        return self._executor.execute(
+            fn,
+            callback_success=callback_success,
+            callback_failure=callback_failure,
+            **kwargs,
+        )
+
+    def execute_job(
+        self, job: BaseJob, fn: Callable, *,
+        callback_start: Callable[[], None] | None = None,
+        callback_success: Callable[[], None] | None = None,
+        callback_failure: Callable[[BaseException], None] | None = None,
+        **kwargs: Any,
+    ) -> Future[Any]:
+        """
+        Queue an annotation job for the workers.
+
+        ``fn`` and the callbacks are not called. The worker that claims the
+        job runs it with ``tasks.run_job``, which finishes the job with
+        ``finish_job_success`` or ``finish_job_failure``.
+        """
+        enqueue_job(job)
+        return cast(Future, FakeFuture(None))
+
+    def queue_status(self, job: BaseJob) -> QueueStatus | None:
+        if job.status != Job.Status.WAITING or job.queued_at is None:
+            return None
+        ahead = sum(
+            model.objects.filter(
+                status=Job.Status.WAITING,
+                queued_at__lt=job.queued_at,
+                is_active=True,
+            ).count()
+            for model in JOB_MODELS
+        )
+        return QueueStatus(ahead + 1, None)
+
+    def wait_all(self, timeout: float) -> None:
+        start = time.time()
+        self._executor.wait_all(timeout)
+        while self.size() > 0 and time.time() - start < timeout:
+            time.sleep(1)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+    def size(self) -> int:
+        return queued_jobs_count() + self._executor.size()
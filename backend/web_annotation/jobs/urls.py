@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/jobs/annotate_vcf', views.AnnotateVCF.as_view()),
     path('api/jobs/<int:pk>/file/<str:file>', views.JobGetFile.as_view()),
     path('api/jobs/<int:pk>', views.JobDetail.as_view()),
+    path('api/jobs/<int:pk>/cancel', views.JobCancel.as_view()),
     path('api/jobs/validate_columns', views.ColumnValidation.as_view()),
     path(
         'api/jobs/preview',
@@ -1,9 +1,58 @@
-
 import argparse
 import sys
-import itertools
+from dataclasses import dataclass
+
 from pysam import VariantFile
 
+
+class VCFValidationError(ValueError):
+    """Raised for VCF files which cannot be read or are malformed."""
+
+
+@dataclass
+class VCFValidation:
+    """Result of validating a VCF file."""
+    valid: bool
+    variant_count: int
+
+
+def validate_vcf_file(
+    file_path: str, limit: int | None = None,
+) -> VCFValidation:
+    """
+    Validate a VCF file and count its variants in a single pass.
+
+    Reading stops as soon as the file has more than ``limit`` variants, in
+    which case the result is not valid.
+    """
+    try:
+        vcf_file = VariantFile(file_path)
+    except (OSError, ValueError) as error:
+        raise VCFValidationError(str(error)) from error
+
+    with vcf_file:
+        header = vcf_file.header.copy()
+        contigs = set(header.contigs)
+        count = 0
+        try:
+            for variant in vcf_file:
+                if limit is not None and count >= limit:
+                    return VCFValidation(False, count)
+                if variant.contig not in contigs:
+                    raise VCFValidationError(
+                        f"Variant {count + 1}: contig {variant.contig} "
+                        "not defined in header",
+                    )
+                variant.translate(header)
+                count += 1
+        except VCFValidationError:
+            raise
+        except (OSError, ValueError) as error:
+            raise VCFValidationError(
+                f"Variant {count + 1}: {error}") from error
+    return VCFValidation(True, count)
+
+
 def _build_argument_parser() -> argparse.ArgumentParser:
     """Construct and configure argument parser."""
     parser = argparse.ArgumentParser(
@@ -27,25 +76,15 @@ def main(argv: list[str] | None = None) -> int:
     arg_parser = _build_argument_parser()
     args = vars(arg_parser.parse_args(argv))
 
-    vcf_file = VariantFile(args["input"])
-    variants_limit = args["limit"]
-
-    header = vcf_file.header.copy()
-    variants = itertools.islice(
-        vcf_file.fetch(),
-        None,
-        variants_limit + 1 if variants_limit else None,
-    )
-
-    for i, variant in enumerate(variants):
-        if variants_limit and i >= variants_limit:
-            print("exceeded", file=sys.stdout)
-            return 0
-        variant.translate(header)
+    try:
+        validation = validate_vcf_file(args["input"], args["limit"] or None)
+    except VCFValidationError as error:
+        print(str(error), file=sys.stderr)
+        return 1
 
-    print("valid", file=sys.stdout)
+    print("valid" if validation.valid else "exceeded", file=sys.stdout)
     return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1,11 +1,11 @@
 """Module with views for job operations."""
+from datetime import datetime, timezone
+from functools import partial
 import gzip
 import logging
 from pathlib import Path
-from subprocess import CalledProcessError
 import time
-from typing import Any, cast
-from gain.annotation.annotation_factory import build_annotation_pipeline
+from typing import cast
 from gain.annotation.record_to_annotatable import build_record_to_annotatable
 from django.core.files.uploadedfile import UploadedFile
 from django.db.models import ObjectDoesNotExist, QuerySet
@@ -18,16 +18,15 @@ from rest_framework.parsers import MultiPartParser
 from rest_framework.request import MultiValueDict
 from rest_framework.views import Request, Response
 from web_annotation.annotate_helpers import (
+    HEAD_ROWS,
     columns_file_preview,
     extract_head,
     is_compressed_filename,
 )
-from web_annotation.annotation_base_view import AnnotationBaseView, \
-    count_input_variants
+from web_annotation.annotation_base_view import AnnotationBaseView
 from web_annotation.authentication import WebAnnotationAuthentication
 from web_annotation.models import (
     AnonymousJob,
-    BaseUser,
     Job,
     User,
     UserWrapper,
@@ -35,13 +34,21 @@ from web_annotation.models import (
 )
 from web_annotation.permissions import has_job_permission
 from web_annotation.serializers import JobSerializer
+from web_annotation.jobs.validate_vcf_file import (
+    VCFValidation,
+    VCFValidationError,
+)
 from web_annotation.utils import bytes_to_readable, validate_vcf
 from web_annotation.tasks import (
+    finish_job_failure,
+    finish_job_success,
     get_args_columns,
     get_args_vcf,
+    notify_job_status,
     run_columns_job,
     run_vcf_job,
     specify_job,
+    start_job,
 )
 
 
@@ -139,6 +146,14 @@ class JobDetail(AnnotationBaseView):
             "error": job.error,
             "size": bytes_to_readable(int(job.disk_size)),
         }
+        queue_status = self.JOB_EXECUTOR.queue_status(job)
+        if queue_status is not None:
+            response["queue_position"] = queue_status.position
+            response["estimated_start"] = (
+                str(datetime.fromtimestamp(
+                    queue_status.estimated_start, tz=timezone.utc))
+                if queue_status.estimated_start is not None else None
+            )
         try:
             details = job.get_job_details()
         except ObjectDoesNotExist:
@@ -146,12 +161,14 @@ class JobDetail(AnnotationBaseView):
 
         if job.annotation_type == "columns":
             response["columns"] = details.columns.split(";")
-            file_head = extract_head(
-                str(job.input_path),
-                details.separator,
-                n_lines=5,
-            )
-            response["head"] = file_head
+            if details.head is None:
+                details.head = extract_head(
+                    str(job.input_path),
+                    details.separator,
+                    n_lines=HEAD_ROWS,
+                )
+                details.save(update_fields=["head"])
+            response["head"] = details.head
 
         return Response(response, status=views.status.HTTP_200_OK)
 
@@ -175,6 +192,35 @@ class JobDetail(AnnotationBaseView):
         return Response(status=views.status.HTTP_200_OK)
 
 
+class JobCancel(JobDetail):
+    """View for cancelling a job."""
+
+    http_method_names = ["post"]
+
+    def post(self, request: Request, pk: int) -> Response:
+        """
+        Cancel a waiting or running job.
+
+        A running job stops at its next cancellation checkpoint.
+        """
+        try:
+            job = self.get_job(request.user, pk)
+        except ObjectDoesNotExist:
+            return Response(status=views.status.HTTP_404_NOT_FOUND)
+
+        if not request.user.is_owner(job):
+            return Response(status=views.status.HTTP_403_FORBIDDEN)
+
+        if not job.cancel():
+            return Response(
+                {"reason": "Only waiting or running jobs can be cancelled!"},
+                status=views.status.HTTP_400_BAD_REQUEST,
+            )
+        notify_job_status(job)
+
+        return Response(status=views.status.HTTP_200_OK)
+
+
 class AnnotateVCF(AnnotationBaseView):
     """View for creating jobs."""
 
@@ -186,7 +232,7 @@ class AnnotateVCF(AnnotationBaseView):
         self,
         file_path: str,
         user: User,
-    ) -> bool:
+    ) -> VCFValidation:
         """Check if a variants file does not exceed the variants limit."""
         if not user.is_superuser:
             limit = self.max_variants
@@ -200,64 +246,49 @@ class AnnotateVCF(AnnotationBaseView):
         job_or_response = self._create_job(request, "vcf")
         if isinstance(job_or_response, Response):
             return job_or_response
-        job_name, pipeline, job = job_or_response
+        job_name, pipeline, job, upload_stats = job_or_response
 
         work_folder_name = request.user.identifier
 
         try:
-            if not self._validate_vcf(
+            validation = self._validate_vcf(
                 job.input_path,
                 request.user,
-            ):
-                self._cleanup(job_name, work_folder_name)
-                return Response(
-                    status=views.status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-        except CalledProcessError as e:
+            )
+        except VCFValidationError as e:
             self._cleanup(job_name, work_folder_name)
             return Response(
-                {"reason": str(e.stderr)},
+                {"reason": str(e)},
                 status=views.status.HTTP_400_BAD_REQUEST)
+        if not validation.valid:
+            self._cleanup(job_name, work_folder_name)
+            return Response(
+                status=views.status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
 
+        job.variant_count = validation.variant_count
         job.save()
+        self._save_upload_details(request, job, upload_stats)
+        quota_response = self._reserve_quota(job, request.user)
+        if quota_response is not None:
+            return quota_response
         work_dir = self.result_storage_dir / work_folder_name
-        pipeline = build_annotation_pipeline(pipeline.raw, pipeline.repository)
         args = get_args_vcf(
             job, pipeline, str(work_dir))
         start_time = time.time()
 
         def on_success() -> None:
             """Callback when annotation is done."""
-            job.duration = time.time() - start_time
-            job.disk_size += Path(job.result_path).stat().st_size
-            job.update_job_success(str(args))
-            self._notify_user_job(request.user, str(job.pk), job.status)
-
-            assert isinstance(request.user, BaseUser)
-            attributes_count = sum(
-                1 for annotator in pipeline.annotators
-                for attr in annotator.attributes
-                if not attr.internal
-            )
-            variants_count = count_input_variants(
-                job.input_path, job.annotation_type,
-            )
-            request.user.get_quota().job_complete(variants_count, attributes_count)
+            finish_job_success(job, args, pipeline, start_time)
 
         def on_failure(exception: BaseException) -> None:
             """Callback when annotation fails."""
             logger.error(
                 "VCF annotation job failed with exception: %s", str(exception)
             )
-            job.duration = time.time() - start_time
             reason = (
                 f"Unexpected error, {type(exception)}\n"
                 f"{str(exception)}"
             )
-            if isinstance(exception, CalledProcessError):
-                reason = (
-                    "annotate_vcf failed internally:\n"
-                    f"{exception.stderr}"
-                )
             if isinstance(
                 exception, (OSError, TypeError, ValueError),
             ):
@@ -266,19 +297,14 @@ class AnnotateVCF(AnnotationBaseView):
                     f"{str(exception)}"
                 )
             logger.error("VCF annotation job failed!\n%s", reason)
-            job.update_job_failed(str(args), str(exception))
-            self._notify_user_job(request.user, str(job.pk), job.status)
-
-        def run_vcf_wrapper(*args: Any, **kwargs: Any) -> None:
-            """Wrapper to run VCF job."""
-            job.update_job_in_progress()
-            self._notify_user_job(request.user, str(job.pk), job.status)
-            run_vcf_job(*args, **kwargs)
+            finish_job_failure(job, args, exception, start_time)
 
         self._notify_user_job(request.user, str(job.pk), job.status)
 
-        self.JOB_EXECUTOR.execute(
-            run_vcf_wrapper,
+        self.JOB_EXECUTOR.execute_job(
+            job,
+            run_vcf_job,
+            callback_start=partial(start_job, job),
             callback_success=on_success,
             callback_failure=on_failure,
             **args,
@@ -313,10 +339,19 @@ class AnnotateColumns(AnnotationBaseView):
 
         return True
 
-    def check_variants_limit(self, filepath: Path, user: User) -> bool:
-        """Check if a variants file does not exceed the variants limit."""
+    def check_variants_limit(
+        self, filepath: Path, user: User, line_count: int | None = None,
+    ) -> bool:
+        """
+        Check if a variants file does not exceed the variants limit.
+
+        Every line after the header counts towards the limit. The file is
+        scanned only when its line count is not known.
+        """
         if user.is_superuser:
             return True
+        if line_count is not None:
+            return line_count - 1 <= self.max_variants
 
         if is_compressed_filename(str(filepath)):
             file = gzip.open(filepath, "rt")
@@ -339,9 +374,10 @@ class AnnotateColumns(AnnotationBaseView):
         job_or_response = self._create_job(request, "columns")
         if isinstance(job_or_response, Response):
             return job_or_response
-        _, pipeline, job = job_or_response
+        _, pipeline, job, upload_stats = job_or_response
 
         job.save()
+        self._save_upload_details(request, job, upload_stats)
 
         assert isinstance(request.data, QueryDict)
         if not any(param in self.tool_columns for param in request.data):
@@ -352,7 +388,8 @@ class AnnotateColumns(AnnotationBaseView):
                 status=views.status.HTTP_400_BAD_REQUEST)
 
         if self.check_variants_limit(
-                Path(job.input_path), request.user) is False:
+                Path(job.input_path), request.user,
+                upload_stats.line_count) is False:
             job.delete()
             return Response(
                 status=views.status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
@@ -376,39 +413,22 @@ class AnnotateColumns(AnnotationBaseView):
             job.delete()
             return Response(status=views.status.HTTP_404_NOT_FOUND)
 
-        pipeline = build_annotation_pipeline(pipeline.raw, pipeline.repository)
+        quota_response = self._reserve_quota(job, request.user)
+        if quota_response is not None:
+            return quota_response
+
         args = get_args_columns(
             job, details, pipeline, str(work_dir))
         start_time = time.time()
 
         def on_success() -> None:
-            job.duration = time.time() - start_time
-            job.disk_size += Path(job.result_path).stat().st_size
-            job.update_job_success(str(args))
-            self._notify_user_job(request.user, str(job.pk), job.status)
-
-            assert isinstance(request.user, BaseUser)
-            attributes_count = sum(
-                1 for annotator in pipeline.annotators
-                for attr in annotator.attributes
-                if not attr.internal
-            )
-            variants_count = count_input_variants(
-                job.input_path, job.annotation_type,
-            )
-            request.user.get_quota().job_complete(variants_count, attributes_count)
+            finish_job_success(job, args, pipeline, start_time)
 
         def on_failure(exception: BaseException) -> None:
-            job.duration = time.time() - start_time
             reason = (
                 f"Unexpected error, {type(exception)}\n"
                 f"{(exception)}"
             )
-            if isinstance(exception, CalledProcessError):
-                reason = (
-                    "annotate_columns failed internally:\n"
-                    f"{exception.stderr}"
-                )
             if isinstance(
                 exception, (OSError, TypeError, ValueError),
             ):
@@ -417,19 +437,14 @@ class AnnotateColumns(AnnotationBaseView):
                     f"{str(exception)}"
                 )
             logger.error("columns annotation job failed!\n%s", reason)
-            job.update_job_failed(str(args), str(exception))
-            self._notify_user_job(request.user, str(job.pk), job.status)
-
-        def run_columns_wrapper(*args: Any, **kwargs: Any) -> None:
-            """Wrapper to run VCF job."""
-            job.update_job_in_progress()
-            self._notify_user_job(request.user, str(job.pk), job.status)
-            run_columns_job(*args, **kwargs)
+            finish_job_failure(job, args, exception, start_time)
 
         self._notify_user_job(request.user, str(job.pk), job.status)
 
-        self.JOB_EXECUTOR.execute(
-            run_columns_wrapper,
+        self.JOB_EXECUTOR.execute_job(
+            job,
+            run_columns_job,
+            callback_start=partial(start_job, job),
             callback_success=on_success,
             callback_failure=on_failure,
             **args,
@@ -0,0 +1,42 @@
+import argparse
+import signal
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web_annotation.annotation_base_view import GRR
+from web_annotation.worker import AnnotationWorker
+
+
+class Command(BaseCommand):
+    """Management command to run annotation jobs from the job queue."""
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit when the job queue is empty.",
+        )
+        parser.add_argument(
+            "--worker-id",
+            default=None,
+            help="Worker identifier. Defaults to host, PID and a random tag.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        worker = AnnotationWorker(
+            GRR,
+            lease_seconds=settings.ANNOTATION_JOB_LEASE_SECONDS,
+            max_attempts=settings.ANNOTATION_JOB_MAX_ATTEMPTS,
+            poll_interval=settings.ANNOTATION_WORKER_POLL_INTERVAL,
+            cache_size=settings.PIPELINES_CACHE_SIZE,
+            worker_id=options["worker_id"],
+        )
+
+        def stop(*_: Any) -> None:
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        worker.run(burst=options["burst"])
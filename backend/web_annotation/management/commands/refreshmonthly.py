@@ -1,15 +1,22 @@
+import argparse
 from typing import Any
+
 from django.core.management.base import BaseCommand
-from web_annotation.models import UserQuota, AnonymousUserQuota
+
+from web_annotation.models import AnonymousUserQuota, UserQuota
 
 
 class Command(BaseCommand):
     """Management command to reset all monthly quotas."""
-    def handle(self, *args: Any, **options: Any) -> None:
-        for user_quota in UserQuota.objects.all():
-            user_quota.reset_monthly()
-            user_quota.save()
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of quotas reset per UPDATE statement.",
+        )
 
-        for anonymous_quota in AnonymousUserQuota.objects.all():
-            anonymous_quota.reset_monthly()
-            anonymous_quota.save()
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size = options["batch_size"]
+        UserQuota.reset_all_monthly(batch_size)
+        AnonymousUserQuota.reset_all_monthly(batch_size)
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web_annotation", "0037_merge_20260421_1200"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="attempts",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="lease_expires_at",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="queued_at",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="worker_id",
+            field=models.CharField(default="", max_length=256),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="attempts",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="lease_expires_at",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="queued_at",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="worker_id",
+            field=models.CharField(default="", max_length=256),
+        ),
+    ]
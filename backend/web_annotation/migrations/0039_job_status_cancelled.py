@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web_annotation", "0038_job_queue_fields"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="anonymousjob",
+            name="status",
+            field=models.IntegerField(
+                choices=[
+                    (1, "Waiting"),
+                    (2, "In Progress"),
+                    (3, "Success"),
+                    (4, "Failed"),
+                    (5, "Cancelled"),
+                ],
+                default=1,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="status",
+            field=models.IntegerField(
+                choices=[
+                    (1, "Waiting"),
+                    (2, "In Progress"),
+                    (3, "Success"),
+                    (4, "Failed"),
+                    (5, "Cancelled"),
+                ],
+                default=1,
+            ),
+        ),
+    ]
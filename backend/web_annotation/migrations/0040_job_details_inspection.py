@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web_annotation", "0039_job_status_cancelled"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="variant_count",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="variant_count",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="anonymousjobdetails",
+            name="compression",
+            field=models.CharField(default="", max_length=16),
+        ),
+        migrations.AddField(
+            model_name="anonymousjobdetails",
+            name="head",
+            field=models.JSONField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="jobdetails",
+            name="compression",
+            field=models.CharField(default="", max_length=16),
+        ),
+        migrations.AddField(
+            model_name="jobdetails",
+            name="head",
+            field=models.JSONField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web_annotation", "0040_job_details_inspection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="attributes_count",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="anonymousjob",
+            name="quota_reserved",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="attributes_count",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="quota_reserved",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="anonymoususerquota",
+            name="reserved_attributes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="anonymoususerquota",
+            name="reserved_jobs",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="anonymoususerquota",
+            name="reserved_variants",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userquota",
+            name="reserved_attributes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userquota",
+            name="reserved_jobs",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userquota",
+            name="reserved_variants",
+            field=models.IntegerField(default=0),
+        ),
+    ]
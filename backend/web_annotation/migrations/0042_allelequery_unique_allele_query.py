@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:00
+
+from typing import Any
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_allele_queries(apps: Any, schema_editor: Any) -> None:
+    """Keep the most recently used row of each (owner, allele) pair."""
+    allele_query = apps.get_model("web_annotation", "AlleleQuery")
+    duplicates = allele_query.objects.values("owner", "allele").annotate(
+        rows=Count("id"),
+    ).filter(rows__gt=1)
+    for duplicate in duplicates:
+        rows = list(allele_query.objects.filter(
+            owner=duplicate["owner"], allele=duplicate["allele"],
+        ).order_by("-last_used", "-id"))
+        kept = rows[0]
+        if not kept.note:
+            kept.note = next((row.note for row in rows if row.note), "")
+            kept.save(update_fields=["note"])
+        allele_query.objects.filter(
+            id__in=[row.id for row in rows[1:]],
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web_annotation", "0041_quota_reservations"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_allele_queries,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="allelequery",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "allele"), name="unique_allele_query"
+            ),
+        ),
+    ]
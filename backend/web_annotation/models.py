@@ -3,17 +3,22 @@
 from __future__ import annotations
 
 from abc import abstractmethod
+from functools import reduce
+import operator
 import time
 import uuid
 import os
 import pathlib
 import logging
-from datetime import timedelta
-from typing import Any, cast
+from datetime import datetime, timedelta
+from typing import Any, ClassVar, cast
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, AnonymousUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import LessThan, LessThanOrEqual
 from django.utils import timezone
 
 from web_annotation.mail import send_email
@@ -300,6 +305,7 @@ class User(AbstractUser):
         """Get the quota for this user."""
         try:
             quota = UserQuota.objects.get(user=self)
+            quota.reset_expired_periods()
             return quota
         except UserQuota.DoesNotExist:
             quota = UserQuota(user=self)
@@ -383,6 +389,7 @@ class WebAnnotationAnonymousUser(BaseUser, AnonymousUser):
         """Get the quota for this IP."""
         try:
             quota = AnonymousUserQuota.objects.get(ip=self.ip)
+            quota.reset_expired_periods()
             return quota
         except AnonymousUserQuota.DoesNotExist:
             quota = AnonymousUserQuota(ip=self.ip)
@@ -478,6 +485,14 @@ class TemporaryPipeline(BasePipeline):
 
 class AlleleQuery(models.Model):
     """Model for saving user created pipeline configs"""
+    class Meta:  # pylint: disable=too-few-public-methods
+        """Meta class for allele query model."""
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "allele"],
+                name="unique_allele_query",
+            )
+        ]
     allele = models.CharField(max_length=1024)
     owner = models.ForeignKey(
         'web_annotation.User',
@@ -500,6 +515,7 @@ class BaseJob(models.Model):
         IN_PROGRESS = 2
         SUCCESS = 3
         FAILED = 4
+        CANCELLED = 5
 
     input_path = models.FilePathField()
     config_path = models.FilePathField()
@@ -515,6 +531,70 @@ class BaseJob(models.Model):
     disk_size = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
 
+    # Persistent job queue bookkeeping, see web_annotation.job_queue.
+    queued_at = models.DateTimeField(null=True, default=None)
+    worker_id = models.CharField(max_length=256, default="")
+    lease_expires_at = models.DateTimeField(null=True, default=None)
+    attempts = models.IntegerField(default=0)
+
+    # Number of input variants, recorded when the input is uploaded so that
+    # finished jobs can be charged without rereading their input.
+    # None when the job predates this or its input was unreadable.
+    variant_count = models.IntegerField(null=True, default=None)
+    # Number of non-internal pipeline attributes, recorded at submission.
+    attributes_count = models.IntegerField(null=True, default=None)
+    # Whether the job holds a reservation on its owner's quota.
+    quota_reserved = models.BooleanField(default=False)
+
+    @property
+    def owner_identifier(self) -> str:
+        """Get the identifier of the job's owner."""
+        raise NotImplementedError
+
+    def get_socket_group(self) -> str:
+        """Get socket group of the job's owner."""
+        raise NotImplementedError
+
+    def get_owner_quota(self) -> Quota:
+        """Get the quota of the job's owner."""
+        raise NotImplementedError
+
+    def get_job_details(self) -> BaseJobDetails:
+        """Get or initiate job details."""
+        raise NotImplementedError
+
+    def reserve_quota(self) -> bool:
+        """
+        Reserve the owner's quota for a saved job before it runs.
+
+        Returns False if the job does not fit in the quota left over by the
+        owner's other unfinished jobs.
+        """
+        # The quota row stays locked until the job is marked, so that
+        # reconciliation never sees the reservation without its job.
+        with transaction.atomic():
+            if not self.get_owner_quota().reserve_job(
+                self.variant_count or 0, self.attributes_count or 0,
+            ):
+                return False
+            self.quota_reserved = True
+            self.save(update_fields=["quota_reserved"])
+        return True
+
+    def release_quota(self, quota: Quota | None = None) -> None:
+        """Release the quota reserved for the job, if it still holds any."""
+        if not self.quota_reserved:
+            return
+        released = type(self).objects.filter(
+            pk=self.pk, quota_reserved=True,
+        ).update(quota_reserved=False)
+        self.quota_reserved = False
+        if not released:
+            return
+        if quota is None:
+            quota = self.get_owner_quota()
+        quota.release_job(self.variant_count or 0, self.attributes_count or 0)
+
     def _cleanup_files(self) -> None:
         """Clean up job files."""
         os.remove(self.input_path)
@@ -525,12 +605,14 @@ class BaseJob(models.Model):
     def deactivate(self) -> None:
         """Diactivate a job and clean its resources."""
         self.is_active = False
+        self.release_quota()
         self._cleanup_files()
         self.disk_size = 0
         self.save()
 
     def delete(self, *args: Any, **kwargs: Any) -> tuple[int, dict[str, int]]:
         """Delete a job and its resources."""
+        self.release_quota()
         self._cleanup_files()
         return super().delete(*args, **kwargs)
 
@@ -548,6 +630,26 @@ class BaseJob(models.Model):
         self.status = Job.Status.IN_PROGRESS
         self.save()
 
+    def cancel(self) -> bool:
+        """
+        Cancel a waiting or running job.
+
+        Running jobs stop at their next cancellation checkpoint. Returns
+        False if the job has already finished.
+        """
+        cancelled = type(self).objects.filter(
+            pk=self.pk,
+            status__in=[Job.Status.WAITING, Job.Status.IN_PROGRESS],
+        ).update(
+            status=Job.Status.CANCELLED,
+            error="Job was cancelled.",
+            lease_expires_at=None,
+        )
+        self.refresh_from_db()
+        if cancelled:
+            self.release_quota()
+        return cancelled == 1
+
     def update_job_failed(self, args: str, exc: str) -> None:
         """Update a job's state to failed."""
         if self.status != Job.Status.IN_PROGRESS:
@@ -608,6 +710,19 @@ class Job(BaseJob):
             [self.owner.identifier],
         )
 
+    @property
+    def owner_identifier(self) -> str:
+        """Get the identifier of the job's owner."""
+        return self.owner.identifier
+
+    def get_socket_group(self) -> str:
+        """Get socket group of the job's owner."""
+        return self.owner.get_socket_group()
+
+    def get_owner_quota(self) -> Quota:
+        """Get the quota of the job's owner."""
+        return self.owner.get_quota()
+
     def get_job_details(self) -> JobDetails:
         """Get or initiate job details."""
         try:
@@ -624,6 +739,20 @@ class AnonymousJob(BaseJob):
     owner = models.CharField(max_length=1024)
     ip = models.CharField(max_length=256, default="")
 
+    @property
+    def owner_identifier(self) -> str:
+        """Get the identifier of the job's owner."""
+        return self.owner
+
+    def get_socket_group(self) -> str:
+        """Get socket group of the job's owner."""
+        return self.owner
+
+    def get_owner_quota(self) -> Quota:
+        """Get the quota of the job's owner."""
+        session_id = self.owner.removeprefix("anon_")
+        return WebAnnotationAnonymousUser(session_id, self.ip).get_quota()
+
     def get_job_details(self) -> AnonymousJobDetails:
         """Get or initiate job details."""
         try:
@@ -652,6 +781,10 @@ class BaseJobDetails(models.Model):
     separator = models.CharField(max_length=1, null=True)
     columns = models.TextField()
 
+    # Upload inspection results, see AnnotationBaseView._save_upload_details.
+    compression = models.CharField(max_length=16, default="")
+    head = models.JSONField(null=True, default=None)
+
 
 class JobDetails(BaseJobDetails):
     """Model for storing job details for tsv files."""
@@ -781,6 +914,21 @@ class Quota(models.Model):
     extra_variants = models.IntegerField(default=0)
     extra_attributes = models.IntegerField(default=0)
 
+    EXTRA_FIELDS = (
+        "extra_jobs", "extra_allele_queries",
+        "extra_variants", "extra_attributes",
+    )
+
+    # Usage held by submitted jobs that have not finished yet.
+    reserved_jobs = models.IntegerField(default=0)
+    reserved_variants = models.IntegerField(default=0)
+    reserved_attributes = models.IntegerField(default=0)
+
+    # The job model charged to quotas of this type, and the job and quota
+    # fields that identify the owner.
+    JOB_MODEL: ClassVar[type[BaseJob]]
+    JOB_OWNER_FIELDS: ClassVar[tuple[str, str]]
+
     class Meta:  # pylint: disable=too-few-public-methods
         """Meta class for quota model."""
         abstract = True
@@ -822,26 +970,122 @@ class Quota(models.Model):
         """Get the maximum number of monthly attributes allowed."""
         return cast(int, self._quota_config()["monthly_attributes"])
 
+    def daily_reset_values(self) -> dict[str, int]:
+        """Get the values the daily quota counts are reset to."""
+        return {
+            "daily_jobs": self.get_daily_job_max(),
+            "daily_allele_queries": self.get_daily_allele_query_max(),
+            "daily_variants": self.get_daily_variant_max(),
+            "daily_attributes": self.get_daily_attribute_max(),
+        }
+
+    def monthly_reset_values(self) -> dict[str, int]:
+        """Get the values the monthly quota counts are reset to."""
+        return {
+            "monthly_jobs": self.get_monthly_job_max(),
+            "monthly_allele_queries": self.get_monthly_allele_query_max(),
+            "monthly_variants": self.get_monthly_variant_max(),
+            "monthly_attributes": self.get_monthly_attribute_max(),
+        }
+
     def reset_daily(self) -> None:
         """Reset all daily quota counts."""
-        now = timezone.now()
-        self.daily_jobs = self.get_daily_job_max()
-        self.daily_allele_queries = self.get_daily_allele_query_max()
-        self.daily_variants = self.get_daily_variant_max()
-        self.daily_attributes = self.get_daily_attribute_max()
-        self.last_daily_reset = now
+        for field, value in self.daily_reset_values().items():
+            setattr(self, field, value)
+        self.last_daily_reset = timezone.now()
         self.save()
 
     def reset_monthly(self) -> None:
         """Reset all monthly quota counts."""
-        now = timezone.now()
-        self.monthly_jobs = self.get_monthly_job_max()
-        self.monthly_allele_queries = self.get_monthly_allele_query_max()
-        self.monthly_variants = self.get_monthly_variant_max()
-        self.monthly_attributes = self.get_monthly_attribute_max()
-        self.last_monthly_reset = now
+        for field, value in self.monthly_reset_values().items():
+            setattr(self, field, value)
+        self.last_monthly_reset = timezone.now()
         self.save()
 
+    @staticmethod
+    def period_starts(now: datetime) -> tuple[datetime, datetime]:
+        """Get the start of the current day and month in local time."""
+        day_start = timezone.localtime(now).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        return day_start, day_start.replace(day=1)
+
+    def reset_expired_periods(self) -> None:
+        """
+        Reset the daily and monthly counts if their period rolled over.
+
+        The reset is a conditional UPDATE on the last reset timestamp, so
+        that concurrent readers reset a period only once.
+        """
+        day_start, month_start = self.period_starts(timezone.now())
+        if self.last_daily_reset < day_start:
+            self._reset_period(
+                self.daily_reset_values(), "last_daily_reset", day_start)
+        if self.last_monthly_reset < month_start:
+            self._reset_period(
+                self.monthly_reset_values(), "last_monthly_reset",
+                month_start,
+            )
+
+    def _reset_period(
+        self, values: dict[str, Any], timestamp_field: str,
+        period_start: datetime,
+    ) -> None:
+        values = {**values, timestamp_field: timezone.now()}
+        type(self).objects.filter(
+            pk=self.pk, **{f"{timestamp_field}__lt": period_start},
+        ).update(**values)
+        self.refresh_from_db(fields=list(values))
+
+    @classmethod
+    def reset_all_daily(cls, batch_size: int | None = None) -> int:
+        """
+        Reset the daily counts of every quota of this type.
+
+        See bulk_reset for the batching. Returns the number of quotas reset.
+        """
+        values: dict[str, Any] = cls().daily_reset_values()
+        values["last_daily_reset"] = timezone.now()
+        return cls.bulk_reset(values, batch_size)
+
+    @classmethod
+    def reset_all_monthly(cls, batch_size: int | None = None) -> int:
+        """
+        Reset the monthly counts of every quota of this type.
+
+        See bulk_reset for the batching. Returns the number of quotas reset.
+        """
+        values: dict[str, Any] = cls().monthly_reset_values()
+        values["last_monthly_reset"] = timezone.now()
+        return cls.bulk_reset(values, batch_size)
+
+    @classmethod
+    def bulk_reset(
+        cls, values: dict[str, Any], batch_size: int | None = None,
+    ) -> int:
+        """
+        Set fields on every quota of this type with set-based UPDATEs.
+
+        With a batch size the table is updated in primary key ranges of at
+        most that many rows, each in its own short statement, so that a
+        large table is never locked as a whole. Returns the number of
+        quotas updated.
+        """
+        if batch_size is None:
+            return cls.objects.update(**values)
+        updated = 0
+        last_pk = 0
+        while True:
+            batch_end = cls.objects.filter(pk__gt=last_pk).order_by(
+                "pk").values_list("pk", flat=True)[batch_size - 1:batch_size]
+            end_pk = next(iter(batch_end), None)
+            if end_pk is None:
+                # The last, partial batch.
+                return updated + cls.objects.filter(
+                    pk__gt=last_pk).update(**values)
+            updated += cls.objects.filter(
+                pk__gt=last_pk, pk__lte=end_pk).update(**values)
+            last_pk = end_pk
+
     def add_units(self) -> None:
         """Add extra units to the quota."""
         self.extra_jobs = max(self.extra_jobs, 0)
@@ -858,19 +1102,22 @@ class Quota(models.Model):
 
         self.save()
 
-    def check_single_allele_quota(self) -> bool:
-        """Check if the user has quota for a single allele query."""
-        if self.extra_allele_queries > 0:
+    def check_single_allele_quota(self, queries_count: int = 1) -> bool:
+        """Check if the user has quota for a number of allele queries."""
+        if self.extra_allele_queries >= queries_count:
             return True
-        if self.daily_allele_queries <= 0 or self.monthly_allele_queries <= 0:
+        if (
+            self.daily_allele_queries < queries_count
+            or self.monthly_allele_queries < queries_count
+        ):
             return False
         return True
 
-    def check_job_quota(self) -> bool:
-        """Check if the user has quota for a job."""
-        if self.extra_jobs > 0:
+    def check_job_quota(self, jobs_count: int = 1) -> bool:
+        """Check if the user has quota for a number of jobs."""
+        if self.extra_jobs >= jobs_count:
             return True
-        if self.daily_jobs <= 0 or self.monthly_jobs <= 0:
+        if self.daily_jobs < jobs_count or self.monthly_jobs < jobs_count:
             return False
         return True
 
@@ -903,67 +1150,194 @@ class Quota(models.Model):
             return False
         return True
 
-    def single_allele_allowed(self, attributes_count: int) -> bool:
-        """Check if a single query is allowed."""
-        return self.check_single_allele_quota() \
+    def single_allele_allowed(
+        self, attributes_count: int, queries_count: int = 1,
+    ) -> bool:
+        """Check if single allele queries are allowed."""
+        return self.check_single_allele_quota(queries_count) \
             and self.check_attribute_quota(attributes_count)
 
-    def job_allowed(self, variants_count: int, attributes_count: int) -> bool:
+    def job_allowed(
+        self, variants_count: int, attributes_count: int, jobs_count: int = 1,
+    ) -> bool:
         """Check if a job is allowed based on the current quotas."""
-        return self.check_job_quota() \
+        return self.check_job_quota(jobs_count) \
             and self.check_attribute_quota(attributes_count) \
             and self.check_variant_quota(variants_count)
 
-    def _deduct(
-        self,
-        daily_field: str,
-        monthly_field: str,
-        extra_field: str,
-        amount: int,
-    ) -> None:
-        """Deduct `amount` from daily and monthly (floored at 0).
-        Only consume from extras if the more-limiting period could not fully
-        cover the amount, and only once. If extras are fully consumed,
-        zero out all extra quotas."""
-        daily_before = getattr(self, daily_field)
-        monthly_before = getattr(self, monthly_field)
-        setattr(self, daily_field, max(0, daily_before - amount))
-        setattr(self, monthly_field, max(0, monthly_before - amount))
-        extra_deduction = max(0, amount - max(daily_before, monthly_before))
-        new_extra = getattr(self, extra_field) - extra_deduction
-        setattr(self, extra_field, new_extra)
-        if new_extra <= 0 < extra_deduction:
-            self.extra_jobs = 0
-            self.extra_allele_queries = 0
-            self.extra_variants = 0
-            self.extra_attributes = 0
+    def reserve_job(self, variants_count: int, attributes_count: int) -> bool:
+        """
+        Reserve quota for a submitted job until it finishes.
+
+        The job must fit in the quota together with the existing reservations.
+        The quota row is locked while checking, so concurrent submissions
+        cannot overbook it. Returns False if the job does not fit.
+        """
+        with transaction.atomic():
+            locked = type(self).objects.select_for_update().get(pk=self.pk)
+            if not locked.job_allowed(
+                locked.reserved_variants + variants_count,
+                locked.reserved_attributes + attributes_count,
+                locked.reserved_jobs + 1,
+            ):
+                return False
+            locked.reserved_jobs += 1
+            locked.reserved_variants += variants_count
+            locked.reserved_attributes += attributes_count
+            locked.save(update_fields=[
+                "reserved_jobs", "reserved_variants", "reserved_attributes",
+            ])
+        self.reserved_jobs = locked.reserved_jobs
+        self.reserved_variants = locked.reserved_variants
+        self.reserved_attributes = locked.reserved_attributes
+        return True
+
+    def release_job(self, variants_count: int, attributes_count: int) -> None:
+        """Release a reservation made with reserve_job."""
+        type(self).objects.filter(pk=self.pk).update(
+            reserved_jobs=Greatest(F("reserved_jobs") - 1, 0),
+            reserved_variants=Greatest(
+                F("reserved_variants") - variants_count, 0),
+            reserved_attributes=Greatest(
+                F("reserved_attributes") - attributes_count, 0),
+        )
+        self.refresh_from_db(fields=[
+            "reserved_jobs", "reserved_variants", "reserved_attributes",
+        ])
+
+    @classmethod
+    def reconcile_reservations(cls) -> int:
+        """
+        Recompute the reservations of every quota of this type from its jobs.
+
+        Reservations are released when their jobs end, so jobs that never
+        end, e.g. because their worker was killed, would hold them forever.
+        Jobs that are no longer active and waiting or running give up their
+        reservations, and the reservations of each quota are recounted from
+        the jobs that still hold one. Each quota row is locked while it is
+        recounted, so concurrent reservations are not lost. Returns the
+        number of quotas corrected.
+        """
+        job_field, owner_field = cls.JOB_OWNER_FIELDS
+        unfinished = [BaseJob.Status.WAITING, BaseJob.Status.IN_PROGRESS]
+        cls.JOB_MODEL.objects.filter(quota_reserved=True).exclude(
+            is_active=True, status__in=unfinished,
+        ).update(quota_reserved=False)
+        reserving = cls.JOB_MODEL.objects.filter(quota_reserved=True)
+        candidates = cls.objects.filter(
+            Q(reserved_jobs__gt=0)
+            | Q(reserved_variants__gt=0)
+            | Q(reserved_attributes__gt=0)
+            | Q(**{f"{owner_field}__in": reserving.values(job_field)}),
+        ).values_list("pk", flat=True)
+        corrected = 0
+        for pk in list(candidates):
+            with transaction.atomic():
+                quota = cls.objects.select_for_update().get(pk=pk)
+                jobs = list(reserving.filter(
+                    **{job_field: getattr(quota, owner_field)},
+                ).values_list("variant_count", "attributes_count"))
+                reserved = {
+                    "reserved_jobs": len(jobs),
+                    "reserved_variants": sum(v or 0 for v, _ in jobs),
+                    "reserved_attributes": sum(a or 0 for _, a in jobs),
+                }
+                if all(
+                    getattr(quota, field) == value
+                    for field, value in reserved.items()
+                ):
+                    continue
+                cls.objects.filter(pk=pk).update(**reserved)
+                corrected += 1
+        return corrected
+
+    def _consume(self, *deductions: tuple[str, str, str, int]) -> None:
+        """
+        Atomically consume quota with a single conditional UPDATE.
+
+        Each deduction is a (daily, monthly, extra, amount) tuple. The amount
+        is deducted from daily and monthly (floored at 0). Extras are only
+        consumed if the more-limiting period could not fully cover the amount.
+        If any deduction uses up its extras, all extra quotas are zeroed.
+
+        The new values are computed by the database from the stored row, so
+        concurrent requests cannot lose each other's updates. Periods that
+        rolled over since their last reset are reset in the same UPDATE,
+        before the amounts are deducted. The updated fields are reloaded
+        afterwards.
+        """
+        now = timezone.now()
+        day_start, month_start = self.period_starts(now)
+        rollovers = {
+            "last_daily_reset": (
+                Q(last_daily_reset__lt=day_start), self.daily_reset_values()),
+            "last_monthly_reset": (
+                Q(last_monthly_reset__lt=month_start),
+                self.monthly_reset_values(),
+            ),
+        }
+        current: dict[str, Any] = {}
+        updates: dict[str, Any] = {}
+        for timestamp_field, (rolled_over, values) in rollovers.items():
+            for field, value in values.items():
+                current[field] = Case(
+                    When(rolled_over, then=Value(value)), default=F(field))
+                updates[field] = current[field]
+            updates[timestamp_field] = Case(
+                When(rolled_over, then=Value(now)), default=F(timestamp_field))
+
+        extra_deductions: dict[str, Any] = {}
+        exhausted: list[Q] = []
+        for daily_field, monthly_field, extra_field, amount in deductions:
+            daily, monthly = current[daily_field], current[monthly_field]
+            updates[daily_field] = Greatest(daily - amount, 0)
+            updates[monthly_field] = Greatest(monthly - amount, 0)
+            covered = Greatest(daily, monthly)
+            extra_deductions[extra_field] = Greatest(amount - covered, 0)
+            # The extras run out when they cannot cover the remainder.
+            exhausted.append(Q(
+                LessThan(covered, amount),
+                LessThanOrEqual(F(extra_field) + covered, amount),
+            ))
+        for extra_field in self.EXTRA_FIELDS:
+            remaining = F(extra_field)
+            if extra_field in extra_deductions:
+                remaining = remaining - extra_deductions[extra_field]
+            updates[extra_field] = Case(
+                When(reduce(operator.or_, exhausted), then=Value(0)),
+                default=remaining,
+            )
+        type(self).objects.filter(pk=self.pk).update(**updates)
+        self.refresh_from_db(fields=list(updates))
 
     def job_complete(self, variants_count: int, attributes_count: int) -> None:
         """Update quotas after a job is completed."""
-        self._deduct("daily_jobs", "monthly_jobs", "extra_jobs", 1)
-        self._deduct(
-            "daily_variants", "monthly_variants",
-            "extra_variants",
-            variants_count,
-        )
-        self._deduct(
-            "daily_attributes", "monthly_attributes",
-            "extra_attributes",
-            attributes_count,
+        self._consume(
+            ("daily_jobs", "monthly_jobs", "extra_jobs", 1),
+            (
+                "daily_variants", "monthly_variants", "extra_variants",
+                variants_count,
+            ),
+            (
+                "daily_attributes", "monthly_attributes", "extra_attributes",
+                attributes_count,
+            ),
         )
-        self.save()
 
-    def single_allele_query_complete(self, attributes_count: int) -> None:
-        """Update quotas after a single allele query is completed."""
-        self._deduct(
-            "daily_allele_queries", "monthly_allele_queries",
-            "extra_allele_queries", 1,
-        )
-        self._deduct(
-            "daily_attributes", "monthly_attributes",
-            "extra_attributes", attributes_count,
+    def single_allele_query_complete(
+        self, attributes_count: int, queries_count: int = 1,
+    ) -> None:
+        """Update quotas after single allele queries are completed."""
+        self._consume(
+            (
+                "daily_allele_queries", "monthly_allele_queries",
+                "extra_allele_queries", queries_count,
+            ),
+            (
+                "daily_attributes", "monthly_attributes", "extra_attributes",
+                attributes_count,
+            ),
         )
-        self.save()
 
 
 class AnonymousUserQuota(Quota):
@@ -971,6 +1345,9 @@ class AnonymousUserQuota(Quota):
 
     ip = models.CharField(max_length=256, default="")
 
+    JOB_MODEL = AnonymousJob
+    JOB_OWNER_FIELDS = ("ip", "ip")
+
     class Meta:  # pylint: disable=too-few-public-methods
         """Meta class for anonymous user quotas."""
         db_table = "anonymous_user_quotas"
@@ -988,6 +1365,9 @@ class UserQuota(Quota):
         on_delete=models.CASCADE,
     )
 
+    JOB_MODEL = Job
+    JOB_OWNER_FIELDS = ("owner_id", "user_id")
+
     class Meta:  # pylint: disable=too-few-public-methods
         """Meta class for user quotas."""
         db_table = "user_quotas"
@@ -1,11 +1,16 @@
 """Module for thread-safe annotation utilities."""
+from collections import OrderedDict
+from collections.abc import Iterator
 from concurrent.futures import CancelledError, Future
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
 import logging
+from queue import Queue
 from threading import Lock, RLock
 import time
 from types import TracebackType
-from typing import Callable, Sequence
+from typing import Any, Callable, Sequence, cast
 from gain.annotation.annotatable import Annotatable
 from gain.annotation.annotation_config import (
     AnnotationPreamble,
@@ -16,22 +21,313 @@ from gain.annotation.annotation_config import (
 from gain.annotation.annotation_pipeline import AnnotationPipeline, Annotator
 from gain.genomic_resources.repository import GenomicResourceRepo
 
-from gain.annotation.annotation_factory import load_pipeline_from_yaml
+from gain.annotation.annotation_factory import (
+    build_annotation_pipeline,
+    load_pipeline_from_yaml,
+)
 
+from web_annotation.cancellation import check_cancelled
 from web_annotation.executor import ThreadedTaskExecutor
 
 
 logger = logging.getLogger(__name__)
 
+# Index files kept in memory by resources whose data is read on demand.
+INDEX_FILE_SUFFIXES = (".tbi", ".csi", ".fai")
+# Resources without an index are loaded whole; parsed in-memory structures
+# are larger than their on-disk representation.
+IN_MEMORY_EXPANSION_FACTOR = 4
+
+
+def estimate_resource_size(
+    grr: GenomicResourceRepo, resource_id: str,
+) -> int:
+    """Estimate the resident memory footprint of an opened resource."""
+    resource = grr.get_resource(resource_id)
+    entries = [
+        entry for entry in resource.get_manifest()
+        if not entry.name.startswith(("statistics/", ".grr"))
+        and not entry.name.endswith(".html")
+        and entry.name != "genomic_resource.yaml"
+    ]
+    indexes = [
+        entry for entry in entries
+        if entry.name.endswith(INDEX_FILE_SUFFIXES)
+    ]
+    if indexes:
+        return sum(entry.size for entry in indexes)
+    return sum(entry.size for entry in entries) * IN_MEMORY_EXPANSION_FACTOR
+
+
+def estimate_pipeline_size(
+    pipeline: AnnotationPipeline,
+    resource_ids: set[str] | None = None,
+) -> int:
+    """Estimate the resident memory footprint of an opened pipeline."""
+    if resource_ids is None:
+        resource_ids = pipeline.get_resource_ids()
+    size = 0
+    for resource_id in resource_ids:
+        try:
+            size += estimate_resource_size(pipeline.repository, resource_id)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(
+                "Could not estimate size of resource %s", resource_id)
+    return size
+
+
+def _params_key(params: Any) -> str:
+    try:
+        return repr(sorted(
+            (str(name), repr(value)) for name, value in dict(params).items()
+        ))
+    except (TypeError, ValueError):
+        return repr(params)
+
+
+def annotator_key(
+    annotator: Annotator, grr: GenomicResourceRepo,
+) -> tuple:
+    """
+    Build a key identifying annotators that can be shared.
+
+    Two annotators are interchangeable when they have the same type,
+    parameters and attributes and use the same versions of their resources.
+    The annotator ID is positional and is not part of the key.
+    """
+    info = annotator.get_info()
+    resources = tuple(sorted(
+        (resource_id, grr.get_resource(resource_id).version)
+        for resource_id in annotator.resource_ids
+    ))
+    attributes = tuple(
+        (
+            attribute.name,
+            attribute.source,
+            attribute.internal,
+            _params_key(attribute.parameters),
+        )
+        for attribute in info.attributes
+    )
+    return (info.type, _params_key(info.parameters), attributes, resources)
+
+
+@dataclass
+class SharedEntry:
+    """
+    An annotator opened once and shared by several pipelines.
+
+    The entry's memory footprint is accounted to its first holder; when the
+    holder releases the entry, the next one takes over.
+    """
+    annotator: Annotator
+    size: int = 0
+    holders: list["SharedAnnotator"] = field(default_factory=list)
+    lock: Lock = field(default_factory=Lock)
+    refs_lock: Lock = field(default_factory=Lock)
+
+    @property
+    def owner(self) -> "SharedAnnotator | None":
+        """Return the holder the entry's footprint is accounted to."""
+        with self.refs_lock:
+            return self.holders[0] if self.holders else None
+
+    def held_only_by(self, holders: list["SharedAnnotator"]) -> bool:
+        """Check if the entry is referenced by the given holders only."""
+        with self.refs_lock:
+            return all(
+                any(holder is other for other in holders)
+                for holder in self.holders
+            )
+
+    def acquire(self, holder: "SharedAnnotator") -> None:
+        """Take a reference, opening the annotator for the first one."""
+        with self.refs_lock:
+            if not self.holders:
+                self.annotator.open()
+            self.holders.append(holder)
+
+    def release(self, holder: "SharedAnnotator") -> bool:
+        """Drop a reference, closing the annotator with the last one."""
+        with self.refs_lock:
+            self.holders.remove(holder)
+            if not self.holders:
+                self.annotator.close()
+            return not self.holders
+
+
+class SharedAnnotator(Annotator):
+    """
+    Pipeline-local handle to a shared annotator.
+
+    The handle keeps the annotator info of its own pipeline and delegates
+    annotation to the shared annotator. Calls on an entry are serialized,
+    since the underlying resources are not thread-safe; every replica slot
+    has its own entries, so the replicas of a pipeline never wait for each
+    other.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, pipeline: AnnotationPipeline, info: AnnotatorInfo,
+        registry: "SharedAnnotators", key: tuple, entry: SharedEntry,
+    ):
+        super().__init__(pipeline, info)
+        self._registry = registry
+        self._key = key
+        self._entry = entry
+        self._is_open = False
+
+    @property
+    def annotator(self) -> Annotator:
+        """Return the shared annotator."""
+        return self._entry.annotator
+
+    @property
+    def entry(self) -> SharedEntry:
+        """Return the shared entry behind the handle."""
+        return self._entry
+
+    @property
+    def resource_ids(self) -> set[str]:
+        return self.annotator.resource_ids
+
+    @property
+    def used_context_attributes(self) -> tuple[str, ...]:
+        return self.annotator.used_context_attributes
+
+    @property
+    def size(self) -> int:
+        """Return the footprint of the shared annotator, if owned."""
+        return self._entry.size if self._entry.owner is self else 0
+
+    def is_open(self) -> bool:
+        return self._is_open
+
+    def open(self) -> Annotator:
+        if not self._is_open:
+            self._entry.acquire(self)
+            self._is_open = True
+        return self
+
+    def close(self) -> None:
+        if self._is_open:
+            self._is_open = False
+            if self._entry.release(self):
+                self._registry.discard(self._key, self._entry)
+
+    def annotate(
+        self, annotatable: Annotatable | None, context: dict[str, Any],
+    ) -> dict[str, Any]:
+        with self._entry.lock:
+            return self._entry.annotator.annotate(annotatable, context)
+
+    def batch_annotate(
+        self, annotatables: list[Annotatable | None],
+        contexts: list[dict[str, Any]],
+        batch_work_dir: str | None = None,
+    ) -> list[dict[str, Any]]:
+        with self._entry.lock:
+            return self._entry.annotator.batch_annotate(
+                annotatables, contexts, batch_work_dir=batch_work_dir)
+
+
+def unwrap_annotator(annotator: Annotator) -> Annotator:
+    """Return the annotator behind a shared annotator handle."""
+    if isinstance(annotator, SharedAnnotator):
+        return annotator.annotator
+    return annotator
+
+
+class SharedAnnotators:
+    """Reference-counted registry of annotators opened by cached pipelines."""
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple, SharedEntry] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def share(self, pipeline: AnnotationPipeline, slot: int = 0) -> None:
+        """
+        Replace the annotators of an unopened pipeline with shared ones.
+
+        Pipelines share annotators with the replicas in the same slot of
+        other pipelines.
+        """
+        shared: list[Annotator] = []
+        for annotator in pipeline.annotators:
+            key = (annotator_key(annotator, pipeline.repository), slot)
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                size = estimate_pipeline_size(
+                    pipeline, annotator.resource_ids)
+                with self._lock:
+                    entry = self._entries.setdefault(
+                        key, SharedEntry(annotator, size))
+            shared.append(SharedAnnotator(
+                pipeline, annotator.get_info(), self, key, entry,
+            ))
+        pipeline.annotators = shared
+
+    def discard(self, key: tuple, entry: SharedEntry) -> None:
+        """Forget an entry that is no longer referenced."""
+        with self._lock:
+            if entry.owner is None and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def total_size(self) -> int:
+        """Return the estimated footprint of the opened shared annotators."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return sum(
+            entry.size for entry in entries if entry.owner is not None
+        )
+
 
 class ThreadSafePipeline(AnnotationPipeline):
-    """Thread-safe annotation pipeline wrapper."""
+    """
+    Thread-safe annotation pipeline wrapper.
+
+    The wrapper holds a pool of opened replicas of the same pipeline. Each
+    annotation call checks out a free replica, so up to ``len(replicas)``
+    calls can run concurrently. The first replica is the primary one and is
+    used for all introspection (annotators, attributes, info).
+    """
 
     def __init__(
         self, pipeline: AnnotationPipeline,
+        replicas: Sequence[AnnotationPipeline] = (),
+        max_idle_job_replicas: int = 1,
+        config_hash: int | None = None,
     ):  # pylint: disable=super-init-not-called
         self.pipeline = pipeline
+        # Hash of the configuration the pipeline was loaded from, if known.
+        self.config_hash = config_hash
+        self.replicas = [pipeline, *replicas]
         self.lock = Lock()
+        self._pool: Queue[AnnotationPipeline | None] = Queue()
+        for replica in self.replicas:
+            self._pool.put(replica)
+        self.private_size = 0
+
+        self.max_idle_job_replicas = max_idle_job_replicas
+        self._job_replicas: list[AnnotationPipeline] = []
+        self._leased = 0
+        self._closed = False
+
+        self._memo: dict[str, Any] = {}
+        self._memo_lock = Lock()
+
+        self._stats_lock = Lock()
+        self._created = time.time()
+        self._calls = 0
+        self._in_use = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._busy_time = 0.0
 
     @property
     def annotators(self) -> list[Annotator]:  # type: ignore
@@ -53,6 +349,35 @@ class ThreadSafePipeline(AnnotationPipeline):
         """Return the pipeline's repository"""
         return self.pipeline.repository
 
+    @property
+    def size(self) -> int:
+        """
+        Return the estimated memory footprint of the pipeline.
+
+        Shared annotators are counted by the pipeline they are accounted to.
+        """
+        return self.private_size + sum(
+            annotator.size
+            for replica in self.replicas
+            for annotator in replica.annotators
+            if isinstance(annotator, SharedAnnotator)
+        )
+
+    @property
+    def exclusive_size(self) -> int:
+        """Return the estimated footprint freed by closing the pipeline."""
+        handles = [
+            annotator
+            for replica in self.replicas
+            for annotator in replica.annotators
+            if isinstance(annotator, SharedAnnotator)
+        ]
+        entries = {id(handle.entry): handle.entry for handle in handles}
+        return self.private_size + sum(
+            entry.size for entry in entries.values()
+            if entry.held_only_by(handles)
+        )
+
     @property
     def _is_open(self) -> bool:  # type: ignore
         """Return whether the pipeline is open."""
@@ -78,32 +403,157 @@ class ThreadSafePipeline(AnnotationPipeline):
 
     def add_annotator(self, annotator: Annotator) -> None:
         with self.lock:
+            if len(self.replicas) > 1:
+                raise ValueError(
+                    "Cannot add an annotator to a replicated pipeline!")
             self.pipeline.add_annotator(annotator)
+            idle, self._job_replicas = self._job_replicas, []
+        for replica in idle:
+            replica.close()
+
+    @contextmanager
+    def checkout(self) -> Iterator[AnnotationPipeline]:
+        """
+        Check out a free pipeline replica for exclusive use.
+
+        Replicas checked out when the pipeline is closed are closed once
+        they are returned.
+        """
+        started = time.time()
+        replica = self._pool.get()
+        if replica is None:
+            self._pool.put(None)
+            raise ValueError("Cannot annotate with a closed pipeline!")
+        acquired = time.time()
+        waited = acquired - started
+        with self._stats_lock:
+            self._calls += 1
+            self._in_use += 1
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        try:
+            yield replica
+        finally:
+            with self._stats_lock:
+                self._in_use -= 1
+                self._busy_time += time.time() - acquired
+            with self.lock:
+                closed = self._closed
+                if not closed:
+                    self._pool.put(replica)
+            if closed:
+                replica.close()
+
+    @contextmanager
+    def lease(self) -> Iterator[AnnotationPipeline]:
+        """
+        Lease an opened pipeline replica for exclusive use by a file job.
+
+        Job replicas are kept apart from the single allele pool, so a long
+        job does not block interactive annotation. Idle job replicas are
+        reused by the following jobs; a replica is built and opened only
+        when none is idle. Opening and closing the leased pipeline are
+        no-ops.
+        """
+        with self.lock:
+            if self._closed:
+                raise ValueError("Cannot lease from a closed pipeline!")
+            replica = self._job_replicas.pop() if self._job_replicas else None
+            self._leased += 1
+        reusable = False
+        try:
+            if replica is None:
+                replica = build_annotation_pipeline(self.raw, self.repository)
+                replica.open()
+            yield LeasedPipeline(replica)
+            reusable = True
+        finally:
+            with self.lock:
+                self._leased -= 1
+                keep = (
+                    reusable
+                    and not self._closed
+                    and len(self._job_replicas) < self.max_idle_job_replicas
+                )
+                if keep:
+                    assert replica is not None
+                    self._job_replicas.append(replica)
+            if replica is not None and not keep:
+                replica.close()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Return wait-time and utilization statistics for the pool."""
+        with self.lock:
+            job_replicas = {
+                "job_replicas_idle": len(self._job_replicas),
+                "job_replicas_leased": self._leased,
+            }
+        with self._stats_lock:
+            elapsed = max(time.time() - self._created, 1e-9)
+            return {
+                "replicas": len(self.replicas),
+                "in_use": self._in_use,
+                "calls": self._calls,
+                "wait_time_total": self._wait_time,
+                "wait_time_avg": (
+                    self._wait_time / self._calls if self._calls else 0.0
+                ),
+                "wait_time_max": self._max_wait_time,
+                "utilization": (
+                    self._busy_time / (elapsed * len(self.replicas))
+                ),
+                **job_replicas,
+            }
+
+    def memo(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Get a value derived from the pipeline, computing it only once.
+
+        Memoized values live as long as the pipeline, so they are dropped
+        when the pipeline is evicted from or reloaded in the cache.
+        """
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = factory()
+            return self._memo[key]
 
     def annotate(
         self, annotatable: Annotatable | None,
         context: dict | None = None,
     ) -> dict:
-        with self.lock:
-            return self.pipeline.annotate(annotatable, context)
+        with self.checkout() as pipeline:
+            return pipeline.annotate(annotatable, context)
 
     def batch_annotate(
         self, annotatables: Sequence[Annotatable | None],
         contexts: list[dict] | None = None,
         batch_work_dir: str | None = None,
     ) -> list[dict]:
-        with self.lock:
-            return self.pipeline.batch_annotate(
+        with self.checkout() as pipeline:
+            return pipeline.batch_annotate(
                 annotatables, contexts=contexts, batch_work_dir=batch_work_dir,
             )
 
     def open(self) -> AnnotationPipeline:
         with self.lock:
+            for replica in self.replicas[1:]:
+                replica.open()
             return self.pipeline.open()
 
     def close(self) -> None:
         with self.lock:
-            self.pipeline.close()
+            if self._closed:
+                return
+            self._closed = True
+            idle, self._job_replicas = self._job_replicas, []
+            while not self._pool.empty():
+                replica = self._pool.get_nowait()
+                if replica is not None:
+                    idle.append(replica)
+            # Wakes up callers waiting for a replica.
+            self._pool.put(None)
+        for replica in idle:
+            replica.close()
 
     def print(self) -> None:
         self.pipeline.print()
@@ -124,6 +574,93 @@ class ThreadSafePipeline(AnnotationPipeline):
         return exc_type is None
 
 
+class LeasedPipeline(ThreadSafePipeline):
+    """
+    Opened job replica handed out by ``ThreadSafePipeline.lease``.
+
+    Every annotation call is a cancellation checkpoint for the job running
+    in the current thread.
+    """
+
+    def annotate(
+        self, annotatable: Annotatable | None,
+        context: dict | None = None,
+    ) -> dict:
+        check_cancelled()
+        return super().annotate(annotatable, context)
+
+    def batch_annotate(
+        self, annotatables: Sequence[Annotatable | None],
+        contexts: list[dict] | None = None,
+        batch_work_dir: str | None = None,
+    ) -> list[dict]:
+        check_cancelled()
+        return super().batch_annotate(
+            annotatables, contexts=contexts, batch_work_dir=batch_work_dir,
+        )
+
+    def open(self) -> AnnotationPipeline:
+        return self
+
+    def close(self) -> None:
+        return
+
+
+def annotatable_key(annotatable: Annotatable) -> str:
+    """Return a normalized key identifying an annotatable."""
+    return f"{type(annotatable).__name__}:{annotatable}"
+
+
+class AnnotationResultCache:
+    """
+    Bounded LRU cache of single annotatable annotation results.
+
+    Results are keyed by pipeline ID, pipeline configuration hash and the
+    normalized annotatable. A capacity of 0 disables the cache. Cached
+    results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._results: OrderedDict[tuple[str, int, str], dict] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+    def get(self, key: tuple[str, int, str]) -> dict | None:
+        """Get a cached result, marking it as recently used."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._results.move_to_end(key)
+            return result
+
+    def put(self, key: tuple[str, int, str], result: dict) -> None:
+        """Cache a result, evicting the least recently used ones."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+
+    def invalidate(self, pipeline_id: str) -> None:
+        """Drop all cached results of a pipeline."""
+        with self._lock:
+            for key in [
+                key for key in self._results if key[0] == pipeline_id
+            ]:
+                del self._results[key]
+
+
 @dataclass
 class LoadingDetails:
     """Utility for identifying which pipeline is being loaded."""
@@ -137,14 +674,27 @@ class LoadingDetails:
 
 
 class LRUPipelineCache:
-    """LRU cache that wraps and provides thread-safe annotation pipelines."""
+    """
+    LRU cache that wraps and provides thread-safe annotation pipelines.
 
-    def __init__(
+    Pipelines are evicted when the cache holds more than ``capacity``
+    entries or, when ``max_bytes`` is set, when the estimated memory
+    footprint of the loaded pipelines exceeds it.
+
+    Annotators with identical configuration and resources are opened once
+    and shared between the cached pipelines.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         grr: GenomicResourceRepo,
         capacity: int,
         load_workers: int = 8,
         load_timeout: float = 5 * 60,
+        replicas: int = 1,
+        max_bytes: int | None = None,
+        idle_job_replicas: int = 1,
+        result_cache_size: int = 0,
     ):
         self._grr = grr
         self._load_executor = ThreadedTaskExecutor(
@@ -154,10 +704,15 @@ class LRUPipelineCache:
         self._load_timeout = load_timeout
 
         self.capacity = capacity
+        self.replicas = replicas
+        self.max_bytes = max_bytes
+        self.idle_job_replicas = idle_job_replicas
         self._cache: dict[str, LoadingDetails] = {}
         self._pipeline_callbacks: dict[str, Callable | None] = {}
         self._cache_lock: RLock = RLock()
         self._order: list[str] = []
+        self._shared = SharedAnnotators()
+        self.results = AnnotationResultCache(result_cache_size)
 
     def has_pipeline(
         self, pipeline_id: str,
@@ -180,11 +735,79 @@ class LRUPipelineCache:
     def _load_pipeline_raw(
         raw: str,
         grr: GenomicResourceRepo,
+        replicas: int = 1,
+        shared: SharedAnnotators | None = None,
+        idle_job_replicas: int = 1,
+        config_hash: int | None = None,
     ) -> ThreadSafePipeline:
-        pipeline = ThreadSafePipeline(load_pipeline_from_yaml(raw, grr))
-        pipeline.open()
+        pipelines = [
+            load_pipeline_from_yaml(raw, grr) for _ in range(replicas)
+        ]
+        if shared is not None:
+            for slot, replica in enumerate(pipelines):
+                shared.share(replica, slot)
+        pipeline = ThreadSafePipeline(
+            pipelines[0],
+            pipelines[1:],
+            max_idle_job_replicas=idle_job_replicas,
+            config_hash=config_hash,
+        )
+        try:
+            pipeline.open()
+        except Exception:
+            pipeline.close()
+            raise
+
+        if shared is None:
+            pipeline.private_size = (
+                estimate_pipeline_size(pipelines[0]) * replicas)
         return pipeline
 
+    def total_size(self) -> int:
+        """Return the estimated memory footprint of the loaded pipelines."""
+        with self._cache_lock:
+            pipelines = [
+                self._get_loaded(details) for details in self._cache.values()
+            ]
+        private_size = sum(
+            pipeline.private_size
+            for pipeline in pipelines if pipeline is not None
+        )
+        return private_size + self._shared.total_size()
+
+    def _on_pipeline_loaded(
+        self,
+        pipeline_id: str,
+        callback: Callable[[], None] | None,
+    ) -> None:
+        with self._cache_lock:
+            if pipeline_id in self._cache:
+                self._evict_to_budget(keep=pipeline_id)
+        if callback is not None:
+            callback()
+
+    def _evict_to_budget(self, keep: str) -> None:
+        """Evict least recently used pipelines until within byte budget."""
+        if self.max_bytes is None:
+            return
+        with self._cache_lock:
+            total = self.total_size()
+            for pipeline_id in list(self._order):
+                if total <= self.max_bytes:
+                    return
+                if pipeline_id == keep:
+                    continue
+                pipeline = self._get_loaded(self._cache[pipeline_id])
+                if pipeline is None:
+                    continue
+                freed = pipeline.exclusive_size
+                logger.info(
+                    "Evicting pipeline %s (%d bytes) to fit cache budget",
+                    pipeline_id, freed,
+                )
+                self.delete_pipeline(pipeline_id, do_cancel=False)
+                total -= freed
+
     def put_pipeline(  # pylint: disable=too-many-arguments
         self,
         pipeline_id: str,
@@ -193,9 +816,15 @@ class LRUPipelineCache:
         begin_load_callback: Callable[[], None] | None = None,
         finish_load_callback: Callable[[], None] | None = None,
         delete_callback: Callable[[ThreadSafePipeline], None] | None = None,
-        force: bool = False
+        force: bool = False,
+        replicas: int | None = None,
     ) -> None:
-        """Put a pipeline into the cache."""
+        """
+        Put a pipeline into the cache.
+
+        The pipeline is opened with ``replicas`` copies, defaulting to the
+        cache-wide replica count.
+        """
         pipeline_config_hash = hash(pipeline_config)
         started = time.time()
         with self._cache_lock:
@@ -209,8 +838,16 @@ class LRUPipelineCache:
                 self._load_pipeline_raw,
                 raw=pipeline_config,
                 grr=self._grr,
+                replicas=max(1, replicas or self.replicas),
+                shared=self._shared,
+                idle_job_replicas=self.idle_job_replicas,
+                config_hash=pipeline_config_hash,
                 callback_start=begin_load_callback,
-                callback_success=finish_load_callback,
+                callback_success=partial(
+                    self._on_pipeline_loaded,
+                    pipeline_id,
+                    finish_load_callback,
+                ),
             )
 
             loading_details = LoadingDetails(
@@ -226,6 +863,7 @@ class LRUPipelineCache:
             self._pipeline_callbacks[pipeline_id] = delete_callback
             self._cache[pipeline_id] = loading_details
             self._order.append(pipeline_id)
+            self._evict_to_budget(keep=pipeline_id)
         elapsed = time.time() - started
         logger.debug(
             "put pipeline %s in %.2f seconds", pipeline_id, elapsed)
@@ -275,12 +913,76 @@ class LRUPipelineCache:
             "got pipeline %s in %.2f seconds", pipeline_id, elapsed)
         return pipeline
 
+    @staticmethod
+    def _result_key(
+        pipeline_id: str, pipeline: AnnotationPipeline,
+        annotatable: Annotatable,
+    ) -> tuple[str, int, str] | None:
+        # Key on the configuration of the pipeline that annotates, not on
+        # the cache entry, which may have been reloaded with another one.
+        if not isinstance(pipeline, ThreadSafePipeline) \
+                or pipeline.config_hash is None:
+            return None
+        return (
+            pipeline_id, pipeline.config_hash, annotatable_key(annotatable))
+
+    def annotate(
+        self, pipeline_id: str, pipeline: AnnotationPipeline,
+        annotatable: Annotatable,
+    ) -> dict:
+        """
+        Annotate a single annotatable with a pipeline from the cache.
+
+        Results are looked up in the result cache first, so repeated
+        annotatables do not check out a pipeline replica at all. Pipelines
+        that were not loaded by the cache annotate without caching.
+        """
+        key = self._result_key(pipeline_id, pipeline, annotatable)
+        if key is None:
+            return pipeline.annotate(annotatable, {})
+        result = self.results.get(key)
+        if result is None:
+            result = pipeline.annotate(annotatable, {})
+            self.results.put(key, result)
+        return result
+
+    def batch_annotate(
+        self, pipeline_id: str, pipeline: AnnotationPipeline,
+        annotatables: Sequence[Annotatable],
+    ) -> list[dict]:
+        """
+        Annotate annotatables in order with a pipeline from the cache.
+
+        Cached results are reused and the remaining annotatables are
+        annotated together in a single batch.
+        """
+        keys = [
+            self._result_key(pipeline_id, pipeline, annotatable)
+            for annotatable in annotatables
+        ]
+        results = [
+            None if key is None else self.results.get(key) for key in keys
+        ]
+        missing = [
+            index for index, result in enumerate(results) if result is None
+        ]
+        if missing:
+            annotated = pipeline.batch_annotate(
+                [annotatables[index] for index in missing])
+            for index, result in zip(missing, annotated):
+                results[index] = result
+                key = keys[index]
+                if key is not None:
+                    self.results.put(key, result)
+        return cast(list[dict], results)
+
     def delete_pipeline(
         self, pipeline_id: str,
         *,
         do_cancel: bool = True,
     ) -> None:
-        """Unload a pipeline from the cache."""
+        """Unload a pipeline from the cache and drop its cached results."""
+        self.results.invalidate(pipeline_id)
         with self._cache_lock:
             if pipeline_id in self._cache:
                 details = self._cache[pipeline_id]
@@ -305,3 +1007,31 @@ class LRUPipelineCache:
                 del self._cache[pipeline_id]
                 del self._pipeline_callbacks[pipeline_id]
                 self._order.remove(pipeline_id)
+
+    @staticmethod
+    def _get_loaded(details: LoadingDetails) -> ThreadSafePipeline | None:
+        """Return the loaded pipeline of a cache entry, if any."""
+        future = details.future
+        if not future.done() or future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None
+        return future.result()
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """Return usage statistics for every pipeline in the cache."""
+        with self._cache_lock:
+            entries = list(self._cache.items())
+        stats: dict[str, dict[str, Any]] = {}
+        for pipeline_id, details in entries:
+            entry: dict[str, Any] = {
+                "loaded": details.future.done(),
+                "time_started": details.time_started,
+                "size": 0,
+            }
+            pipeline = self._get_loaded(details)
+            if pipeline is not None:
+                entry["size"] = pipeline.size
+                entry.update(pipeline.get_stats())
+            stats[pipeline_id] = entry
+        return stats
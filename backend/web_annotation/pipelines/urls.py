@@ -5,5 +5,6 @@ urlpatterns = [
     path('api/pipelines/validate', views.PipelineValidation.as_view()),
     path("api/pipelines/load", views.LoadPipeline.as_view()),
     path("api/pipelines/user", views.UserPipeline.as_view()),
+    path("api/pipelines/cache", views.PipelineCacheStats.as_view()),
     path("api/pipelines", views.ListPipelines.as_view()),
 ]
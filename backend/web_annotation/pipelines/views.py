@@ -9,7 +9,7 @@ from gain.annotation.annotation_factory import load_pipeline_from_yaml
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from django.http import QueryDict
-from rest_framework import views
+from rest_framework import permissions, views
 from rest_framework.request import MultiValueDict
 from rest_framework.views import Request, Response
 from web_annotation.annotation_base_view import AnnotationBaseView
@@ -344,3 +344,17 @@ class LoadPipeline(AnnotationBaseView):
         )
 
         return Response(status=views.status.HTTP_204_NO_CONTENT)
+
+
+class PipelineCacheStats(AnnotationBaseView):
+    """View for inspecting the pipeline cache."""
+
+    authentication_classes = [WebAnnotationAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request: Request) -> Response:
+        """Return usage statistics for each cached pipeline."""
+        return Response(
+            self.lru_cache.get_stats(),
+            status=views.status.HTTP_200_OK,
+        )
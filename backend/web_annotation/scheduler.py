@@ -0,0 +1,139 @@
+"""Fair-share scheduling of annotation jobs waiting for an executor slot."""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from web_annotation.models import BaseJob
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+
+
+@dataclass
+class ScheduledJob:
+    """A job waiting in the scheduler."""
+    key: Hashable
+    owner: str
+    priority: int
+    submitted: float
+    start: Callable[[], None] = field(repr=False)
+
+
+class FairShareScheduler:
+    """
+    Queue of annotation jobs waiting for an executor slot.
+
+    Higher priority jobs go first. Within a priority class the owner with
+    the fewest running jobs goes first, then the owner served least
+    recently, then the job waiting the longest, so a single owner's backlog
+    cannot hold up everyone else. An owner never runs more than
+    ``max_running_per_owner`` jobs at a time.
+
+    The scheduler is not thread-safe; its executor serializes access.
+    """
+
+    def __init__(
+        self,
+        max_running_per_owner: int | None = None,
+        priority_fn: Callable[[BaseJob], int] | None = None,
+    ) -> None:
+        self.max_running_per_owner = max_running_per_owner
+        self.priority_fn = priority_fn
+        self._queues: dict[tuple[int, str], deque[ScheduledJob]] = \
+            defaultdict(deque)
+        self._running: dict[str, int] = defaultdict(int)
+        self._served: dict[str, int] = {}
+        self._starts = 0
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def priority(self, job: BaseJob) -> int:
+        """Return the priority class of a job."""
+        if self.priority_fn is None:
+            return NORMAL_PRIORITY
+        return self.priority_fn(job)
+
+    def push(self, entry: ScheduledJob) -> None:
+        """Add a job to the queue."""
+        self._queues[entry.priority, entry.owner].append(entry)
+
+    def _pick(
+        self,
+        queues: dict[tuple[int, str], deque[ScheduledJob]],
+        running: dict[str, int],
+        served: dict[str, int],
+        respect_caps: bool,
+    ) -> tuple[int, str] | None:
+        best: tuple[int, str] | None = None
+        best_rank: tuple[int, int, int, float] | None = None
+        for (priority, owner), queue in queues.items():
+            if not queue:
+                continue
+            owner_running = running.get(owner, 0)
+            if respect_caps and self.max_running_per_owner is not None \
+                    and owner_running >= self.max_running_per_owner:
+                continue
+            rank = (
+                priority, owner_running, served.get(owner, -1),
+                queue[0].submitted,
+            )
+            if best_rank is None or rank < best_rank:
+                best, best_rank = (priority, owner), rank
+        return best
+
+    def clear(self) -> None:
+        """Drop all waiting jobs."""
+        self._queues.clear()
+
+    def pop_next(self) -> ScheduledJob | None:
+        """Take the next job to start, counting it as running."""
+        picked = self._pick(
+            self._queues, self._running, self._served, respect_caps=True)
+        if picked is None:
+            return None
+        entry = self._queues[picked].popleft()
+        if not self._queues[picked]:
+            del self._queues[picked]
+        self._running[entry.owner] += 1
+        self._served[entry.owner] = self._starts
+        self._starts += 1
+        return entry
+
+    def finished(self, owner: str) -> None:
+        """Record that one of an owner's running jobs is done."""
+        self._running[owner] -= 1
+        if self._running[owner] <= 0:
+            del self._running[owner]
+
+    def running_count(self) -> int:
+        """Return the number of running jobs."""
+        return sum(self._running.values())
+
+    def position(self, key: Hashable) -> int | None:
+        """
+        Return the 1-based place of a job in the expected start order.
+
+        The order is simulated assuming every owner's running jobs keep
+        running. Returns None if the job is not waiting.
+        """
+        queues = {
+            queue_key: deque(queue)
+            for queue_key, queue in self._queues.items()
+        }
+        running = defaultdict(int, self._running)
+        served = dict(self._served)
+        position = 0
+        while (picked := self._pick(queues, running, served, False)) \
+                is not None:
+            entry = queues[picked].popleft()
+            position += 1
+            if entry.key == key:
+                return position
+            running[entry.owner] += 1
+            served[entry.owner] = self._starts + position
+        return None
@@ -333,5 +333,57 @@ RESOURCES_BASE_URL = "http://grr.seqpipe.org/"
 
 ANNOTATION_MAX_WORKERS = 4
 PIPELINES_CACHE_SIZE = 256
+# Estimated memory budget for loaded pipelines, e.g. "16G". None disables
+# memory-aware eviction.
+PIPELINES_CACHE_MAX_SIZE: str | int | None = None
+
+# Number of opened copies of each cached pipeline used to serve concurrent
+# single allele annotations. Can be overridden per pipeline ID.
+PIPELINE_REPLICAS = 1
+PIPELINE_REPLICAS_OVERRIDES: dict[str, int] = {}
+# Number of opened copies of each cached pipeline kept idle between file
+# jobs, so that following jobs on the same pipeline start immediately.
+PIPELINE_IDLE_JOB_REPLICAS = 1
+# Number of single allele annotation results kept in memory, so that
+# repeated queries do not run the pipeline again. 0 disables the cache.
+SINGLE_ALLELE_RESULT_CACHE_SIZE = 10_000
+# Maximum number of annotatables in a batch single allele request.
+SINGLE_ALLELE_BATCH_SIZE = 500
+# Seconds between writes of buffered single allele query history. 0 writes
+# each query immediately.
+ALLELE_HISTORY_FLUSH_INTERVAL = 5.0
+# Number of buffered history entries that triggers an early write.
+ALLELE_HISTORY_MAX_PENDING = 10_000
 
 ANNOTATION_TASK_TIMEOUT = 60 * 60 * 2  # 2 hours
+
+# Waiting jobs are started fairly across owners. Superuser jobs and jobs
+# with at most ANNOTATION_SMALL_JOB_VARIANTS variants are started first.
+# An owner runs at most ANNOTATION_MAX_JOBS_PER_OWNER jobs at once (None
+# for no limit).
+ANNOTATION_MAX_JOBS_PER_OWNER: int | None = None
+ANNOTATION_SMALL_JOB_VARIANTS = 1000
+
+# Where annotation jobs run: "threads" runs them in the web process,
+# "processes" runs them in a pool of ANNOTATION_MAX_WORKERS child processes,
+# "database" queues them in the job tables for `manage.py annotation_worker`
+# processes. With the database queue, job status notifications need a
+# channel layer shared between processes (e.g. Redis).
+ANNOTATION_JOB_QUEUE = "threads"
+# Opened pipelines kept by each child process of the "processes" queue and
+# GRR pipeline IDs loaded by every child process at start.
+ANNOTATION_PROCESS_PIPELINES = 4
+ANNOTATION_PROCESS_PRELOAD_PIPELINES: list[str] = []
+# Large jobs are split into shards annotated in parallel by
+# ANNOTATION_SHARD_WORKERS child processes. Fewer than 2 workers disables
+# sharding. Bgzipped VCF inputs are split into regions of this many bases
+# (or into whole chromosomes when None); columns inputs are split into
+# chunks of this many rows.
+ANNOTATION_SHARD_WORKERS = 0
+ANNOTATION_VCF_SHARD_REGION_SIZE: int | None = 10_000_000
+ANNOTATION_COLUMNS_CHUNK_ROWS = 100_000
+# Seconds a worker holds a job without a heartbeat before it is recovered.
+ANNOTATION_JOB_LEASE_SECONDS = 60
+# Number of times an abandoned job is retried before it is marked failed.
+ANNOTATION_JOB_MAX_ATTEMPTS = 3
+ANNOTATION_WORKER_POLL_INTERVAL = 2
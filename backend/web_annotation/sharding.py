@@ -0,0 +1,171 @@
+"""Helpers for splitting annotation inputs into shards and merging them."""
+from __future__ import annotations
+
+import gzip
+import logging
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+from typing import IO
+
+from pysam import VariantFile, tabix_compress, tabix_index
+
+from web_annotation.annotate_helpers import is_compressed_filename
+
+logger = logging.getLogger(__name__)
+
+Region = tuple[str, int, int | None]
+
+
+def index_vcf(input_path: str, index_dir: Path) -> str | None:
+    """
+    Build a tabix index of a bgzipped VCF file in a separate directory.
+
+    Returns the index path, or None if the file cannot be indexed.
+    """
+    if not is_compressed_filename(input_path):
+        return None
+    index_dir.mkdir(parents=True, exist_ok=True)
+    index_path = str(index_dir / f"{Path(input_path).name}.tbi")
+    try:
+        tabix_index(
+            input_path, preset="vcf", index=index_path,
+            keep_original=True, force=True,
+        )
+    except (OSError, ValueError):
+        logger.warning(
+            "Could not index %s, it will not be sharded", input_path)
+        return None
+    return index_path
+
+
+def vcf_regions(
+    input_path: str, index_path: str, region_size: int | None,
+) -> list[Region]:
+    """
+    Split the contigs of an indexed VCF file into regions.
+
+    Contigs are split into regions of ``region_size`` bases when their
+    length is known from the header; otherwise a region is a whole contig.
+    Regions are in file order.
+    """
+    regions: list[Region] = []
+    with VariantFile(input_path, index_filename=index_path) as vcf:
+        for contig in vcf.index.keys():
+            length = None
+            if contig in vcf.header.contigs:
+                length = vcf.header.contigs[contig].length
+            if region_size is None or length is None:
+                regions.append((contig, 0, None))
+                continue
+            for start in range(0, length, region_size):
+                regions.append((contig, start, start + region_size))
+    return regions
+
+
+def split_vcf(
+    input_path: str, index_path: str,
+    regions: list[Region], shard_dir: Path,
+) -> list[Path]:
+    """
+    Write the variants of each region into a separate VCF file.
+
+    A variant belongs to the region containing its start position, so
+    variants spanning region boundaries are not duplicated. Regions without
+    variants are skipped.
+    """
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    shards: list[Path] = []
+    with VariantFile(input_path, index_filename=index_path) as vcf:
+        for contig, start, end in regions:
+            shard_path = shard_dir / f"shard-{len(shards):05d}.vcf"
+            count = 0
+            with VariantFile(str(shard_path), "w", header=vcf.header) as out:
+                for record in vcf.fetch(contig, start, end):
+                    if record.start < start:
+                        continue
+                    if end is not None and record.start >= end:
+                        continue
+                    out.write(record)
+                    count += 1
+            if count == 0:
+                shard_path.unlink()
+                continue
+            shards.append(shard_path)
+    return shards
+
+
+def _concat_shards(
+    shard_outputs: list[Path], output_path: str,
+    is_header: Callable[[int, str], bool],
+) -> None:
+    """Concatenate shard outputs, keeping the header of the first only."""
+    plain_path = Path(f"{output_path}.concat")
+    with plain_path.open("wt", encoding="utf-8") as out:
+        for index, shard_output in enumerate(shard_outputs):
+            with shard_output.open("rt", encoding="utf-8") as infile:
+                for line_number, line in enumerate(infile):
+                    if index > 0 and is_header(line_number, line):
+                        continue
+                    out.write(line)
+    if is_compressed_filename(output_path):
+        tabix_compress(str(plain_path), output_path, force=True)
+        plain_path.unlink()
+    else:
+        shutil.move(str(plain_path), output_path)
+
+
+def concat_vcf(shard_outputs: list[Path], output_path: str) -> None:
+    """Concatenate annotated VCF shards into a single file in order."""
+    _concat_shards(
+        shard_outputs, output_path,
+        lambda _, line: line.startswith("#"),
+    )
+
+
+def split_columns(
+    input_path: str, chunk_rows: int, shard_dir: Path,
+) -> list[Path]:
+    """
+    Split a columns file into chunks of ``chunk_rows`` data rows.
+
+    Every chunk starts with the header line of the input. Chunks are plain
+    text files with the extension of the input.
+    """
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(input_path.removesuffix(".gz").removesuffix(".bgz")).suffix
+    infile: IO[str]
+    if is_compressed_filename(input_path):
+        infile = gzip.open(input_path, "rt", encoding="utf-8")
+    else:
+        infile = open(input_path, "rt", encoding="utf-8")
+
+    chunks: list[Path] = []
+    with infile:
+        header = infile.readline()
+        out: IO[str] | None = None
+        rows = 0
+        try:
+            for line in infile:
+                if out is None or rows >= chunk_rows:
+                    if out is not None:
+                        out.close()
+                    chunk_path = shard_dir / f"chunk-{len(chunks):05d}{suffix}"
+                    chunks.append(chunk_path)
+                    out = chunk_path.open("wt", encoding="utf-8")
+                    out.write(header)
+                    rows = 0
+                out.write(line)
+                rows += 1
+        finally:
+            if out is not None:
+                out.close()
+    return chunks
+
+
+def concat_columns(shard_outputs: list[Path], output_path: str) -> None:
+    """Concatenate annotated columns chunks into a single file in order."""
+    _concat_shards(
+        shard_outputs, output_path,
+        lambda line_number, _: line_number == 0,
+    )
@@ -0,0 +1,156 @@
+"""Write-behind buffer for users' single allele query history."""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from web_annotation.models import AlleleQuery, User
+
+logger = logging.getLogger(__name__)
+
+ALLELE_MAX_LENGTH = AlleleQuery._meta.get_field(  # pylint: disable=W0212
+    "allele").max_length
+
+
+class AlleleHistoryBuffer:
+    """
+    Collects allele queries in memory and writes them in batches.
+
+    Repeated queries of the same allele by the same owner are coalesced
+    into a single row with the latest use time. Pending queries are
+    upserted by a background thread every ``flush_interval`` seconds, or
+    sooner once ``max_pending`` of them are collected. A flush interval
+    of 0 writes each query immediately.
+
+    Queries of deleted owners are dropped when written. Queries that fail
+    to be written are retried with the following writes and dropped after
+    ``max_attempts`` failures.
+    """
+
+    def __init__(
+        self, flush_interval: float, max_pending: int, max_attempts: int = 3,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        # (owner ID, allele) -> (last used, failed write attempts)
+        self._pending: dict[tuple[int, str], tuple[datetime, int]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, owner_id: int, alleles: list[str]) -> None:
+        """Add alleles queried by an owner to the buffer."""
+        now = timezone.now()
+        with self._lock:
+            for allele in alleles:
+                if len(allele) > ALLELE_MAX_LENGTH:
+                    continue
+                _, attempts = self._pending.get((owner_id, allele), (now, 0))
+                self._pending[(owner_id, allele)] = (now, attempts)
+            pending = len(self._pending)
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        self._ensure_flusher()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """Write all pending allele queries to the database."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            owners = set(User.objects.filter(
+                pk__in={owner_id for owner_id, _ in pending},
+            ).values_list("pk", flat=True))
+            pending = {
+                key: entry for key, entry in pending.items()
+                if key[0] in owners
+            }
+            try:
+                AlleleQuery.objects.bulk_create(
+                    [
+                        AlleleQuery(
+                            owner_id=owner_id, allele=allele,
+                            last_used=last_used,
+                        )
+                        for (owner_id, allele), (last_used, _)
+                        in pending.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["owner", "allele"],
+                    update_fields=["last_used"],
+                )
+            except Exception:
+                self._retry(pending)
+                raise
+
+    def _retry(
+        self, failed: dict[tuple[int, str], tuple[datetime, int]],
+    ) -> None:
+        dropped = 0
+        with self._lock:
+            for key, (last_used, attempts) in failed.items():
+                if attempts + 1 >= self.max_attempts:
+                    dropped += 1
+                    continue
+                newer, _ = self._pending.get(key, (last_used, 0))
+                self._pending[key] = (max(newer, last_used), attempts + 1)
+        if dropped:
+            logger.warning(
+                "Dropped %d allele queries that could not be written",
+                dropped,
+            )
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="allele-history-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to write allele query history")
+                # Retry after a full interval, even if the buffer is full.
+                time.sleep(self.flush_interval)
+                self._wakeup.clear()
+            finally:
+                close_old_connections()
+
+
+ALLELE_HISTORY = AlleleHistoryBuffer(
+    settings.ALLELE_HISTORY_FLUSH_INTERVAL,
+    settings.ALLELE_HISTORY_MAX_PENDING,
+)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    try:
+        ALLELE_HISTORY.flush()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to write allele query history on exit")
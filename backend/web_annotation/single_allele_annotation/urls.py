@@ -4,6 +4,10 @@ from web_annotation.single_allele_annotation import views
 
 urlpatterns = [
     path('api/single_allele/annotate', views.SingleAnnotation.as_view()),
+    path(
+        "api/single_allele/annotate_batch",
+        views.BatchSingleAnnotation.as_view(),
+    ),
     path("api/single_allele/history", views.AlleleHistory.as_view()),
     path("api/single_allele/note", views.UpdateAlleleNote.as_view()),
     re_path(
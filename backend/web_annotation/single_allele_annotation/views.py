@@ -1,10 +1,14 @@
 """Module for single allele annotation views."""
-from datetime import datetime
+import gzip
+import hashlib
+from dataclasses import dataclass
+from functools import partial
+from threading import Lock
 from typing import Any, cast
 
 from gain.annotation.record_to_annotatable import build_annotatable_from_dict
 from gain.annotation.annotation_config import AttributeInfo
-from gain.annotation.annotation_pipeline import Annotator
+from gain.annotation.annotation_pipeline import AnnotationPipeline, Annotator
 from gain.annotation.gene_score_annotator import GeneScoreAnnotator
 from gain.annotation.score_annotator import GenomicScoreAnnotatorBase
 from gain.gene_scores.gene_scores import (
@@ -12,25 +16,28 @@ from gain.gene_scores.gene_scores import (
     build_gene_score_from_resource,
 )
 from gain.genomic_resources.genomic_scores import build_score_from_resource
-from gain.genomic_resources.histogram import (
-    Histogram,
-    NullHistogram,
-    NullHistogramConfig,
-)
+from gain.genomic_resources.histogram import Histogram, NullHistogram
 from gain.genomic_resources.repository import GenomicResource
 from django.conf import settings
 from django.db.models import QuerySet
-from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.http import last_modified
+from django.http import HttpResponse, HttpResponseNotModified
+from django.http.response import HttpResponseBase
+from django.utils.http import parse_etags
 from rest_framework import generics, permissions, views
+from rest_framework.renderers import JSONRenderer
 from rest_framework.throttling import UserRateThrottle
 from rest_framework.views import Request, Response
 
+from web_annotation.annotate_helpers import count_pipeline_attributes
 from web_annotation.annotation_base_view import AnnotationBaseView
 from web_annotation.authentication import WebAnnotationAuthentication
 from web_annotation.models import AlleleQuery, BaseUser, User
+from web_annotation.pipeline_cache import (
+    ThreadSafePipeline,
+    unwrap_annotator,
+)
 from web_annotation.serializers import AlleleSerializer
+from web_annotation.single_allele_annotation.history import ALLELE_HISTORY
 
 
 def get_histogram_genomic_score(
@@ -69,13 +76,6 @@ def get_histogram_gene_score(
     )
 
 
-def get_histogram_not_supported(
-    _resource: GenomicResource, _score: str,  # pylint: disable=unused-argument
-) -> tuple[Histogram, dict[str, Any]]:
-    """Return an empty histogram for unsupported resources."""
-    return (NullHistogram(NullHistogramConfig("not supported")), {})
-
-
 HISTOGRAM_GETTERS = {
     "allele_score": get_histogram_genomic_score,
     "position_score": get_histogram_genomic_score,
@@ -83,23 +83,108 @@ HISTOGRAM_GETTERS = {
 }
 
 
-def has_histogram(resource: GenomicResource, score: str) -> bool:
-    """Check if a resource has a histogram for a score."""
-    histogram_getter = HISTOGRAM_GETTERS.get(
-        resource.get_type(), get_histogram_not_supported,
-    )
-    histogram, _details = histogram_getter(resource, score)
-    return not isinstance(histogram, NullHistogram)
+@dataclass(frozen=True)
+class HistogramPayload:
+    """A score histogram, serialized once for all responses."""
+    data: dict[str, Any]
+    body: bytes
+    gzipped_body: bytes
+    etag: str
+    gzipped_etag: str
+
+    @staticmethod
+    def build(data: dict[str, Any]) -> "HistogramPayload":
+        """Serialize and compress histogram data."""
+        body = JSONRenderer().render(data)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return HistogramPayload(
+            data=data,
+            body=body,
+            gzipped_body=gzip.compress(body, mtime=0),
+            etag=f'"{digest}"',
+            gzipped_etag=f'"{digest}-gzip"',
+        )
 
 
-STARTUP_TIME = timezone.now()
+class HistogramIndex:
+    """
+    Process-wide index of score histograms.
+
+    Maps (resource ID, resource version, score ID) to the histogram payload
+    served for the score, or None when the score has no histogram. Entries
+    are built on first use, so each score is loaded at most once. Only
+    scores defined by score resources are indexed, so requests for unknown
+    scores do not grow the index.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[
+            tuple[str, Any, str], HistogramPayload | None] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(
+        self, resource: GenomicResource, score_id: str,
+    ) -> HistogramPayload | None:
+        """Get the histogram payload of a score, building it if needed."""
+        key = (resource.resource_id, resource.version, score_id)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        histogram_getter = HISTOGRAM_GETTERS.get(resource.get_type())
+        if histogram_getter is None:
+            return None
+        try:
+            histogram, extra_data = histogram_getter(resource, score_id)
+        except KeyError:
+            return None
+        payload = None
+        if not isinstance(histogram, NullHistogram):
+            payload = HistogramPayload.build(
+                {**histogram.to_dict(), **extra_data})
+        with self._lock:
+            return self._entries.setdefault(key, payload)
+
+    def clear(self) -> None:
+        """Drop all indexed histograms."""
+        with self._lock:
+            self._entries.clear()
+
+
+HISTOGRAM_INDEX = HistogramIndex()
+
+
+def resource_version(resource: GenomicResource) -> str:
+    """Get the version of a resource as used in histogram URLs."""
+    return ".".join(str(part) for part in resource.version)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Check if an Accept-Encoding header value accepts gzip."""
+    qualities: dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
 
 
-def always_cache(
-    *_args: list[Any], **_kwargs: dict[str, Any],
-) -> datetime:
-    """Function to enable a view to always be cached, due to static data."""
-    return STARTUP_TIME
+def has_histogram(resource: GenomicResource, score: str) -> bool:
+    """Check if a resource has a histogram for a score."""
+    return HISTOGRAM_INDEX.get(resource, score) is not None
 
 
 class SingleAnnotation(AnnotationBaseView):
@@ -114,6 +199,7 @@ class SingleAnnotation(AnnotationBaseView):
         attribute_info: AttributeInfo,
     ) -> str | None:
         """Generate annotator help for gene scores and genomic scores"""
+        annotator = unwrap_annotator(annotator)
         if not isinstance(
             annotator, (GeneScoreAnnotator, GenomicScoreAnnotatorBase),
         ):
@@ -132,18 +218,9 @@ class SingleAnnotation(AnnotationBaseView):
                 )
         return None
 
-    def post(self, request: Request) -> Response:
-        """View for single annotation"""
-
+    def _get_pipeline_id(self, request: Request) -> str | Response:
+        """Get the pipeline ID of a request or a response rejecting it."""
         assert isinstance(request.data, dict)
-        if "annotatable" not in request.data:
-            return Response(
-                {"reason": "Annotatable not provided!"},
-                status=views.status.HTTP_400_BAD_REQUEST,
-            )
-        annotatable = request.data["annotatable"]
-        assert isinstance(annotatable, dict)
-
         if "pipeline_id" not in request.data:
             return Response(
                 {"reason": "Pipeline not provided!"},
@@ -156,14 +233,27 @@ class SingleAnnotation(AnnotationBaseView):
                 {"reason": "Invalid pipeline provided!"},
                 status=views.status.HTTP_400_BAD_REQUEST,
             )
+        return pipeline_id
+
+    def post(self, request: Request) -> Response:
+        """View for single annotation"""
+
+        assert isinstance(request.data, dict)
+        if "annotatable" not in request.data:
+            return Response(
+                {"reason": "Annotatable not provided!"},
+                status=views.status.HTTP_400_BAD_REQUEST,
+            )
+        annotatable = request.data["annotatable"]
+        assert isinstance(annotatable, dict)
+
+        pipeline_id = self._get_pipeline_id(request)
+        if isinstance(pipeline_id, Response):
+            return pipeline_id
 
         pipeline = self.get_pipeline(pipeline_id, request.user)
 
-        attributes_count = sum(
-            1 for annotator in pipeline.annotators
-            for attr in annotator.attributes
-            if not attr.internal
-        )
+        attributes_count = count_pipeline_attributes(pipeline)
 
         quota = request.user.get_quota()
         if not quota.single_allele_allowed(attributes_count):
@@ -174,9 +264,31 @@ class SingleAnnotation(AnnotationBaseView):
 
         annotatable = build_annotatable_from_dict(annotatable)
 
-        annotation = pipeline.annotate(annotatable, {})
+        annotation = self.lru_cache.annotate(
+            pipeline_id, pipeline, annotatable)
+
+        annotators_data = self._build_annotators_data(pipeline, annotation)
+
+        self._record_allele_queries(request.user, [str(annotatable)])
+
+        quota.single_allele_query_complete(attributes_count)
+
+        response_data = {
+            "annotatable": annotatable.to_dict(),
+            "annotators": annotators_data,
+        }
+
+        return Response(response_data)
+
+    def _build_presentation(
+        self, pipeline: AnnotationPipeline,
+    ) -> list[tuple[dict[str, Any], list[tuple[str, dict[str, Any]]]]]:
+        """
+        Build the allele independent part of a pipeline's responses.
 
-        annotators_data = []
+        Returns the details of each annotator with its attribute templates,
+        keyed by the attribute name in the annotation results.
+        """
         if (
             getattr(settings, "RESOURCES_BASE_URL") is None
             or settings.RESOURCES_BASE_URL is None
@@ -185,9 +297,8 @@ class SingleAnnotation(AnnotationBaseView):
         else:
             base_url = settings.RESOURCES_BASE_URL
 
+        presentation = []
         for annotator in pipeline.annotators:
-            details = {}
-            attributes = []
             annotator_info = annotator.get_info()
             annotator_resources = []
             for resource in annotator_info.resources:
@@ -201,50 +312,50 @@ class SingleAnnotation(AnnotationBaseView):
                 "description": annotator_info.documentation,
                 "resources": annotator_resources,
             }
-            for attribute_info in annotator.attributes:
-                if attribute_info.internal:
-                    continue
-                attributes.append(
-                    self._build_attribute_description(
-                        annotation, annotator,
-                        attribute_info)
+            attributes = [
+                (
+                    attribute_info.name,
+                    self._build_attribute_template(annotator, attribute_info),
                 )
+                for attribute_info in annotator.attributes
+                if not attribute_info.internal
+            ]
             if len(attributes) == 0:
                 continue
-            annotators_data.append(
-                {"details": details, "attributes": attributes},
+            presentation.append((details, attributes))
+        return presentation
+
+    def _build_annotators_data(
+        self, pipeline: AnnotationPipeline, annotation: dict[str, Any],
+    ) -> list[dict[str, Any]]:
+        """Describe the annotation results of each annotator."""
+        if isinstance(pipeline, ThreadSafePipeline):
+            presentation = pipeline.memo(
+                "single_allele_presentation",
+                partial(self._build_presentation, pipeline),
             )
-
-        if (
-            request.user.is_authenticated
-            and isinstance(request.user, BaseUser)
-        ):
-            allele = str(annotatable)
-            allele_query = AlleleQuery.objects.filter(
-                allele=allele,
-                owner=request.user.as_owner,
-            ).first()
-            if allele_query is None:
-                allele_query = AlleleQuery(
-                    allele=allele,
-                    owner=request.user.as_owner,
-                )
-            else:
-                allele_query.last_used = timezone.now()
-            allele_query.save()
-
-        quota.single_allele_query_complete(attributes_count)
-
-        response_data = {
-            "annotatable": annotatable.to_dict(),
-            "annotators": annotators_data,
-        }
-
-        return Response(response_data)
-
-    def _build_attribute_description(
-            self, result: dict[str, Any], annotator: Annotator,
-            attribute_info: AttributeInfo,
+        else:
+            presentation = self._build_presentation(pipeline)
+        return [
+            {
+                "details": details,
+                "attributes": [
+                    self._fill_attribute_template(template, annotation[name])
+                    for name, template in attributes
+                ],
+            }
+            for details, attributes in presentation
+        ]
+
+    @staticmethod
+    def _record_allele_queries(user: Any, alleles: list[str]) -> None:
+        """Add alleles to a user's history, refreshing known ones."""
+        if not (user.is_authenticated and isinstance(user, BaseUser)):
+            return
+        ALLELE_HISTORY.record(user.as_owner.pk, alleles)
+
+    def _build_attribute_template(
+            self, annotator: Annotator, attribute_info: AttributeInfo,
     ) -> dict[str, Any]:
         resource = self.grr.get_resource(
                     list(annotator.resource_ids)[0])
@@ -252,19 +363,16 @@ class SingleAnnotation(AnnotationBaseView):
             histogram_path = (
                         f"histograms/{resource.resource_id}"
                         f"?score_id={attribute_info.source}"
+                        f"&version={resource_version(resource)}"
                     )
         else:
             histogram_path = None
-        value = result[attribute_info.name]
 
         annotator_help = self.generate_annotator_help(
                     annotator,
                     attribute_info,
                 )
 
-        if attribute_info.value_type in ["object", "annotatable"]:
-            if not isinstance(value, (dict, list)):
-                value = str(value)
         return {
             "name": attribute_info.name,
             "description": attribute_info.description,
@@ -272,17 +380,103 @@ class SingleAnnotation(AnnotationBaseView):
             "source": attribute_info.source,
             "type": attribute_info.value_type,
             "result": {
-                "value": value,
+                "value": None,
                 "histogram": histogram_path,
             },
         }
 
+    @staticmethod
+    def _fill_attribute_template(
+        template: dict[str, Any], value: Any,
+    ) -> dict[str, Any]:
+        if template["type"] in ["object", "annotatable"]:
+            if not isinstance(value, (dict, list)):
+                value = str(value)
+        return {
+            **template,
+            "result": {**template["result"], "value": value},
+        }
+
+
+class BatchSingleAnnotation(SingleAnnotation):
+    """View annotating a batch of annotatables in a single request."""
+
+    def post(self, request: Request) -> Response:
+        """Annotate annotatables in order and charge the quota once."""
+        assert isinstance(request.data, dict)
+        annotatables = request.data.get("annotatables")
+        if not isinstance(annotatables, list) or len(annotatables) == 0:
+            return Response(
+                {"reason": "Annotatables not provided!"},
+                status=views.status.HTTP_400_BAD_REQUEST,
+            )
+        max_batch = settings.SINGLE_ALLELE_BATCH_SIZE
+        if len(annotatables) > max_batch:
+            return Response(
+                {"reason": f"At most {max_batch} annotatables per request!"},
+                status=views.status.HTTP_400_BAD_REQUEST,
+            )
+
+        pipeline_id = self._get_pipeline_id(request)
+        if isinstance(pipeline_id, Response):
+            return pipeline_id
+
+        pipeline = self.get_pipeline(pipeline_id, request.user)
+
+        queries_count = len(annotatables)
+        attributes_count = \
+            count_pipeline_attributes(pipeline) * queries_count
+
+        quota = request.user.get_quota()
+        if not quota.single_allele_allowed(attributes_count, queries_count):
+            return Response(
+                {"reason": "Single allele query quota exceeded!"},
+                status=views.status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            built = [
+                build_annotatable_from_dict(annotatable)
+                for annotatable in annotatables
+            ]
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return Response(
+                {"reason": "Invalid annotatable provided!"},
+                status=views.status.HTTP_400_BAD_REQUEST,
+            )
+
+        annotations = self.lru_cache.batch_annotate(
+            pipeline_id, pipeline, built)
+
+        results = [
+            {
+                "annotatable": annotatable.to_dict(),
+                "annotators": self._build_annotators_data(
+                    pipeline, annotation),
+            }
+            for annotatable, annotation in zip(built, annotations)
+        ]
+
+        self._record_allele_queries(
+            request.user, [str(annotatable) for annotatable in built])
+
+        quota.single_allele_query_complete(attributes_count, queries_count)
+
+        return Response({"results": results})
+
 
 class HistogramView(AnnotationBaseView):
-    """View for returning histogram data."""
+    """
+    View for returning histogram data.
 
-    @method_decorator(last_modified(always_cache))
-    def get(self, request: Request, resource_id: str) -> Response:
+    Responses are served pre-serialized and, when the client accepts it,
+    pre-gzipped. Each encoding has its own content hash ETag, so clients
+    revalidate for free across resource versions with the same histogram.
+    Requests naming the current resource version are cached by clients as
+    immutable.
+    """
+
+    def get(self, request: Request, resource_id: str) -> HttpResponseBase:
         """Return histogram data for a resource and score ID."""
         try:
             resource = self.grr.get_resource(resource_id)
@@ -296,22 +490,36 @@ class HistogramView(AnnotationBaseView):
                 status=views.status.HTTP_400_BAD_REQUEST,
             )
 
-        histogram_getter = HISTOGRAM_GETTERS.get(
-            resource.get_type(), get_histogram_not_supported,
-        )
-
-        histogram, extra_data = histogram_getter(
-            resource, score_id,
-        )
-        if isinstance(histogram, NullHistogram):
+        payload = HISTOGRAM_INDEX.get(resource, score_id)
+        if payload is None:
             return Response(status=views.status.HTTP_404_NOT_FOUND)
 
-        output = {
-            **histogram.to_dict(),
-            **extra_data,
+        if request.query_params.get("version") == resource_version(resource):
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "no-cache"
+
+        gzipped = accepts_gzip(request.headers.get("Accept-Encoding", ""))
+        etag = payload.gzipped_etag if gzipped else payload.etag
+        # If-None-Match uses the weak comparison.
+        if_none_match = {
+            tag.removeprefix("W/") for tag in
+            parse_etags(request.headers.get("If-None-Match", ""))
         }
-
-        return Response(output)
+        response: HttpResponse
+        if etag in if_none_match or "*" in if_none_match:
+            response = HttpResponseNotModified()
+        elif gzipped:
+            response = HttpResponse(
+                payload.gzipped_body, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                payload.body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        response["Vary"] = "Accept-Encoding"
+        return response
 
 
 class AlleleHistory(generics.ListAPIView):
@@ -323,6 +531,7 @@ class AlleleHistory(generics.ListAPIView):
 
     def get_queryset(self) -> QuerySet:
         assert isinstance(self.request.user, BaseUser)
+        ALLELE_HISTORY.flush()
         return AlleleQuery.objects.filter(
             owner=cast(User, self.request.user.as_owner),
         ).order_by("-last_used")
@@ -336,6 +545,8 @@ class AlleleHistory(generics.ListAPIView):
                 status=views.status.HTTP_400_BAD_REQUEST,
             )
 
+        # Write pending queries first, so they do not recreate the row.
+        ALLELE_HISTORY.flush()
         allele_query = AlleleQuery.objects.filter(
             id=query_id,
             owner=request.user.as_owner,
@@ -369,6 +580,7 @@ class UpdateAlleleNote(views.APIView):
                 status=views.status.HTTP_400_BAD_REQUEST,
             )
 
+        ALLELE_HISTORY.flush()
         allele_query = AlleleQuery.objects.filter(
             allele=allele,
             owner=request.user.as_owner,
@@ -1,8 +1,20 @@
 """Web annotation tasks"""
 import logging
+import shutil
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from datetime import timedelta
+from pathlib import Path
+from threading import Lock
 from typing import Any
 
+import yaml
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
 from gain.annotation.annotate_columns import annotate_columns
 from gain.annotation.annotate_vcf import annotate_vcf
 from gain.annotation.annotation_pipeline import AnnotationPipeline
@@ -14,10 +26,42 @@ from django.conf import settings
 
 from django.utils import timezone
 
-from .models import AnonymousJob, AnonymousJobDetails, BaseJob, Job, JobDetails
+from .annotate_helpers import (
+    count_pipeline_attributes,
+    get_input_variant_count,
+)
+from .cancellation import (
+    JobCancelled,
+    JobTimedOut,
+    cancellation_scope,
+    current_token,
+    job_cancellation_token,
+)
+from .executor import ProcessPoolTaskExecutor
+from .models import (
+    AnonymousJob,
+    AnonymousJobDetails,
+    AnonymousUserQuota,
+    BaseJob,
+    Job,
+    JobDetails,
+    UserQuota,
+)
+from .pipeline_cache import ThreadSafePipeline
+from .sharding import (
+    concat_columns,
+    concat_vcf,
+    index_vcf,
+    split_columns,
+    split_vcf,
+    vcf_regions,
+)
 
 logger = logging.getLogger(__name__)
 
+_SHARD_EXECUTOR: ProcessPoolTaskExecutor | None = None
+_SHARD_EXECUTOR_LOCK = Lock()
+
 
 def specify_job(  # pylint: disable=too-many-arguments
     job: Job | AnonymousJob,
@@ -56,6 +100,18 @@ def specify_job(  # pylint: disable=too-many-arguments
     return job
 
 
+@contextmanager
+def lease_pipeline(
+    pipeline: AnnotationPipeline,
+) -> Iterator[AnnotationPipeline]:
+    """Lease an opened replica of a cached pipeline for a job."""
+    if isinstance(pipeline, ThreadSafePipeline):
+        with pipeline.lease() as leased:
+            yield leased
+    else:
+        yield pipeline
+
+
 def get_args_vcf(
     job: BaseJob, pipeline: AnnotationPipeline, storage_dir: str,
 ) -> dict[str, Any]:
@@ -70,6 +126,88 @@ def get_args_vcf(
     }
 
 
+def annotate_vcf_shard(
+    input_path: str,
+    pipeline: AnnotationPipeline,
+    output_path: str,
+    args: dict[str, Any],
+) -> None:
+    """Annotate a VCF file as a whole."""
+    with lease_pipeline(pipeline) as leased:
+        annotate_vcf(input_path, leased, output_path, args)
+
+
+def get_shard_executor() -> ProcessPoolTaskExecutor:
+    """Get the process pool shared by sharded annotations."""
+    global _SHARD_EXECUTOR  # pylint: disable=global-statement
+    with _SHARD_EXECUTOR_LOCK:
+        if _SHARD_EXECUTOR is None:
+            _SHARD_EXECUTOR = ProcessPoolTaskExecutor(
+                max_workers=settings.ANNOTATION_SHARD_WORKERS,
+                pipelines_per_process=settings.ANNOTATION_PROCESS_PIPELINES,
+            )
+        return _SHARD_EXECUTOR
+
+
+def annotate_vcf_sharded(
+    input_path: str,
+    pipeline: AnnotationPipeline,
+    output_path: str,
+    args: dict[str, Any],
+) -> bool:
+    """
+    Annotate a bgzipped VCF file region by region in parallel.
+
+    The regions are annotated by the shard process pool and the annotated
+    regions are concatenated in order into ``output_path``. Returns False,
+    without annotating, if the file cannot be sharded.
+    """
+    shard_dir = Path(args["work_dir"]) / f"shards-{uuid.uuid4().hex}"
+    try:
+        index_path = index_vcf(input_path, shard_dir)
+        if index_path is None:
+            return False
+        regions = vcf_regions(
+            input_path, index_path,
+            settings.ANNOTATION_VCF_SHARD_REGION_SIZE,
+        )
+        shards = split_vcf(input_path, index_path, regions, shard_dir)
+        if len(shards) < 2:
+            return False
+        logger.info(
+            "Annotating %s in %d shards", input_path, len(shards))
+
+        config_path = shard_dir / "config.yaml"
+        config_path.write_text(
+            yaml.safe_dump(pipeline.raw, sort_keys=False), encoding="utf-8")
+        executor = get_shard_executor()
+        futures = []
+        outputs = []
+        for shard in shards:
+            shard_output = shard.with_name(f"{shard.stem}-annotated.vcf")
+            shard_work_dir = shard.with_name(f"{shard.stem}-work")
+            futures.append(executor.submit_with_pipeline(
+                annotate_vcf_shard,
+                str(config_path),
+                token=current_token(),
+                input_path=str(shard),
+                output_path=str(shard_output),
+                args={**args, "work_dir": str(shard_work_dir)},
+            ))
+            outputs.append(shard_output)
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+        concat_vcf(outputs, output_path)
+        return True
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
 def run_vcf_job(
     input_path: str,
     pipeline: AnnotationPipeline,
@@ -80,7 +218,10 @@ def run_vcf_job(
     logger.debug("Running vcf job")
     logger.debug("%s, %s %s %s", input_path, pipeline, output_path, args)
 
-    annotate_vcf(input_path, pipeline, output_path, args)
+    if settings.ANNOTATION_SHARD_WORKERS > 1 and annotate_vcf_sharded(
+            input_path, pipeline, output_path, args):
+        return
+    annotate_vcf_shard(input_path, pipeline, output_path, args)
 
 
 def delete_old_jobs(days_old: int = 0) -> None:
@@ -93,6 +234,10 @@ def delete_old_jobs(days_old: int = 0) -> None:
     for job in list(old_jobs):
         job.deactivate()
 
+    # Drop the reservations of jobs that ended without releasing them.
+    UserQuota.reconcile_reservations()
+    AnonymousUserQuota.reconcile_reservations()
+
 
 def get_args_columns(
     job: Job | AnonymousJob,
@@ -160,7 +305,80 @@ def get_args_columns(
     return fn_args
 
 
-def run_columns_job(  # pylint: disable=too-many-branches
+def annotate_columns_chunk(
+    input_path: str,
+    pipeline: AnnotationPipeline,
+    output_path: str,
+    args: dict[str, Any],
+    reference_genome: ReferenceGenome | None = None,
+) -> None:
+    """Annotate a columns file as a whole."""
+    with lease_pipeline(pipeline) as leased:
+        annotate_columns(
+            input_path, leased, output_path,
+            args, reference_genome=reference_genome)
+
+
+def annotate_columns_chunked(  # pylint: disable=too-many-locals
+    input_path: str,
+    pipeline: AnnotationPipeline,
+    output_path: str,
+    args: dict[str, Any],
+    reference_genome: ReferenceGenome | None = None,
+) -> bool:
+    """
+    Annotate a columns file chunk by chunk in parallel.
+
+    The row chunks are annotated by the shard process pool and the annotated
+    chunks are concatenated in order into ``output_path``. Returns False,
+    without annotating, if the file has too few rows to be chunked.
+    """
+    shard_dir = Path(args["work_dir"]) / f"shards-{uuid.uuid4().hex}"
+    try:
+        chunks = split_columns(
+            input_path, settings.ANNOTATION_COLUMNS_CHUNK_ROWS, shard_dir)
+        if len(chunks) < 2:
+            return False
+        logger.info(
+            "Annotating %s in %d chunks", input_path, len(chunks))
+
+        config_path = shard_dir / "config.yaml"
+        config_path.write_text(
+            yaml.safe_dump(pipeline.raw, sort_keys=False), encoding="utf-8")
+        genome_id = None
+        if reference_genome is not None:
+            genome_id = reference_genome.resource.get_id()
+        executor = get_shard_executor()
+        futures = []
+        outputs = []
+        for chunk in chunks:
+            chunk_output = chunk.with_name(
+                f"{chunk.stem}-annotated{chunk.suffix}")
+            chunk_work_dir = chunk.with_name(f"{chunk.stem}-work")
+            futures.append(executor.submit_with_pipeline(
+                annotate_columns_chunk,
+                str(config_path),
+                token=current_token(),
+                reference_genome=genome_id,
+                input_path=str(chunk),
+                output_path=str(chunk_output),
+                args={**args, "work_dir": str(chunk_work_dir)},
+            ))
+            outputs.append(chunk_output)
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+        concat_columns(outputs, output_path)
+        return True
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def run_columns_job(
     input_path: str,
     pipeline: AnnotationPipeline,
     output_path: str,
@@ -170,9 +388,117 @@ def run_columns_job(  # pylint: disable=too-many-branches
     """Run a columnar annotation."""
     logger.debug("Running columns job")
     logger.debug(args)
-    annotate_columns(
-        input_path, pipeline, output_path,
-        args, reference_genome=reference_genome)
+
+    if settings.ANNOTATION_SHARD_WORKERS > 1 and annotate_columns_chunked(
+            input_path, pipeline, output_path, args, reference_genome):
+        return
+    annotate_columns_chunk(
+        input_path, pipeline, output_path, args, reference_genome)
+
+
 def clean_old_jobs() -> None:
     """Task for running annotation."""
     delete_old_jobs(settings.JOB_CLEANUP_INTERVAL_DAYS)
+
+
+def notify_job_status(job: BaseJob) -> None:
+    """Send a job's status to its owner's socket group."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        job.get_socket_group(),
+        {
+            "type": "job_status",
+            "job_id": str(job.pk),
+            "status": Job.Status(job.status).name.lower(),
+        },
+    )
+
+
+def get_job_args(
+    job: BaseJob, pipeline: AnnotationPipeline,
+) -> dict[str, Any]:
+    """Prepare annotation arguments for a job from its stored details."""
+    work_dir = str(
+        Path(settings.JOB_RESULT_STORAGE_DIR) / job.owner_identifier)
+    if job.annotation_type == "vcf":
+        return get_args_vcf(job, pipeline, work_dir)
+    assert isinstance(job, (Job, AnonymousJob))
+    return get_args_columns(job, job.get_job_details(), pipeline, work_dir)
+
+
+def get_job_runner(job: BaseJob) -> Callable[..., None]:
+    """Get the annotation function for a job's annotation type."""
+    if job.annotation_type == "vcf":
+        return run_vcf_job
+    return run_columns_job
+
+
+def start_job(job: BaseJob) -> None:
+    """Mark a job as in progress and notify its owner."""
+    job.refresh_from_db(fields=["status"])
+    if job.status == Job.Status.CANCELLED:
+        raise JobCancelled(f"Job {job.pk} was cancelled.")
+    job.update_job_in_progress()
+    notify_job_status(job)
+
+
+def finish_job_success(
+    job: BaseJob,
+    args: dict[str, Any],
+    pipeline: AnnotationPipeline,
+    start_time: float,
+) -> None:
+    """Mark a job as successful and charge its owner's quota."""
+    quota = job.get_owner_quota()
+    job.release_quota(quota)
+    job.duration = time.time() - start_time
+    job.disk_size += Path(job.result_path).stat().st_size
+    job.update_job_success(str(args))
+    notify_job_status(job)
+
+    attributes_count = job.attributes_count
+    if attributes_count is None:
+        attributes_count = count_pipeline_attributes(pipeline)
+    variants_count = get_input_variant_count(job)
+    quota.job_complete(variants_count, attributes_count)
+
+
+def finish_job_failure(
+    job: BaseJob,
+    args: dict[str, Any],
+    exception: BaseException,
+    start_time: float,
+) -> None:
+    """Mark a job as failed, release its quota and notify its owner."""
+    job.release_quota()
+    if isinstance(exception, JobCancelled) \
+            and not isinstance(exception, JobTimedOut):
+        # The job was already marked as cancelled by whoever cancelled it.
+        job.refresh_from_db()
+        notify_job_status(job)
+        return
+    job.duration = time.time() - start_time
+    job.update_job_failed(str(args), str(exception))
+    notify_job_status(job)
+
+
+def run_job(job: BaseJob, pipeline: AnnotationPipeline) -> None:
+    """Run an in progress job to completion in the current thread."""
+    start_time = time.time()
+    args = get_job_args(job, pipeline)
+    token = job_cancellation_token(job, settings.ANNOTATION_TASK_TIMEOUT)
+    try:
+        with cancellation_scope(token):
+            get_job_runner(job)(**args)
+    except Exception as exception:  # pylint: disable=broad-except
+        logger.exception("Annotation job %s failed", job.pk)
+        finish_job_failure(job, args, exception, start_time)
+        return
+    try:
+        finish_job_success(job, args, pipeline, start_time)
+    except Exception as exception:  # pylint: disable=broad-except
+        logger.exception("Could not finish annotation job %s", job.pk)
+        if job.status != Job.Status.SUCCESS:
+            finish_job_failure(job, args, exception, start_time)
@@ -18,6 +18,8 @@ JOB_INPUT_STORAGE_DIR = f"{DATA_STORAGE_DIR}/job-inputs"
 # Subdir to store results of annotation in
 JOB_RESULT_STORAGE_DIR = f"{DATA_STORAGE_DIR}/job-results"
 
+ALLELE_HISTORY_FLUSH_INTERVAL = 0
+
 QUOTAS = {
     "daily_jobs": 5,
     "filesize": "64M",
@@ -1,14 +1,20 @@
 # pylint: disable=C0114,C0116
 import gzip
+import hashlib
 import io
 from pathlib import Path
 
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile,
+    TemporaryUploadedFile,
+)
 
 from web_annotation.annotate_helpers import (
     columns_file_preview,
+    detect_compression,
     extract_head,
     extract_header,
+    save_uploaded_file,
 )
 
 
@@ -68,6 +74,33 @@ def test_extract_head_compressed(tmp_path: Path) -> None:
     ]
 
 
+def test_extract_head_reads_only_head(tmp_path: Path) -> None:
+    rows = "".join(f"{i},{i}\n" for i in range(100_000))
+    compressed = gzip.compress(f"col1,col2\n{rows}".encode())
+    file_path = tmp_path / "data.csv.gz"
+    # A truncated tail fails only a reader going past the head.
+    file_path.write_bytes(compressed[:len(compressed) // 2])
+
+    head = extract_head(str(file_path), ",", 2)
+
+    assert head == [
+        {"col1": "0", "col2": "0"},
+        {"col1": "1", "col2": "1"},
+    ]
+
+
+def test_columns_file_preview_reads_only_head() -> None:
+    rows = "".join(f"{i},{i}\n" for i in range(100_000))
+    compressed = gzip.compress(f"col1,col2\n{rows}".encode())
+    uploaded_file = SimpleUploadedFile(
+        "data.csv.gz", compressed[:len(compressed) // 2])
+
+    preview = columns_file_preview(uploaded_file, separator=None)
+
+    assert preview["separator"] == ","
+    assert len(preview["preview"]) == 4
+
+
 def test_columns_file_preview_uses_provided_separator() -> None:
     file_content = "col1\tcol2\n1\t2\n3\t4\n5\t6\n7\t8\n"
     uploaded_file = SimpleUploadedFile("data.tsv", file_content.encode())
@@ -117,3 +150,66 @@ def test_extract_header_compressed(tmp_path: Path) -> None:
     header = extract_header(str(file_path), ",")
 
     assert header == ["col1", "col2"]
+
+
+VCF_CONTENT = (
+    "##fileformat=VCFv4.1\n"
+    "#CHROM\tPOS\tID\tREF\tALT\n"
+    "chr1\t1\t.\tC\tA\n"
+    "\n"
+    "chr1\t2\t.\tC\tA\n"
+)
+
+
+def test_save_uploaded_file_plain(tmp_path: Path) -> None:
+    uploaded_file = SimpleUploadedFile("data.vcf", VCF_CONTENT.encode())
+    path = tmp_path / "input" / "data.vcf"
+
+    stats = save_uploaded_file(uploaded_file, path)
+
+    assert path.read_text() == VCF_CONTENT
+    assert stats.size == len(VCF_CONTENT)
+    assert stats.sha256 == hashlib.sha256(VCF_CONTENT.encode()).hexdigest()
+    assert not stats.compressed
+    assert stats.line_count == 5
+    assert stats.variant_count("vcf") == 2
+
+
+def test_save_uploaded_file_compressed(tmp_path: Path) -> None:
+    uploaded_file = _gzip_file("data.csv.gz", "col1,col2\n1,2\n3,4\n")
+    path = tmp_path / "data.csv.gz"
+
+    stats = save_uploaded_file(uploaded_file, path)
+
+    assert gzip.decompress(path.read_bytes()) == b"col1,col2\n1,2\n3,4\n"
+    assert stats.compressed
+    assert stats.compression == "gzip"
+    assert stats.line_count == 3
+    assert stats.variant_count("columns") == 2
+    assert stats.header(",") == ["col1", "col2"]
+    assert stats.head_lines == ["col1,col2", "1,2", "3,4"]
+
+
+def test_save_uploaded_file_moves_temporary_file(tmp_path: Path) -> None:
+    uploaded_file = TemporaryUploadedFile(
+        "data.vcf", "text/plain", len(VCF_CONTENT), "utf-8")
+    uploaded_file.write(VCF_CONTENT.encode())
+    uploaded_file.flush()
+    temporary_path = Path(uploaded_file.temporary_file_path())
+    path = tmp_path / "data.vcf"
+
+    stats = save_uploaded_file(uploaded_file, path)
+    uploaded_file.close()
+
+    assert not temporary_path.exists()
+    assert path.read_text() == VCF_CONTENT
+    assert stats.variant_count("vcf") == 2
+
+
+def test_detect_compression() -> None:
+    bgzip_block = (
+        b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+    )
+    assert detect_compression(bgzip_block) == "bgzip"
+    assert detect_compression(gzip.compress(b"data")) == "gzip"
+    assert detect_compression(b"##fileformat=VCFv4.1") == ""
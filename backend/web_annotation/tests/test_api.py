@@ -1,6 +1,7 @@
 # pylint: disable=C0116
 import datetime
 import gzip
+import json
 import pathlib
 import textwrap
 from typing import cast
@@ -15,8 +16,18 @@ from django.utils import timezone
 from pytest_mock import MockerFixture
 from web_annotation.annotation_base_view import AnnotationBaseView
 from web_annotation.executor import SequentialTaskExecutor
-from web_annotation.models import AnonymousJob, BaseUser, Job, User, UserWrapper
+from web_annotation.models import (
+    AnonymousJob,
+    BaseUser,
+    Job,
+    JobDetails,
+    User,
+    UserWrapper,
+)
 from web_annotation.pipeline_cache import LRUPipelineCache
+from web_annotation.single_allele_annotation import views as single_allele_views
+from web_annotation.single_allele_annotation.history import AlleleHistoryBuffer
+from web_annotation.single_allele_annotation.views import HISTOGRAM_INDEX
 
 
 @pytest.fixture(autouse=True)
@@ -163,6 +174,12 @@ def test_annotate_columns_job_details(user_client: Client) -> None:
     ]
     assert result["size"] == "0.1 KB"
     assert result["result_filename"] == "result-2.csv"
+    assert result["columns"] == ["chr", "pos_beg", "pos_end", "cnv"]
+
+    assert Job.objects.get(pk=int(job_id)).variant_count == 1
+    details = JobDetails.objects.get(job__pk=int(job_id))
+    assert details.compression == ""
+    assert details.head == result["head"]
 
 
 @pytest.mark.django_db
@@ -725,7 +742,7 @@ def test_single_annotation(admin_client: Client) -> None:
     assert annotators_data[0]["attributes"][0]["type"] == "float"
     assert annotators_data[0]["attributes"][0]["result"] == {
         "value": 0.1,
-        "histogram": "histograms/scores/pos1?score_id=pos1"
+        "histogram": "histograms/scores/pos1?score_id=pos1&version=0"
     }
     assert "test position score" in annotators_data[0]["attributes"][0]["help"]
     assert (
@@ -788,7 +805,7 @@ def test_single_annotation_unauthorized(anonymous_client: Client) -> None:
     assert annotators_data[0]["attributes"][0]["type"] == "float"
     assert annotators_data[0]["attributes"][0]["result"] == {
         "value": 0.1,
-        "histogram": "histograms/scores/pos1?score_id=pos1"
+        "histogram": "histograms/scores/pos1?score_id=pos1&version=0"
     }
     assert "test position score" in annotators_data[0]["attributes"][0]["help"]
     assert (
@@ -897,6 +914,112 @@ def test_histogram_view(admin_client: Client) -> None:
     }
 
 
+def test_histogram_view_builds_score_once(
+    admin_client: Client,
+    mocker: MockerFixture,
+) -> None:
+    HISTOGRAM_INDEX.clear()
+    build_spy = mocker.spy(single_allele_views, "build_score_from_resource")
+
+    for _ in range(2):
+        response = admin_client.get(
+            "/api/single_allele/histograms/scores/pos1?score_id=pos1")
+        assert response.status_code == 200
+
+    assert build_spy.call_count == 1
+    assert len(HISTOGRAM_INDEX) == 1
+
+
+def test_histogram_view_does_not_index_unknown_scores(
+    anonymous_client: Client,
+) -> None:
+    HISTOGRAM_INDEX.clear()
+
+    for score_id in ["missing1", "missing2"]:
+        response = anonymous_client.get(
+            f"/api/single_allele/histograms/scores/pos1?score_id={score_id}")
+        assert response.status_code == 404
+    response = anonymous_client.get(
+        "/api/single_allele/histograms/pipeline/test_pipeline?score_id=x")
+    assert response.status_code == 404
+
+    assert len(HISTOGRAM_INDEX) == 0
+
+
+def test_histogram_view_caching_headers(admin_client: Client) -> None:
+    url = "/api/single_allele/histograms/scores/pos1?score_id=pos1"
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert response["Cache-Control"] == "no-cache"
+
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    response = admin_client.get(
+        f"{url}&version=0", HTTP_ACCEPT_ENCODING="gzip, br")
+    assert response.status_code == 200
+    assert response["Content-Encoding"] == "gzip"
+    assert "immutable" in response["Cache-Control"]
+    assert json.loads(gzip.decompress(response.content))["bars"] == \
+        [0, 3, 2, 1, 4, 1, 0, 0, 1, 1]
+
+
+def test_histogram_view_if_none_match_list(admin_client: Client) -> None:
+    url = "/api/single_allele/histograms/scores/pos1?score_id=pos1"
+    etag = admin_client.get(url)["ETag"]
+
+    response = admin_client.get(
+        url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=f'"x{etag[1:]}')
+    assert response.status_code == 200
+
+
+def test_histogram_view_encodings_have_own_etags(
+    admin_client: Client,
+) -> None:
+    url = "/api/single_allele/histograms/scores/pos1?score_id=pos1"
+    identity = admin_client.get(url, HTTP_ACCEPT_ENCODING="identity")
+    gzipped = admin_client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+    assert "Content-Encoding" not in identity
+    assert gzipped["Content-Encoding"] == "gzip"
+    assert identity["ETag"] != gzipped["ETag"]
+
+    response = admin_client.get(
+        url, HTTP_ACCEPT_ENCODING="gzip",
+        HTTP_IF_NONE_MATCH=identity["ETag"],
+    )
+    assert response.status_code == 200
+    assert response["ETag"] == gzipped["ETag"]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, gzipped",
+    [
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, identity", False),
+        ("*;q=0.5", True),
+        ("gzip;q=0, *", False),
+        ("br, GZIP;q=0.8", True),
+        ("deflate", False),
+    ],
+)
+def test_histogram_view_accept_encoding_quality(
+    admin_client: Client, accept_encoding: str, gzipped: bool,
+) -> None:
+    response = admin_client.get(
+        "/api/single_allele/histograms/scores/pos1?score_id=pos1",
+        HTTP_ACCEPT_ENCODING=accept_encoding,
+    )
+
+    assert response.status_code == 200
+    assert ("Content-Encoding" in response) == gzipped
+
+
 def test_histogram_view_no_score(admin_client: Client) -> None:
     response = admin_client.get("/api/single_allele/histograms/scores/pos1")
     assert response.status_code == 400
@@ -1175,7 +1298,7 @@ def test_single_annotation_t4c8(admin_client: Client) -> None:
     assert gene_score_attributes[0]["result"] == {
         "value": {"t4": 10.123456789},
         "histogram":
-            "histograms/t4c8/gene_scores/t4c8_score?score_id=t4c8_score",
+            "histograms/t4c8/gene_scores/t4c8_score?score_id=t4c8_score&version=0",
     }
 
     response = admin_client.post(
@@ -1231,7 +1354,7 @@ def test_single_annotation_t4c8(admin_client: Client) -> None:
     assert gene_score_attributes[0]["result"] == {
         "value": {"c8": 20.0},
         "histogram":
-            "histograms/t4c8/gene_scores/t4c8_score?score_id=t4c8_score",
+            "histograms/t4c8/gene_scores/t4c8_score?score_id=t4c8_score&version=0",
     }
 
 
@@ -1353,6 +1476,45 @@ def test_user_delete_allele_query_from_history(admin_client: Client) -> None:
     assert response.json() == []
 
 
+def test_user_delete_allele_query_right_after_annotation(
+    admin_client: Client,
+    mocker: MockerFixture,
+) -> None:
+    history = AlleleHistoryBuffer(flush_interval=3600, max_pending=100)
+    mocker.patch.object(history, "_ensure_flusher")
+    mocker.patch.object(single_allele_views, "ALLELE_HISTORY", history)
+    request = {
+        "pipeline_id": "t4c8/t4c8_pipeline",
+        "annotatable": {
+            "chrom": "chr1", "pos": 53, "ref": "C", "alt": "A",
+        }
+    }
+
+    response = admin_client.post(
+        "/api/single_allele/annotate", request,
+        content_type="application/json",
+    )
+    assert response.status_code == 200, response.content
+    response = admin_client.get("/api/single_allele/history")
+    query_id = response.json()[0]["id"]
+
+    response = admin_client.post(
+        "/api/single_allele/annotate", request,
+        content_type="application/json",
+    )
+    assert response.status_code == 200, response.content
+    assert len(history) == 1
+
+    response = admin_client.delete(
+        f"/api/single_allele/history?id={query_id}")
+    assert response.status_code == 204
+
+    history.flush()
+    response = admin_client.get("/api/single_allele/history")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
 def test_genomes_view(admin_client: Client) -> None:
     response = admin_client.get("/api/jobs/genomes")
 
@@ -1,11 +1,17 @@
 # pylint: disable=W0621,C0114,C0116,W0212,W0613
+import pathlib
+import textwrap
 import pytest
 import threading
 import time
+from web_annotation.cancellation import JobTimedOut, check_cancelled
 from web_annotation.executor import (
+    ProcessPoolTaskExecutor,
     SequentialTaskExecutor,
     ThreadedTaskExecutor,
 )
+from web_annotation.models import AnonymousJob, Job
+from web_annotation.tasks import get_args_vcf, run_vcf_job
 from unittest.mock import MagicMock
 from web_annotation.executor import FakeFuture
 
@@ -609,7 +615,7 @@ def test_threaded_task_executor_rapid_submission() -> None:
     executor.shutdown()
 
 
-def test_threaded_task_executor_cancels_long_running_tasks() -> None:
+def test_threaded_task_executor_accounts_long_running_tasks() -> None:
     executor = ThreadedTaskExecutor(max_workers=4, job_timeout=0.5)
 
     def long_running_task() -> None:
@@ -624,9 +630,35 @@ def test_threaded_task_executor_cancels_long_running_tasks() -> None:
 
     executor.execute(long_running_task)
 
-    assert executor.size() == 1
+    assert executor.size() == 2
+
+    executor.wait_all(timeout=10)
+    assert executor.size() == 0
+    executor.shutdown()
+
+
+@pytest.mark.django_db
+def test_threaded_task_executor_times_out_job() -> None:
+    executor = ThreadedTaskExecutor(max_workers=1, job_timeout=0.2)
+    job = Job(
+        owner_id=1,
+        input_path="input", config_path="config", result_path="result",
+    )
+    job.save()
 
+    def hanging_job() -> None:
+        while True:
+            check_cancelled()
+            time.sleep(0.05)
+
+    callback_failure = MagicMock()
+    executor.execute_job(
+        job, hanging_job, callback_failure=callback_failure)
     executor.wait_all(timeout=10)
+
+    assert executor.size() == 0
+    args, _ = callback_failure.call_args
+    assert isinstance(args[0], JobTimedOut)
     executor.shutdown()
 
 
@@ -701,3 +733,94 @@ def test_fake_future_cancel() -> None:
     future = FakeFuture("result")
     future.cancel()
     assert future.cancelled() is False
+
+
+def test_task_executor_execute_job_callback_start() -> None:
+    executor = SequentialTaskExecutor()
+    calls: list[str] = []
+
+    executor.execute_job(
+        MagicMock(),
+        lambda **kwargs: calls.append(f"run {kwargs['key']}"),
+        callback_start=lambda: calls.append("start"),
+        callback_success=lambda: calls.append("success"),
+        key="value",
+    )
+
+    assert calls == ["start", "run value", "success"]
+
+
+def test_process_pool_task_executor_execute_job(
+    tmp_path: pathlib.Path,
+) -> None:
+    input_path = tmp_path / "input.vcf"
+    input_path.write_text(textwrap.dedent("""
+        ##fileformat=VCFv4.1
+        ##contig=<ID=chr1>
+        #CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO
+        chr1	1	.	C	A	.	.	.
+    """).lstrip())
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("- position_score: scores/pos1\n")
+    output_path = tmp_path / "output.vcf"
+    job = Job(
+        input_path=str(input_path),
+        config_path=str(config_path),
+        result_path=str(output_path),
+    )
+
+    executor = ProcessPoolTaskExecutor(max_workers=1)
+    callback_start = MagicMock()
+    callback_success = MagicMock()
+    callback_failure = MagicMock()
+
+    executor.execute_job(
+        job,
+        run_vcf_job,
+        callback_start=callback_start,
+        callback_success=callback_success,
+        callback_failure=callback_failure,
+        **get_args_vcf(job, MagicMock(), str(tmp_path)),
+    )
+    executor.wait_all(timeout=120)
+    executor.shutdown()
+
+    callback_start.assert_called_once()
+    callback_success.assert_called_once()
+    callback_failure.assert_not_called()
+    assert "pos1" in output_path.read_text()
+
+
+@pytest.mark.django_db
+def test_threaded_task_executor_fair_share() -> None:
+    executor = ThreadedTaskExecutor(max_workers=1)
+    jobs = []
+    for owner in ["heavy", "heavy", "heavy", "light"]:
+        job = AnonymousJob(
+            owner=owner,
+            input_path="input", config_path="config", result_path="result",
+        )
+        job.save()
+        jobs.append(job)
+
+    release = threading.Event()
+    order: list[int] = []
+
+    def run(pk: int) -> None:
+        release.wait(timeout=10)
+        order.append(pk)
+
+    for job in jobs:
+        executor.execute_job(job, run, pk=job.pk)
+
+    assert executor.size() == 4
+    assert executor.queue_status(jobs[0]) is None
+    status = executor.queue_status(jobs[3])
+    assert status is not None
+    assert status.position == 1
+
+    release.set()
+    executor.wait_all(timeout=10)
+    executor.shutdown()
+
+    assert order == [jobs[0].pk, jobs[3].pk, jobs[1].pk, jobs[2].pk]
@@ -0,0 +1,260 @@
+# pylint: disable=W0621,C0114,C0116,W0212,W0613
+import pathlib
+import textwrap
+from datetime import timedelta
+
+import pytest
+import pytest_mock
+from gain.genomic_resources.repository import GenomicResourceRepo
+from django.core.files.base import ContentFile
+from django.test import Client
+from django.utils import timezone
+
+from web_annotation import tasks
+from web_annotation.executor import SequentialTaskExecutor
+from web_annotation.job_queue import (
+    DatabaseTaskExecutor,
+    claim_next_job,
+    enqueue_job,
+    recover_orphaned_jobs,
+    renew_lease,
+)
+from web_annotation.models import Job
+from web_annotation.worker import AnnotationWorker
+
+
+@pytest.fixture(autouse=True)
+def database_task_executor(
+    mocker: pytest_mock.MockerFixture,
+) -> None:
+    mocker.patch(
+        "web_annotation.annotation_base_view.AnnotationBaseView.JOB_EXECUTOR",
+        new_callable=DatabaseTaskExecutor,
+    )
+
+
+@pytest.fixture
+def worker(test_grr: GenomicResourceRepo) -> AnnotationWorker:
+    return AnnotationWorker(
+        test_grr,
+        lease_seconds=60,
+        max_attempts=2,
+        poll_interval=0.1,
+        cache_size=4,
+        worker_id="test-worker",
+    )
+
+
+def create_job(**kwargs: object) -> Job:
+    job = Job(
+        owner_id=1,
+        input_path="input", config_path="config", result_path="result",
+        **kwargs,
+    )
+    job.save()
+    return job
+
+
+@pytest.mark.django_db
+def test_claim_next_job() -> None:
+    Job.objects.all().delete()
+    first = create_job()
+    second = create_job()
+    unqueued = create_job()
+    enqueue_job(first)
+    enqueue_job(second)
+
+    claimed = claim_next_job("worker-1", 60)
+    assert claimed is not None
+    assert claimed.pk == first.pk
+    assert claimed.status == Job.Status.IN_PROGRESS
+    assert claimed.worker_id == "worker-1"
+    assert claimed.attempts == 1
+    assert renew_lease(claimed, "worker-1", 60)
+    assert not renew_lease(claimed, "worker-2", 60)
+
+    claimed = claim_next_job("worker-2", 60)
+    assert claimed is not None
+    assert claimed.pk == second.pk
+
+    assert claim_next_job("worker-3", 60) is None
+    unqueued.refresh_from_db()
+    assert unqueued.status == Job.Status.WAITING
+
+
+@pytest.mark.django_db
+def test_recover_orphaned_jobs() -> None:
+    Job.objects.all().delete()
+    expired = timezone.now() - timedelta(seconds=1)
+    retried = create_job(
+        status=Job.Status.IN_PROGRESS, queued_at=timezone.now(),
+        worker_id="dead", lease_expires_at=expired, attempts=1,
+    )
+    exhausted = create_job(
+        status=Job.Status.IN_PROGRESS, queued_at=timezone.now(),
+        worker_id="dead", lease_expires_at=expired, attempts=2,
+    )
+    alive = create_job(
+        status=Job.Status.IN_PROGRESS, queued_at=timezone.now(),
+        worker_id="alive",
+        lease_expires_at=timezone.now() + timedelta(seconds=60),
+        attempts=1,
+    )
+
+    recovered = recover_orphaned_jobs(2, 60)
+    assert {job.pk for job in recovered} == {retried.pk, exhausted.pk}
+
+    retried.refresh_from_db()
+    assert retried.status == Job.Status.WAITING
+    assert retried.worker_id == ""
+    exhausted.refresh_from_db()
+    assert exhausted.status == Job.Status.FAILED
+    alive.refresh_from_db()
+    assert alive.status == Job.Status.IN_PROGRESS
+
+    claimed = claim_next_job("worker-1", 60)
+    assert claimed is not None
+    assert claimed.pk == retried.pk
+    assert claimed.attempts == 2
+
+
+@pytest.mark.django_db
+def test_database_executor_runs_other_tasks_in_process() -> None:
+    executor = DatabaseTaskExecutor(SequentialTaskExecutor())
+    done: list[str] = []
+
+    future = executor.execute(
+        lambda value: value * 2,
+        callback_success=lambda: done.append("success"),
+        value=21,
+    )
+
+    assert future.result() == 42
+    assert done == ["success"]
+
+
+@pytest.mark.django_db
+def test_annotate_vcf_queued_for_worker(
+    user_client: Client, worker: AnnotationWorker,
+) -> None:
+    vcf = textwrap.dedent("""
+        ##fileformat=VCFv4.1
+        ##contig=<ID=chr1>
+        #CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO
+        chr1	1	.	C	A	.	.	.
+    """).strip()
+
+    response = user_client.post(
+        "/api/jobs/annotate_vcf",
+        {
+            "pipeline_id": "pipeline/test_pipeline",
+            "data": ContentFile(vcf, "test_input.vcf"),
+        },
+    )
+    assert response.status_code == 200
+
+    job = Job.objects.get(pk=int(response.json()["job_id"]))
+    assert job.status == Job.Status.WAITING
+    assert job.queued_at is not None
+
+    worker.run(burst=True)
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.SUCCESS
+    assert job.worker_id == "test-worker"
+    assert job.lease_expires_at is None
+    assert pathlib.Path(job.result_path).exists()
+
+
+@pytest.mark.django_db
+def test_worker_fails_job_when_finishing_fails(
+    user_client: Client, worker: AnnotationWorker,
+    mocker: pytest_mock.MockerFixture,
+) -> None:
+    mocker.patch(
+        "web_annotation.tasks.finish_job_success",
+        side_effect=OSError("result is gone"),
+    )
+    response = user_client.post(
+        "/api/jobs/annotate_vcf",
+        {
+            "pipeline_id": "pipeline/test_pipeline",
+            "data": ContentFile(
+                "##fileformat=VCFv4.1\n"
+                "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+                "chr1\t1\t.\tC\tA\t.\t.\t.\n",
+                "test_input.vcf",
+            ),
+        },
+    )
+    assert response.status_code == 200
+
+    worker.run(burst=True)
+
+    job = Job.objects.get(pk=int(response.json()["job_id"]))
+    assert job.status == Job.Status.FAILED
+    assert job.error == "result is gone"
+
+
+@pytest.mark.django_db
+def test_worker_survives_job_errors(
+    worker: AnnotationWorker,
+    mocker: pytest_mock.MockerFixture,
+) -> None:
+    Job.objects.all().delete()
+    mocker.patch.object(worker, "get_pipeline")
+    mocker.patch(
+        "web_annotation.worker.run_job",
+        side_effect=RuntimeError("database is gone"),
+    )
+    job = create_job()
+    enqueue_job(job)
+
+    assert worker.run_once()
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.IN_PROGRESS
+    assert job.lease_expires_at is not None
+    assert not worker.run_once()
+
+
+@pytest.mark.django_db
+def test_worker_finishes_jobs_with_task_finalizers(
+    user_client: Client, worker: AnnotationWorker,
+    mocker: pytest_mock.MockerFixture,
+) -> None:
+    success_spy = mocker.spy(tasks, "finish_job_success")
+    failure_spy = mocker.spy(tasks, "finish_job_failure")
+    vcf = (
+        "##fileformat=VCFv4.1\n"
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        "chr1\t1\t.\tC\tA\t.\t.\t.\n"
+    )
+
+    def submit() -> Job:
+        response = user_client.post(
+            "/api/jobs/annotate_vcf",
+            {
+                "pipeline_id": "pipeline/test_pipeline",
+                "data": ContentFile(vcf, "test_input.vcf"),
+            },
+        )
+        assert response.status_code == 200
+        return Job.objects.get(pk=int(response.json()["job_id"]))
+
+    succeeded = submit()
+    worker.run(burst=True)
+    assert success_spy.call_count == 1
+    assert success_spy.call_args.args[0].pk == succeeded.pk
+    assert failure_spy.call_count == 0
+
+    mocker.patch.object(
+        tasks, "get_job_runner",
+        return_value=mocker.Mock(side_effect=RuntimeError("broken")),
+    )
+    failed = submit()
+    worker.run(burst=True)
+    assert failure_spy.call_count == 1
+    assert failure_spy.call_args.args[0].pk == failed.pk
+    failed.refresh_from_db()
+    assert failed.status == Job.Status.FAILED
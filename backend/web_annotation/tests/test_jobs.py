@@ -17,6 +17,12 @@ from django.test import Client
 from django.utils import timezone
 from pytest_mock import MockerFixture
 
+from web_annotation.cancellation import (
+    JobCancelled,
+    cancellation_scope,
+    check_cancelled,
+    job_cancellation_token,
+)
 from web_annotation.consumers import AnnotationStateConsumer
 from web_annotation.executor import SequentialTaskExecutor
 from web_annotation.pipeline_cache import LRUPipelineCache
@@ -135,6 +141,55 @@ def test_job_update_success() -> None:
     assert test_job.status == Job.Status.SUCCESS
 
 
+@pytest.mark.django_db
+def test_job_cancel() -> None:
+    test_job = Job(
+        owner_id=1,
+        input_path="input", config_path="config", result_path="result",
+        status=Job.Status.IN_PROGRESS,
+    )
+    test_job.save()
+    token = job_cancellation_token(test_job)
+
+    with cancellation_scope(token):
+        check_cancelled()
+
+    assert test_job.cancel()
+    assert test_job.status == Job.Status.CANCELLED
+    assert not test_job.cancel()
+
+    with cancellation_scope(token):
+        with pytest.raises(JobCancelled):
+            check_cancelled()
+    check_cancelled()
+
+
+@pytest.mark.django_db
+def test_cancel_job_endpoint(
+    user_client: Client, admin_client: Client,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    job = Job(
+        owner=user,
+        input_path="input", config_path="config", result_path="result",
+    )
+    job.save()
+
+    response = admin_client.post(f"/api/jobs/{job.pk}/cancel")
+    assert response.status_code == 403
+
+    response = user_client.post(f"/api/jobs/{job.pk}/cancel")
+    assert response.status_code == 200
+    job.refresh_from_db()
+    assert job.status == Job.Status.CANCELLED
+
+    response = user_client.post(f"/api/jobs/{job.pk}/cancel")
+    assert response.status_code == 400
+
+    response = user_client.get(f"/api/jobs/{job.pk}/cancel")
+    assert response.status_code == 405
+
+
 @pytest.mark.django_db
 def test_send_email(mail_client: MailhogClient) -> None:
     email_result = send_email(
@@ -237,6 +292,60 @@ def test_clean_old_jobs_removes_old_jobs(
     assert pathlib.Path(recent_job.result_path).exists()
 
 
+@pytest.mark.django_db
+def test_clean_old_jobs_releases_quota_reservations(
+    tmp_path: pathlib.Path,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    quota = user.get_quota()
+    quota.save()
+
+    user_input = tmp_path / "user-input.vcf"
+    user_input.write_text("mock vcf data")
+    user_config = tmp_path / "user-config.yaml"
+    user_config.write_text("mock annotation config")
+    job = Job(
+        input_path=user_input,
+        config_path=user_config,
+        result_path=tmp_path / "user-result.vcf",
+        owner=user,
+        created=timezone.now() - datetime.timedelta(days=10),
+        variant_count=2,
+        attributes_count=1,
+    )
+    job.save()
+    assert job.reserve_quota()
+    quota.refresh_from_db()
+    assert quota.reserved_jobs == 1
+
+    clean_old_jobs()
+
+    job.refresh_from_db()
+    assert not job.is_active
+    assert not job.quota_reserved
+    quota.refresh_from_db()
+    assert quota.reserved_jobs == 0
+    assert quota.reserved_variants == 0
+    assert quota.reserved_attributes == 0
+
+
+@pytest.mark.django_db
+def test_clean_old_jobs_drops_stale_quota_reservations() -> None:
+    user = User.objects.get(email="user@example.com")
+    quota = user.get_quota()
+    quota.reserved_jobs = 2
+    quota.reserved_variants = 10
+    quota.reserved_attributes = 4
+    quota.save()
+
+    clean_old_jobs()
+
+    quota.refresh_from_db()
+    assert quota.reserved_jobs == 0
+    assert quota.reserved_variants == 0
+    assert quota.reserved_attributes == 0
+
+
 @pytest.mark.django_db
 def test_annotate_vcf(
     user_client: Client, test_grr: GenomicResourceRepo,
@@ -271,6 +380,7 @@ def test_annotate_vcf(
     job = Job.objects.last()
 
     assert job is not None
+    assert job.variant_count == 1
 
     saved_input = pathlib.Path(job.input_path)
 
@@ -941,12 +1051,45 @@ def test_annotate_vcf_records_quota_usage_on_success(
     quota_mock = MagicMock()
     quota_mock.check_job_quota.return_value = True
     mocker.patch.object(User, "get_quota", return_value=quota_mock)
+    count_mock = mocker.patch(
+        "web_annotation.annotate_helpers.count_input_variants")
+
+    vcf = textwrap.dedent("""
+        ##fileformat=VCFv4.1
+        ##contig=<ID=chr1>
+        #CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+        chr1\t1\t.\tC\tA\t.\t.\t.
+    """).strip()
+
+    response = user_client.post(
+        "/api/jobs/annotate_vcf",
+        {
+            "pipeline_id": "pipeline/test_pipeline",
+            "data": ContentFile(vcf, "test_input.vcf"),
+        },
+    )
+
+    assert response.status_code == 200
+    quota_mock.job_complete.assert_called_once_with(1, mocker.ANY)
+    count_mock.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_annotate_vcf_reserves_quota_until_job_ends(
+    user_client: Client,
+    test_grr: GenomicResourceRepo,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    quota = user.get_quota()
+    quota.daily_variants = 1
+    quota.save()
 
     vcf = textwrap.dedent("""
         ##fileformat=VCFv4.1
         ##contig=<ID=chr1>
         #CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
         chr1\t1\t.\tC\tA\t.\t.\t.
+        chr1\t2\t.\tC\tA\t.\t.\t.
     """).strip()
 
     response = user_client.post(
@@ -956,9 +1099,64 @@ def test_annotate_vcf_records_quota_usage_on_success(
             "data": ContentFile(vcf, "test_input.vcf"),
         },
     )
+    assert response.status_code == 403
+    assert response.json()["reason"] == "Job quota exceeded!"
+    assert not Job.objects.filter(owner=user, variant_count=2).exists()
+
+    quota.daily_variants = 10
+    quota.save()
+    response = user_client.post(
+        "/api/jobs/annotate_vcf",
+        {
+            "pipeline_id": "pipeline/test_pipeline",
+            "data": ContentFile(vcf, "test_input.vcf"),
+        },
+    )
+    assert response.status_code == 200
+
+    job = Job.objects.get(pk=int(response.json()["job_id"]))
+    assert job.status == Job.Status.SUCCESS
+    assert not job.quota_reserved
+    quota.refresh_from_db()
+    assert quota.reserved_jobs == 0
+    assert quota.reserved_variants == 0
+    assert quota.daily_variants == 8
+
+
+@pytest.mark.django_db
+def test_annotate_vcf_does_not_reserve_superuser_quota(
+    admin_client: Client,
+    test_grr: GenomicResourceRepo,
+    mocker: MockerFixture,
+) -> None:
+    user = User.objects.get(email="admin@example.com")
+    quota = user.get_quota()
+    quota.daily_variants = 1
+    quota.save()
+    reserve_mock = mocker.patch.object(Job, "reserve_quota")
+
+    vcf = textwrap.dedent("""
+        ##fileformat=VCFv4.1
+        ##contig=<ID=chr1>
+        #CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+        chr1\t1\t.\tC\tA\t.\t.\t.
+        chr1\t2\t.\tC\tA\t.\t.\t.
+    """).strip()
+
+    response = admin_client.post(
+        "/api/jobs/annotate_vcf",
+        {
+            "pipeline_id": "pipeline/test_pipeline",
+            "data": ContentFile(vcf, "test_input.vcf"),
+        },
+    )
 
     assert response.status_code == 200
-    quota_mock.job_complete.assert_called_once()
+    reserve_mock.assert_not_called()
+    job = Job.objects.get(pk=int(response.json()["job_id"]))
+    assert job.status == Job.Status.SUCCESS
+    quota.refresh_from_db()
+    assert quota.reserved_jobs == 0
 
 
 @pytest.mark.django_db
@@ -1001,6 +1199,8 @@ def test_annotate_columns_records_quota_usage_on_success(
     quota_mock = MagicMock()
     quota_mock.check_job_quota.return_value = True
     mocker.patch.object(User, "get_quota", return_value=quota_mock)
+    count_mock = mocker.patch(
+        "web_annotation.annotate_helpers.count_input_variants")
 
     file = textwrap.dedent("""
         chrom,pos,ref,alt
@@ -1021,7 +1221,8 @@ def test_annotate_columns_records_quota_usage_on_success(
     )
 
     assert response.status_code == 200
-    quota_mock.job_complete.assert_called_once()
+    quota_mock.job_complete.assert_called_once_with(1, mocker.ANY)
+    count_mock.assert_not_called()
 
 
 @pytest.mark.django_db
@@ -1783,6 +1984,26 @@ def test_annotate_columns_variant_quota(
     assert response.status_code == 413
 
 
+def test_annotate_columns_variant_quota_counts_all_lines(
+    user_client: Client,
+    settings: LazySettings,
+) -> None:
+    settings.QUOTAS["variant_count"] = 3
+
+    # Three variants, but blank and comment lines count towards the limit.
+    file = "chrom,pos,ref,alt\nchr1,1,A,T\n\n#note\nchr1,2,A,T\nchr1,3,A,T"
+
+    response = user_client.post("/api/jobs/annotate_columns", {
+        "pipeline_id": "pipeline/test_pipeline",
+        "data": ContentFile(file, "test_input.tsv"),
+        "col_chrom": "chrom",
+        "col_pos": "pos",
+        "col_ref": "ref",
+        "col_alt": "alt",
+    })
+    assert response.status_code == 413
+
+
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True)
 async def test_annotate_vcf_notifications(
@@ -88,6 +88,19 @@ def test_refreshdaily_does_not_reset_monthly_fields(
     assert user_quota.monthly_jobs == 0
 
 
+def test_refreshdaily_resets_in_batches(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    for index in range(4):
+        AnonymousUserQuota(ip=f"10.0.0.{index}", daily_jobs=0).save()
+
+    call_command("refreshdaily", "--batch-size", "2")
+
+    assert not AnonymousUserQuota.objects.exclude(
+        daily_jobs=anonymous_quota.get_daily_job_max()).exists()
+    assert AnonymousUserQuota.objects.filter(monthly_jobs=0).count() == 4
+
+
 # --- refreshmonthly command ---
 
 def test_refreshmonthly_resets_user_quota_monthly_fields(
@@ -7,14 +7,19 @@ from pytest_mock import MockerFixture
 from gain.annotation.annotatable import VCFAllele
 from gain.annotation.annotation_factory import load_pipeline_from_yaml
 from gain.annotation.annotation_pipeline import AnnotationPipeline
+from gain.annotation.score_annotator import PositionScoreAnnotator
 from gain.genomic_resources.repository import GenomicResourceRepo
 from web_annotation.executor import (
     SequentialTaskExecutor,
     ThreadedTaskExecutor,
 )
 from web_annotation.pipeline_cache import (
+    AnnotationResultCache,
+    LeasedPipeline,
     LRUPipelineCache,
     ThreadSafePipeline,
+    SharedAnnotator,
+    estimate_pipeline_size,
 )
 
 
@@ -188,3 +193,284 @@ def test_lru_pipeline_cache_callbacks(
 
     assert len(deleted_pipelines) == 1
     assert deleted_pipelines[0].pipeline_id == "pipeline1"
+
+
+def test_thread_safe_pipeline_replicas_run_concurrently(
+    sample_pipeline_factory: Callable[[], AnnotationPipeline],
+) -> None:
+    pipeline = ThreadSafePipeline(
+        sample_pipeline_factory(),
+        [sample_pipeline_factory(), sample_pipeline_factory()],
+    )
+    pipeline.open()
+    assert all(
+        replica._is_open  # pylint: disable=protected-access
+        for replica in pipeline.replicas
+    )
+
+    with pipeline.checkout() as first, pipeline.checkout() as second:
+        assert first is not second
+        assert pipeline.get_stats()["in_use"] == 2
+        result = pipeline.annotate(VCFAllele("chr1", 3, "A", "T"), {})
+        assert result == {"pos1": 0.1}
+
+    stats = pipeline.get_stats()
+    assert stats["replicas"] == 3
+    assert stats["in_use"] == 0
+    assert stats["calls"] == 3
+    assert stats["wait_time_max"] >= 0.0
+
+    pipeline.close()
+    assert not any(
+        replica._is_open  # pylint: disable=protected-access
+        for replica in pipeline.replicas
+    )
+
+
+def test_thread_safe_pipeline_close_waits_for_checked_out_replicas(
+    sample_pipeline_factory: Callable[[], AnnotationPipeline],
+) -> None:
+    pipeline = ThreadSafePipeline(
+        sample_pipeline_factory(), [sample_pipeline_factory()])
+    pipeline.open()
+
+    with pipeline.checkout() as replica:
+        pipeline.close()
+        idle = [
+            other for other in pipeline.replicas if other is not replica
+        ]
+        assert not idle[0]._is_open
+        assert replica._is_open
+        result = replica.annotate(VCFAllele("chr1", 3, "A", "T"), {})
+        assert result == {"pos1": 0.1}
+
+    assert not replica._is_open
+    with pytest.raises(ValueError):
+        pipeline.annotate(VCFAllele("chr1", 3, "A", "T"), {})
+
+
+def test_lru_pipeline_cache_replicas(
+    test_grr: GenomicResourceRepo,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 2, replicas=2)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    lru_cache.put_pipeline(
+        "pipeline2", "- position_score: scores/pos1", replicas=3)
+
+    assert len(lru_cache.get_pipeline("pipeline1").replicas) == 2
+    assert len(lru_cache.get_pipeline("pipeline2").replicas) == 3
+
+    stats = lru_cache.get_stats()
+    assert set(stats) == {"pipeline1", "pipeline2"}
+    assert stats["pipeline1"]["loaded"] is True
+    assert stats["pipeline2"]["replicas"] == 3
+
+
+def test_annotation_result_cache_evicts_least_recently_used() -> None:
+    cache = AnnotationResultCache(2)
+    cache.put(("p", 1, "a"), {"x": 1})
+    cache.put(("p", 1, "b"), {"x": 2})
+    assert cache.get(("p", 1, "a")) == {"x": 1}
+
+    cache.put(("p", 1, "c"), {"x": 3})
+
+    assert len(cache) == 2
+    assert cache.get(("p", 1, "b")) is None
+    assert cache.get(("p", 1, "a")) == {"x": 1}
+    assert cache.get(("p", 1, "c")) == {"x": 3}
+
+    cache.invalidate("p")
+    assert len(cache) == 0
+
+
+def test_lru_pipeline_cache_annotate_caches_results(
+    test_grr: GenomicResourceRepo,
+    mocker: MockerFixture,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 2, result_cache_size=10)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    pipeline = lru_cache.get_pipeline("pipeline1")
+    annotate_spy = mocker.spy(pipeline, "annotate")
+
+    allele = VCFAllele("chr1", 1, "C", "A")
+    first = lru_cache.annotate("pipeline1", pipeline, allele)
+    second = lru_cache.annotate(
+        "pipeline1", pipeline, VCFAllele("chr1", 1, "C", "A"))
+
+    assert first == second
+    assert annotate_spy.call_count == 1
+    assert lru_cache.results.hits == 1
+
+    lru_cache.put_pipeline(
+        "pipeline1", "- position_score: scores/pos1", force=True)
+    assert len(lru_cache.results) == 0
+    pipeline = lru_cache.get_pipeline("pipeline1")
+    assert lru_cache.annotate("pipeline1", pipeline, allele) == first
+    assert len(lru_cache.results) == 1
+
+
+def test_lru_pipeline_cache_annotate_keys_results_by_annotating_pipeline(
+    test_grr: GenomicResourceRepo,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 2, result_cache_size=10)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    old_pipeline = lru_cache.get_pipeline("pipeline1")
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos2")
+    new_pipeline = lru_cache.get_pipeline("pipeline1")
+    assert old_pipeline.config_hash != new_pipeline.config_hash
+
+    allele = VCFAllele("chr1", 1, "C", "A")
+    # An annotation still running with the replaced pipeline must not
+    # store its result under the new configuration.
+    old_result = lru_cache.annotate("pipeline1", old_pipeline, allele)
+    new_result = lru_cache.annotate("pipeline1", new_pipeline, allele)
+
+    assert old_result != new_result
+    assert lru_cache.results.hits == 0
+    assert lru_cache.annotate("pipeline1", new_pipeline, allele) \
+        == new_result
+    assert lru_cache.results.hits == 1
+
+
+def test_estimate_pipeline_size(
+    sample_pipeline_factory: Callable[[], AnnotationPipeline],
+) -> None:
+    # scores/pos1 has no tabix index and is loaded whole into memory
+    assert estimate_pipeline_size(sample_pipeline_factory()) == 165 * 4
+
+
+def test_lru_pipeline_cache_evicts_by_size(
+    test_grr: GenomicResourceRepo,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 16, max_bytes=1000)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    assert lru_cache.total_size() == 660
+
+    assert lru_cache.get_pipeline("pipeline1").exclusive_size == 660
+
+    lru_cache.put_pipeline("pipeline2", "- position_score: scores/pos2")
+    assert set(lru_cache._cache) == {"pipeline2"}
+    assert lru_cache.total_size() == 660
+    assert lru_cache.get_stats()["pipeline2"]["size"] == 660
+
+
+def test_lru_pipeline_cache_shares_annotators(
+    test_grr: GenomicResourceRepo,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 16)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    lru_cache.put_pipeline(
+        "pipeline2",
+        "- position_score: scores/pos1\n- position_score: scores/pos2",
+    )
+    pipeline1 = lru_cache.get_pipeline("pipeline1")
+    pipeline2 = lru_cache.get_pipeline("pipeline2")
+
+    shared1 = cast(SharedAnnotator, pipeline1.annotators[0])
+    shared2 = cast(SharedAnnotator, pipeline2.annotators[0])
+    assert isinstance(shared1, SharedAnnotator)
+    assert shared1.annotator is shared2.annotator
+    assert isinstance(shared1.annotator, PositionScoreAnnotator)
+    assert len(lru_cache._shared) == 2
+    # pos1 is accounted for by the first pipeline only
+    assert pipeline1.size == 165 * 4
+    assert pipeline2.size == 165 * 4
+    assert lru_cache.total_size() == 2 * 165 * 4
+    # Only pos2 is freed by closing the second pipeline
+    assert pipeline1.exclusive_size == 0
+    assert pipeline2.exclusive_size == 165 * 4
+
+    allele = VCFAllele("chr1", 11, "C", "A")
+    assert pipeline1.annotate(allele)["pos1"] == 0.5
+    assert pipeline2.annotate(allele)["pos1"] == 0.5
+
+    lru_cache.delete_pipeline("pipeline1")
+    assert shared2.annotator.is_open()
+    assert len(lru_cache._shared) == 2
+    # pos1 is now accounted for by the remaining pipeline
+    assert pipeline2.size == 2 * 165 * 4
+    assert lru_cache.total_size() == 2 * 165 * 4
+
+    lru_cache.delete_pipeline("pipeline2")
+    assert not shared2.annotator.is_open()
+    assert len(lru_cache._shared) == 0
+    assert lru_cache.total_size() == 0
+
+
+def test_lru_pipeline_cache_shares_annotators_per_replica(
+    test_grr: GenomicResourceRepo,
+) -> None:
+    lru_cache = LRUPipelineCache(test_grr, 16, replicas=2)
+    lru_cache._load_executor = cast(
+        ThreadedTaskExecutor,
+        SequentialTaskExecutor(),
+    )
+
+    lru_cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    lru_cache.put_pipeline("pipeline2", "- position_score: scores/pos1")
+    pipeline1 = lru_cache.get_pipeline("pipeline1")
+    pipeline2 = lru_cache.get_pipeline("pipeline2")
+
+    first, second = (
+        cast(SharedAnnotator, replica.annotators[0])
+        for replica in pipeline1.replicas
+    )
+    assert first.annotator is not second.annotator
+    assert cast(
+        SharedAnnotator, pipeline2.replicas[1].annotators[0],
+    ).annotator is second.annotator
+    assert len(lru_cache._shared) == 2
+
+    with pipeline1.checkout(), pipeline2.checkout():
+        assert pipeline1.annotate(
+            VCFAllele("chr1", 11, "C", "A"))["pos1"] == 0.5
+
+
+def test_thread_safe_pipeline_lease(
+    sample_pipeline_factory: Callable[[], AnnotationPipeline],
+) -> None:
+    pipeline = ThreadSafePipeline(sample_pipeline_factory())
+    pipeline.open()
+
+    with pipeline.lease() as leased:
+        replica = cast(LeasedPipeline, leased).pipeline
+        assert replica is not pipeline.pipeline
+        assert replica._is_open
+        leased.close()
+        assert replica._is_open
+        assert pipeline.get_stats()["job_replicas_leased"] == 1
+        result = leased.annotate(VCFAllele("chr1", 3, "A", "T"), {})
+        assert result["pos1"] == 0.1
+
+    assert pipeline.get_stats()["job_replicas_idle"] == 1
+    with pipeline.lease() as leased:
+        assert cast(LeasedPipeline, leased).pipeline is replica
+
+    pipeline.close()
+    assert not replica._is_open
+    with pytest.raises(ValueError):
+        with pipeline.lease():
+            pass
@@ -64,3 +64,30 @@ def test_create_pipeline_stores_in_cache(
         "attributes": [{"name": "position_1", "source": "pos1"}],
         "resource_id": "scores/pos1",
     }}]
+
+
+@pytest.mark.django_db
+def test_pipeline_cache_stats(
+    test_grr: GenomicResourceRepo,
+    admin_client: Client,
+    user_client: Client,
+    mocker: pytest_mock.MockerFixture,
+) -> None:
+    cache = LRUPipelineCache(test_grr, 16)
+    mocker.patch(
+        "web_annotation.pipelines"
+        ".views.PipelineCacheStats.lru_cache",
+        new=cache,
+    )
+    cache.put_pipeline("pipeline1", "- position_score: scores/pos1")
+    cache.get_pipeline("pipeline1")
+
+    response = user_client.get("/api/pipelines/cache")
+    assert response.status_code == 403
+
+    response = admin_client.get("/api/pipelines/cache")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["pipeline1"]["loaded"] is True
+    assert stats["pipeline1"]["replicas"] == 1
+    assert stats["pipeline1"]["calls"] == 0
@@ -1,7 +1,16 @@
 # pylint: disable=W0621,C0114,C0116,W0212,W0613
+from datetime import timedelta
+
 import pytest
+from django.utils import timezone
 
-from web_annotation.models import AnonymousUserQuota, User, UserQuota
+from web_annotation.models import (
+    AnonymousJob,
+    AnonymousUserQuota,
+    Job,
+    User,
+    UserQuota,
+)
 
 
 @pytest.fixture
@@ -263,6 +272,7 @@ def test_job_complete_does_not_consume_extras_when_monthly_covers(
 ) -> None:
     # daily exhausted, but monthly alone covers the amount — no extras needed
     anonymous_quota.daily_attributes = 0
+    anonymous_quota.save()
     before_extra = anonymous_quota.extra_attributes
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=5_000)
@@ -276,6 +286,7 @@ def test_job_complete_consumes_extras_when_both_periods_exhausted(
     anonymous_quota.daily_attributes = 0
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 20_000
+    anonymous_quota.save()
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=5_000)
 
@@ -289,6 +300,7 @@ def test_job_complete_consumes_extras_for_remainder_beyond_max_period(
     anonymous_quota.daily_attributes = 3
     anonymous_quota.monthly_attributes = 3
     anonymous_quota.extra_attributes = 20
+    anonymous_quota.save()
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=10)
 
@@ -305,6 +317,7 @@ def test_job_complete_zeros_all_extras_when_extra_exhausted(
     anonymous_quota.extra_attributes = 5_000
     anonymous_quota.extra_jobs = 50
     anonymous_quota.extra_variants = 500_000
+    anonymous_quota.save()
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=5_000)
 
@@ -320,6 +333,7 @@ def test_job_complete_zeros_all_extras_when_extra_overdrawn(
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 3_000
     anonymous_quota.extra_jobs = 50
+    anonymous_quota.save()
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=5_000)
 
@@ -334,6 +348,7 @@ def test_job_complete_does_not_zero_extras_when_partial_consumption(
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 10_000
     anonymous_quota.extra_jobs = 50
+    anonymous_quota.save()
 
     anonymous_quota.job_complete(variants_count=0, attributes_count=5_000)
 
@@ -352,6 +367,145 @@ def test_job_complete_persisted(anonymous_quota: AnonymousUserQuota) -> None:
         anonymous_quota.get_daily_attribute_max() - 2_000
 
 
+def test_job_complete_does_not_lose_concurrent_updates(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    stale = AnonymousUserQuota.objects.get(pk=anonymous_quota.pk)
+
+    anonymous_quota.job_complete(variants_count=100, attributes_count=0)
+    stale.job_complete(variants_count=100, attributes_count=0)
+
+    refreshed = AnonymousUserQuota.objects.get(pk=anonymous_quota.pk)
+    assert refreshed.daily_jobs == anonymous_quota.get_daily_job_max() - 2
+    assert refreshed.daily_variants \
+        == anonymous_quota.get_daily_variant_max() - 200
+    assert stale.daily_variants == refreshed.daily_variants
+
+
+def test_job_complete_resets_expired_period_first(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    day_start, _ = anonymous_quota.period_starts(timezone.now())
+    anonymous_quota.daily_variants = 0
+    anonymous_quota.monthly_variants = 500_000
+    anonymous_quota.last_daily_reset = day_start - timedelta(seconds=1)
+    anonymous_quota.save()
+
+    anonymous_quota.job_complete(variants_count=100, attributes_count=0)
+
+    assert anonymous_quota.daily_variants \
+        == anonymous_quota.get_daily_variant_max() - 100
+    assert anonymous_quota.monthly_variants == 500_000 - 100
+    assert anonymous_quota.last_daily_reset >= day_start
+    refreshed = AnonymousUserQuota.objects.get(pk=anonymous_quota.pk)
+    assert refreshed.daily_jobs == anonymous_quota.get_daily_job_max() - 1
+
+
+def test_reserve_job_holds_quota_until_released(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    assert anonymous_quota.reserve_job(
+        variants_count=60_000, attributes_count=10)
+    assert anonymous_quota.reserved_jobs == 1
+    assert anonymous_quota.reserved_variants == 60_000
+
+    assert not anonymous_quota.reserve_job(
+        variants_count=60_000, attributes_count=10)
+
+    anonymous_quota.release_job(variants_count=60_000, attributes_count=10)
+    assert anonymous_quota.reserved_jobs == 0
+    assert anonymous_quota.reserved_variants == 0
+    assert anonymous_quota.reserve_job(
+        variants_count=60_000, attributes_count=10)
+
+    refreshed = AnonymousUserQuota.objects.get(pk=anonymous_quota.pk)
+    assert refreshed.reserved_jobs == 1
+    assert refreshed.reserved_variants == 60_000
+    assert refreshed.reserved_attributes == 10
+
+
+def test_reserve_job_counts_reserved_jobs(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    anonymous_quota.daily_jobs = 1
+    anonymous_quota.save()
+
+    assert anonymous_quota.reserve_job(variants_count=1, attributes_count=1)
+    assert not anonymous_quota.reserve_job(
+        variants_count=1, attributes_count=1)
+
+
+def test_release_job_floors_at_zero(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    anonymous_quota.release_job(variants_count=5, attributes_count=5)
+
+    assert anonymous_quota.reserved_jobs == 0
+    assert anonymous_quota.reserved_variants == 0
+    assert anonymous_quota.reserved_attributes == 0
+
+
+def test_reconcile_reservations_recounts_unfinished_jobs(
+    user_quota: UserQuota,
+) -> None:
+    def reserving_job(**kwargs: object) -> Job:
+        return Job.objects.create(
+            input_path="input.vcf", config_path="config.yaml",
+            result_path="result.vcf", owner=user_quota.user,
+            quota_reserved=True, **kwargs,
+        )
+
+    running = reserving_job(
+        status=Job.Status.IN_PROGRESS, variant_count=5, attributes_count=2)
+    crashed = reserving_job(
+        status=Job.Status.FAILED, variant_count=7, attributes_count=3)
+    deactivated = reserving_job(
+        status=Job.Status.WAITING, is_active=False,
+        variant_count=11, attributes_count=4)
+    user_quota.reserved_jobs = 3
+    user_quota.reserved_variants = 23
+    user_quota.reserved_attributes = 9
+    user_quota.save()
+
+    assert UserQuota.reconcile_reservations() == 1
+
+    user_quota.refresh_from_db()
+    assert user_quota.reserved_jobs == 1
+    assert user_quota.reserved_variants == 5
+    assert user_quota.reserved_attributes == 2
+    assert Job.objects.get(pk=running.pk).quota_reserved
+    assert not Job.objects.get(pk=crashed.pk).quota_reserved
+    assert not Job.objects.get(pk=deactivated.pk).quota_reserved
+
+    assert UserQuota.reconcile_reservations() == 0
+
+
+def test_reconcile_reservations_matches_anonymous_jobs_by_ip(
+    anonymous_quota: AnonymousUserQuota,
+) -> None:
+    other_quota = AnonymousUserQuota(ip="10.0.0.1")
+    other_quota.reset_daily()
+    other_quota.reserved_jobs = 1
+    other_quota.reserved_variants = 3
+    other_quota.save()
+    AnonymousJob.objects.create(
+        input_path="input.vcf", config_path="config.yaml",
+        result_path="result.vcf", owner="anon_session",
+        ip=anonymous_quota.ip, variant_count=4, attributes_count=1,
+        quota_reserved=True,
+    )
+
+    assert AnonymousUserQuota.reconcile_reservations() == 2
+
+    anonymous_quota.refresh_from_db()
+    assert anonymous_quota.reserved_jobs == 1
+    assert anonymous_quota.reserved_variants == 4
+    assert anonymous_quota.reserved_attributes == 1
+    other_quota.refresh_from_db()
+    assert other_quota.reserved_jobs == 0
+    assert other_quota.reserved_variants == 0
+
+
 def test_single_allele_query_complete_decrements_allele_counts(
     anonymous_quota: AnonymousUserQuota,
 ) -> None:
@@ -393,6 +547,7 @@ def test_single_allele_query_complete_does_not_consume_extras_when_monthly_cover
     anonymous_quota: AnonymousUserQuota,
 ) -> None:
     anonymous_quota.daily_attributes = 0
+    anonymous_quota.save()
     before_extra = anonymous_quota.extra_attributes
 
     anonymous_quota.single_allele_query_complete(attributes_count=10)
@@ -406,6 +561,7 @@ def test_single_allele_query_complete_consumes_extras_when_both_periods_exhauste
     anonymous_quota.daily_attributes = 0
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 50
+    anonymous_quota.save()
 
     anonymous_quota.single_allele_query_complete(attributes_count=10)
 
@@ -419,6 +575,7 @@ def test_single_allele_query_complete_consumes_extras_for_remainder_beyond_max_p
     anonymous_quota.daily_attributes = 4
     anonymous_quota.monthly_attributes = 4
     anonymous_quota.extra_attributes = 20
+    anonymous_quota.save()
 
     anonymous_quota.single_allele_query_complete(attributes_count=10)
 
@@ -434,6 +591,7 @@ def test_single_allele_query_complete_zeros_all_extras_when_extra_exhausted(
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 10
     anonymous_quota.extra_allele_queries = 5
+    anonymous_quota.save()
 
     anonymous_quota.single_allele_query_complete(attributes_count=10)
 
@@ -448,6 +606,7 @@ def test_single_allele_query_complete_does_not_zero_extras_when_partial_consumpt
     anonymous_quota.monthly_attributes = 0
     anonymous_quota.extra_attributes = 50
     anonymous_quota.extra_allele_queries = 5
+    anonymous_quota.save()
 
     anonymous_quota.single_allele_query_complete(attributes_count=10)
 
@@ -605,6 +764,34 @@ def test_user_get_quota_returns_existing(user_quota: UserQuota) -> None:
     assert quota.pk == user_quota.pk
 
 
+def test_user_get_quota_resets_expired_day(user_quota: UserQuota) -> None:
+    user = User.objects.get(email="user@example.com")
+    user_quota.daily_jobs = 0
+    user_quota.last_daily_reset = timezone.now() - timedelta(days=1)
+    user_quota.save()
+
+    quota = user.get_quota()
+
+    assert quota.daily_jobs == quota.get_daily_job_max()
+    assert quota.last_daily_reset > user_quota.last_daily_reset
+    user_quota.refresh_from_db()
+    assert user_quota.daily_jobs == quota.get_daily_job_max()
+
+
+def test_user_get_quota_keeps_counts_within_period(
+    user_quota: UserQuota,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    user_quota.daily_jobs = 0
+    user_quota.monthly_jobs = 0
+    user_quota.save()
+
+    quota = user.get_quota()
+
+    assert quota.daily_jobs == 0
+    assert quota.monthly_jobs == 0
+
+
 def test_user_get_quota_does_not_duplicate(user_quota: UserQuota) -> None:
     user = User.objects.get(email="user@example.com")
 
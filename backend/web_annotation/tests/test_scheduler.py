@@ -0,0 +1,68 @@
+# pylint: disable=W0621,C0114,C0116,W0212,W0613
+from web_annotation.scheduler import (
+    HIGH_PRIORITY,
+    NORMAL_PRIORITY,
+    FairShareScheduler,
+    ScheduledJob,
+)
+
+
+def entry(
+    key: int, owner: str, submitted: float,
+    priority: int = NORMAL_PRIORITY,
+) -> ScheduledJob:
+    return ScheduledJob(key, owner, priority, submitted, lambda: None)
+
+
+def pop_keys(scheduler: FairShareScheduler) -> list[int]:
+    keys = []
+    while (next_entry := scheduler.pop_next()) is not None:
+        keys.append(next_entry.key)
+    return keys
+
+
+def test_fair_share_scheduler_interleaves_owners() -> None:
+    scheduler = FairShareScheduler()
+    for key in range(3):
+        scheduler.push(entry(key, "heavy", key))
+    scheduler.push(entry(10, "light", 5))
+
+    assert scheduler.position(10) == 2
+    assert pop_keys(scheduler) == [0, 10, 1, 2]
+    assert len(scheduler) == 0
+    assert scheduler.running_count() == 4
+
+
+def test_fair_share_scheduler_priority() -> None:
+    scheduler = FairShareScheduler()
+    scheduler.push(entry(0, "a", 0))
+    scheduler.push(entry(1, "b", 1))
+    scheduler.push(entry(2, "b", 2, priority=HIGH_PRIORITY))
+
+    assert scheduler.position(2) == 1
+    assert pop_keys(scheduler) == [2, 0, 1]
+
+
+def test_fair_share_scheduler_owner_cap() -> None:
+    scheduler = FairShareScheduler(max_running_per_owner=1)
+    scheduler.push(entry(0, "a", 0))
+    scheduler.push(entry(1, "a", 1))
+    scheduler.push(entry(2, "b", 2))
+
+    assert pop_keys(scheduler) == [0, 2]
+    assert len(scheduler) == 1
+    assert scheduler.position(1) == 1
+
+    scheduler.finished("a")
+    assert pop_keys(scheduler) == [1]
+    assert scheduler.position(1) is None
+
+
+def test_fair_share_scheduler_tracks_running_owners_only() -> None:
+    scheduler = FairShareScheduler(max_running_per_owner=1)
+    scheduler.push(entry(0, "a", 0))
+    scheduler.push(entry(1, "b", 1))
+
+    next_entry = scheduler.pop_next()
+    assert next_entry is not None and next_entry.key == 0
+    assert dict(scheduler._running) == {"a": 1}
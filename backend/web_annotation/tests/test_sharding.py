@@ -0,0 +1,157 @@
+# pylint: disable=W0621,C0114,C0116,W0212,W0613
+import gzip
+import pathlib
+import textwrap
+
+import pytest
+from gain.annotation.annotation_factory import load_pipeline_from_yaml
+from gain.genomic_resources.repository import GenomicResourceRepo
+from django.conf import LazySettings
+from pysam import tabix_compress
+
+from web_annotation.sharding import (
+    concat_columns,
+    concat_vcf,
+    index_vcf,
+    split_columns,
+    split_vcf,
+    vcf_regions,
+)
+from web_annotation.tasks import run_columns_job, run_vcf_job
+
+
+@pytest.fixture
+def input_vcf(tmp_path: pathlib.Path) -> str:
+    vcf = tmp_path / "input.vcf"
+    vcf.write_text(textwrap.dedent("""
+        ##fileformat=VCFv4.1
+        ##contig=<ID=chr1,length=30>
+        ##contig=<ID=chr2,length=30>
+        #CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO
+        chr1	1	.	C	A	.	.	.
+        chr1	9	.	CTT	A	.	.	.
+        chr1	11	.	C	A	.	.	.
+        chr1	15	.	C	A	.	.	.
+        chr2	8	.	C	A	.	.	.
+    """).lstrip())
+    compressed = tmp_path / "input.vcf.gz"
+    tabix_compress(str(vcf), str(compressed))
+    return str(compressed)
+
+
+def records(path: pathlib.Path) -> list[str]:
+    return [
+        line for line in path.read_text().splitlines()
+        if not line.startswith("#")
+    ]
+
+
+def test_split_and_concat_vcf(
+    input_vcf: str, tmp_path: pathlib.Path,
+) -> None:
+    index_path = index_vcf(input_vcf, tmp_path / "index")
+    assert index_path is not None
+
+    regions = vcf_regions(input_vcf, index_path, 10)
+    assert regions == [
+        ("chr1", 0, 10), ("chr1", 10, 20), ("chr1", 20, 30),
+        ("chr2", 0, 10), ("chr2", 10, 20), ("chr2", 20, 30),
+    ]
+
+    shards = split_vcf(input_vcf, index_path, regions, tmp_path / "shards")
+    assert [len(records(shard)) for shard in shards] == [2, 2, 1]
+
+    output = tmp_path / "output.vcf"
+    concat_vcf(shards, str(output))
+    assert [line.split("\t")[1] for line in records(output)] == \
+        ["1", "9", "11", "15", "8"]
+
+
+def test_index_vcf_not_compressed(tmp_path: pathlib.Path) -> None:
+    assert index_vcf(str(tmp_path / "input.vcf"), tmp_path) is None
+
+
+def test_run_vcf_job_sharded(
+    input_vcf: str, tmp_path: pathlib.Path,
+    test_grr: GenomicResourceRepo, settings: LazySettings,
+) -> None:
+    settings.ANNOTATION_SHARD_WORKERS = 2
+    settings.ANNOTATION_VCF_SHARD_REGION_SIZE = 10
+    pipeline = load_pipeline_from_yaml(
+        "- position_score: scores/pos1", test_grr)
+    output = tmp_path / "output.vcf"
+
+    run_vcf_job(
+        input_vcf, pipeline, str(output), {"work_dir": str(tmp_path)})
+
+    lines = records(output)
+    assert [line.split("\t")[1] for line in lines] == \
+        ["1", "9", "11", "15", "8"]
+    assert all("pos1=" in line for line in lines)
+    assert not list(tmp_path.glob("shards-*"))
+
+
+COLUMNS = textwrap.dedent("""
+    chrom\tpos\tref\talt
+    chr1\t1\tC\tA
+    chr1\t9\tC\tA
+    chr1\t11\tC\tA
+    chr1\t15\tC\tA
+    chr2\t8\tC\tA
+""").lstrip()
+
+
+@pytest.mark.parametrize("input_name", ["input.tsv", "input.tsv.gz"])
+def test_split_and_concat_columns(
+    input_name: str, tmp_path: pathlib.Path,
+) -> None:
+    input_path = tmp_path / input_name
+    if input_name.endswith(".gz"):
+        with gzip.open(input_path, "wt") as out:
+            out.write(COLUMNS)
+    else:
+        input_path.write_text(COLUMNS)
+
+    chunks = split_columns(str(input_path), 2, tmp_path / "chunks")
+    assert [chunk.suffix for chunk in chunks] == [".tsv"] * 3
+    assert [chunk.read_text().splitlines()[0] for chunk in chunks] == \
+        ["chrom\tpos\tref\talt"] * 3
+    assert [len(chunk.read_text().splitlines()) for chunk in chunks] == \
+        [3, 3, 2]
+
+    output = tmp_path / "output.tsv"
+    concat_columns(chunks, str(output))
+    assert output.read_text() == COLUMNS
+
+
+def test_run_columns_job_chunked(
+    tmp_path: pathlib.Path,
+    test_grr: GenomicResourceRepo, settings: LazySettings,
+) -> None:
+    settings.ANNOTATION_SHARD_WORKERS = 2
+    settings.ANNOTATION_COLUMNS_CHUNK_ROWS = 2
+    pipeline = load_pipeline_from_yaml(
+        "- position_score: scores/pos1", test_grr)
+    input_path = tmp_path / "input.tsv"
+    input_path.write_text(COLUMNS)
+    output = tmp_path / "output.tsv"
+
+    run_columns_job(
+        str(input_path), pipeline, str(output), {
+            "work_dir": str(tmp_path),
+            "columns_args": {
+                "col_chrom": "chrom",
+                "col_pos": "pos",
+                "col_ref": "ref",
+                "col_alt": "alt",
+            },
+            "input_separator": "\t",
+            "output_separator": "\t",
+        },
+    )
+
+    lines = output.read_text().splitlines()
+    assert lines[0].startswith("chrom\tpos\tref\talt\tpos1")
+    assert [line.split("\t")[1] for line in lines[1:]] == \
+        ["1", "9", "11", "15", "8"]
+    assert not list(tmp_path.glob("shards-*"))
@@ -6,13 +6,18 @@ from typing import Any
 from unittest.mock import MagicMock
 
 from pytest_mock import MockerFixture
+from django.conf import LazySettings
 from django.test import Client
 from django.utils import timezone
 
 from gain.annotation.annotation_config import AttributeInfo
+from gain.annotation.annotation_factory import load_pipeline_from_yaml
 from gain.genomic_resources.repository import GenomicResourceRepo
 from web_annotation.models import AlleleQuery, User
-from web_annotation.pipeline_cache import LRUPipelineCache
+from web_annotation.pipeline_cache import LRUPipelineCache, ThreadSafePipeline
+from web_annotation.single_allele_annotation.history import (
+    AlleleHistoryBuffer,
+)
 from web_annotation.single_allele_annotation.views import SingleAnnotation
 
 
@@ -20,6 +25,7 @@ class DummyResource:
     """Dummy genomic resource."""
     def __init__(self, resource_id: str) -> None:
         self.resource_id = resource_id
+        self.version = (0,)
 
     def get_type(self) -> str:
         return "gene_score"
@@ -53,7 +59,7 @@ class DummyPipeline:
         return {"test": 1}
 
 
-def test_build_attribute_description_with_histogram(
+def test_build_attribute_template_with_histogram(
     mocker: MockerFixture,
     test_grr: GenomicResourceRepo,
 ) -> None:
@@ -70,7 +76,6 @@ def test_build_attribute_description_with_histogram(
         description="desc",
     )
 
-    result = {"attr_name": 123}
     annotator = SimpleNamespace(resource_ids={"dummy_resource"})
 
     histogram_mock = mocker.patch(
@@ -83,26 +88,26 @@ def test_build_attribute_description_with_histogram(
         return_value="help",
     )
 
-    description = view._build_attribute_description(
-        result,
-        annotator,
-        attribute_info,
-    )
+    template = view._build_attribute_template(annotator, attribute_info)
 
     histogram_mock.assert_called_once_with(resource, "score_id")
     help_mock.assert_called_once_with(annotator, attribute_info)
+    assert template["result"]["value"] is None
+
+    description = view._fill_attribute_template(template, 123)
 
     assert description["name"] == "attr_name"
     assert description["description"] == "desc"
     assert description["help"] == "help"
     assert description["source"] == "score_id"
     assert description["type"] == "str"
-    expected_histogram = "histograms/dummy_resource?score_id=score_id"
+    expected_histogram = \
+        "histograms/dummy_resource?score_id=score_id&version=0"
     assert description["result"]["histogram"] == expected_histogram
     assert description["result"]["value"] == 123
 
 
-def test_build_attribute_description_stringifies_non_mapping_objects(
+def test_fill_attribute_template_stringifies_non_mapping_objects(
     mocker: MockerFixture,
 ) -> None:
     view = SingleAnnotation()
@@ -117,7 +122,6 @@ def test_build_attribute_description_stringifies_non_mapping_objects(
         _type="object",
     )
 
-    result = {"attr_name": 456}
     annotator = SimpleNamespace(resource_ids={"dummy_resource"})
 
     mocker.patch(
@@ -126,16 +130,32 @@ def test_build_attribute_description_stringifies_non_mapping_objects(
     )
     mocker.patch.object(view, "generate_annotator_help", return_value=None)
 
-    description = view._build_attribute_description(
-        result,
-        annotator,
-        attribute_info,
-    )
+    template = view._build_attribute_template(annotator, attribute_info)
+    description = view._fill_attribute_template(template, 456)
 
+    assert template["result"]["value"] is None
     assert description["result"]["histogram"] is None
     assert description["result"]["value"] == "456"
 
 
+def test_presentation_is_built_once_per_pipeline(
+    mocker: MockerFixture,
+    test_grr: GenomicResourceRepo,
+) -> None:
+    view = SingleAnnotation()
+    pipeline = ThreadSafePipeline(
+        load_pipeline_from_yaml("- position_score: scores/pos1", test_grr))
+    build_spy = mocker.spy(view, "_build_presentation")
+
+    first = view._build_annotators_data(pipeline, {"pos1": 1.0})
+    second = view._build_annotators_data(pipeline, {"pos1": 2.0})
+
+    assert build_spy.call_count == 1
+    assert first[0]["details"] == second[0]["details"]
+    assert first[0]["attributes"][0]["result"]["value"] == 1.0
+    assert second[0]["attributes"][0]["result"]["value"] == 2.0
+
+
 def test_use_of_thread_safe_pipelines(
     mocker: MockerFixture,
     test_grr: GenomicResourceRepo,
@@ -260,7 +280,7 @@ def test_single_annotation_quota_counts_only_non_internal_attributes(
     dummy_pipeline.annotators = [annotator]
 
     mocker.patch.object(
-        view, "_build_attribute_description", return_value={},
+        view, "_build_annotators_data", return_value=[],
     )
     mocker.patch.object(
         view, "get_pipeline", return_value=dummy_pipeline,
@@ -507,3 +527,127 @@ def test_annotation_does_not_create_duplicate_allele_query(
 
     assert AlleleQuery.objects.filter(
         allele="1:3 A>T", owner=user).count() == 1
+
+
+def test_allele_history_buffer_coalesces_queries() -> None:
+    user = User.objects.get(email="user@example.com")
+    old_time = timezone.now() - timedelta(days=1)
+    existing = AlleleQuery.objects.create(
+        allele="chr1:1 A>T", owner=user, note="keep", last_used=old_time)
+    history = AlleleHistoryBuffer(flush_interval=3600, max_pending=100)
+
+    history.record(user.pk, ["chr1:1 A>T", "chr1:2 C>G"])
+    history.record(user.pk, ["chr1:2 C>G"])
+    assert len(history) == 2
+    assert AlleleQuery.objects.filter(owner=user).count() == 1
+
+    history.flush()
+    assert len(history) == 0
+    assert AlleleQuery.objects.filter(owner=user).count() == 2
+    existing.refresh_from_db()
+    assert existing.note == "keep"
+    assert existing.last_used > old_time
+
+
+def test_allele_history_buffer_drops_unwritable_queries(
+    mocker: MockerFixture,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    history = AlleleHistoryBuffer(
+        flush_interval=3600, max_pending=100, max_attempts=2)
+
+    history.record(user.pk, ["chr1:1 A>T", "A" * 2000])
+    history.record(user.pk + 1000, ["chr1:2 C>G"])
+    assert len(history) == 2
+
+    bulk_create = mocker.patch.object(
+        AlleleQuery.objects, "bulk_create", side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        history.flush()
+    assert len(history) == 1
+    with pytest.raises(RuntimeError):
+        history.flush()
+    assert len(history) == 0
+
+    rows = bulk_create.call_args.args[0]
+    assert [(row.owner_id, row.allele) for row in rows] == [
+        (user.pk, "chr1:1 A>T"),
+    ]
+
+
+def test_batch_annotation_returns_results_in_order(
+    user_client: Client,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    quota = user.get_quota()
+    queries_before = quota.daily_allele_queries
+
+    response = user_client.post(
+        "/api/single_allele/annotate_batch",
+        {
+            "annotatables": [
+                {"chrom": "chr1", "pos": "4", "ref": "C", "alt": "CT"},
+                {"chrom": "chr1", "pos": "3"},
+                {"chrom": "chr1", "pos": "4", "ref": "C", "alt": "CT"},
+            ],
+            "pipeline_id": "t4c8/t4c8_pipeline",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["annotatable"]["type"] for result in results] == [
+        "SMALL_INSERTION", "POSITION", "SMALL_INSERTION",
+    ]
+    assert results[0]["annotators"] == results[2]["annotators"]
+
+    quota.refresh_from_db()
+    assert quota.daily_allele_queries == queries_before - 3
+    assert AlleleQuery.objects.filter(owner=user).count() == 2
+
+
+def test_batch_annotation_rejects_oversized_batches(
+    user_client: Client,
+    settings: LazySettings,
+) -> None:
+    settings.SINGLE_ALLELE_BATCH_SIZE = 1
+
+    response = user_client.post(
+        "/api/single_allele/annotate_batch",
+        {
+            "annotatables": [
+                {"chrom": "chr1", "pos": "3"},
+                {"chrom": "chr1", "pos": "4"},
+            ],
+            "pipeline_id": "t4c8/t4c8_pipeline",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+
+
+def test_batch_annotation_returns_403_when_quota_exceeded(
+    user_client: Client,
+) -> None:
+    user = User.objects.get(email="user@example.com")
+    quota = user.get_quota()
+    quota.daily_allele_queries = 1
+    quota.save()
+
+    response = user_client.post(
+        "/api/single_allele/annotate_batch",
+        {
+            "annotatables": [
+                {"chrom": "chr1", "pos": "3"},
+                {"chrom": "chr1", "pos": "4"},
+            ],
+            "pipeline_id": "t4c8/t4c8_pipeline",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 403
+    quota.refresh_from_db()
+    assert quota.daily_allele_queries == 1
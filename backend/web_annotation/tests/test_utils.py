@@ -1,11 +1,11 @@
 
 # pylint: disable=W0621,C0114,C0116,W0212,W0613
 from pathlib import Path
-from subprocess import CalledProcessError
 import textwrap
 import pytest
 from pytest_mock import MockerFixture
 
+from web_annotation.jobs.validate_vcf_file import VCFValidationError
 from web_annotation.utils import bytes_to_readable, convert_size, validate_vcf
 from web_annotation.utils import get_ip_from_request
 from web_annotation.utils import calculate_used_disk_space
@@ -64,7 +64,9 @@ def test_validate_vcf_file_valid(
     vcf_path = tmp_path / "valid.vcf"
     vcf_path.write_text(vcf)
 
-    assert validate_vcf(str(vcf_path), 1) is True
+    validation = validate_vcf(str(vcf_path), 1)
+    assert validation.valid is True
+    assert validation.variant_count == 1
 
 
 def test_validate_vcf_file_limit(
@@ -82,7 +84,9 @@ def test_validate_vcf_file_limit(
     vcf_path = tmp_path / "invalid.vcf"
     vcf_path.write_text(vcf)
 
-    assert validate_vcf(str(vcf_path), 2) is False
+    validation = validate_vcf(str(vcf_path), 2)
+    assert validation.valid is False
+    assert validation.variant_count == 2
 
 
 def test_validate_vcf_file_invalid_chromosome(
@@ -100,10 +104,10 @@ def test_validate_vcf_file_invalid_chromosome(
     vcf_path = tmp_path / "invalid.vcf"
     vcf_path.write_text(vcf)
 
-    with pytest.raises(CalledProcessError) as err:
+    with pytest.raises(VCFValidationError) as err:
         validate_vcf(str(vcf_path))
 
-    assert "1 Contig not defined in header" in str(err.value.stderr)
+    assert "contig chr2 not defined in header" in str(err.value)
 
 
 def test_validate_vcf_file_invalid_header(
@@ -120,10 +124,10 @@ def test_validate_vcf_file_invalid_header(
     vcf_path = tmp_path / "invalid.vcf"
     vcf_path.write_text(vcf)
 
-    with pytest.raises(CalledProcessError) as err:
+    with pytest.raises(VCFValidationError) as err:
         validate_vcf(str(vcf_path))
 
-    assert "does not have valid header" in str(err.value.stderr)
+    assert "does not have valid header" in str(err.value)
 
 
 @pytest.mark.parametrize(
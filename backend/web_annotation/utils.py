@@ -1,4 +1,3 @@
-import subprocess
 
 from functools import reduce
 from typing import Any
@@ -13,6 +12,10 @@ from django.utils.translation import gettext_lazy
 from django.views.decorators.debug import sensitive_variables
 from rest_framework.request import Request
 
+from web_annotation.jobs.validate_vcf_file import (
+    VCFValidation,
+    validate_vcf_file,
+)
 from web_annotation.models import (
     AccountConfirmationCode,
     BaseVerificationCode,
@@ -329,20 +332,10 @@ def get_ip_from_request(request: Request) -> str:
 def validate_vcf(
     file_path: str,
     limit: int | None = None,
-) -> bool:
-    """Check if a variants file is valid."""
-
-    args = [
-        "validate_vcf_file",
-        file_path,
-    ]
-    if limit is not None:
-        args.extend(["--limit", str(limit)])
-
-    proc = subprocess.run(
-        args,
-        check=True,
-        text=True,
-        capture_output=True,
-    )
-    return proc.stdout.strip() == "valid"
+) -> VCFValidation:
+    """
+    Check if a variants file is valid and count its variants.
+
+    Raises VCFValidationError for malformed files.
+    """
+    return validate_vcf_file(file_path, limit)
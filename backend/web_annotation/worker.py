@@ -0,0 +1,137 @@
+"""Worker running annotation jobs from the persistent job queue."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.db import close_old_connections, connection
+from gain.genomic_resources.repository import GenomicResourceRepo
+
+from web_annotation.job_queue import (
+    claim_next_job,
+    recover_orphaned_jobs,
+    release_lease,
+    renew_lease,
+)
+from web_annotation.models import BaseJob
+from web_annotation.pipeline_cache import LRUPipelineCache, ThreadSafePipeline
+from web_annotation.tasks import (
+    finish_job_failure,
+    notify_job_status,
+    run_job,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationWorker:
+    """Claims queued annotation jobs and runs them one at a time."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        grr: GenomicResourceRepo,
+        *,
+        lease_seconds: float,
+        max_attempts: int,
+        poll_interval: float,
+        cache_size: int,
+        worker_id: str | None = None,
+    ):
+        if worker_id is None:
+            worker_id = (
+                f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            )
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lru_cache = LRUPipelineCache(grr, cache_size)
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Stop the worker after the job it is currently running."""
+        self._stop.set()
+
+    def get_pipeline(self, job: BaseJob) -> ThreadSafePipeline:
+        """Get an opened pipeline for the configuration stored with a job."""
+        config = Path(job.config_path).read_text(encoding="utf-8")
+        digest = hashlib.sha256(config.encode("utf-8")).hexdigest()
+        pipeline_id = f"job-config-{digest}"
+        self.lru_cache.put_pipeline(pipeline_id, config)
+        try:
+            return self.lru_cache.get_pipeline(pipeline_id)
+        except Exception:
+            self.lru_cache.delete_pipeline(pipeline_id)
+            raise
+
+    def _heartbeat(self, job: BaseJob, done: threading.Event) -> None:
+        try:
+            while not done.wait(self.lease_seconds / 3):
+                if not renew_lease(job, self.worker_id, self.lease_seconds):
+                    logger.warning(
+                        "Worker %s lost its lease on job %s",
+                        self.worker_id, job.pk,
+                    )
+                    return
+        finally:
+            connection.close()
+
+    def run_once(self) -> bool:
+        """Run the next queued job. Returns False if the queue is empty."""
+        close_old_connections()
+        for job in recover_orphaned_jobs(
+                self.max_attempts, self.lease_seconds):
+            notify_job_status(job)
+
+        job = claim_next_job(self.worker_id, self.lease_seconds)
+        if job is None:
+            return False
+        logger.info("Worker %s claimed job %s", self.worker_id, job.pk)
+        notify_job_status(job)
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        start_time = time.time()
+        finished = False
+        try:
+            try:
+                pipeline = self.get_pipeline(job)
+            except Exception as exception:  # pylint: disable=broad-except
+                logger.exception("Could not load pipeline for job %s", job.pk)
+                finish_job_failure(job, {}, exception, start_time)
+            else:
+                run_job(job, pipeline)
+            finished = True
+        except Exception:  # pylint: disable=broad-except
+            # The lease is kept, so the job is recovered once it expires.
+            logger.exception(
+                "Worker %s could not finish job %s", self.worker_id, job.pk)
+        finally:
+            done.set()
+            heartbeat.join()
+            if finished:
+                release_lease(job, self.worker_id)
+        return True
+
+    def run(self, *, burst: bool = False) -> None:
+        """
+        Run queued jobs until stopped.
+
+        In burst mode the worker exits as soon as the queue is empty.
+        """
+        logger.info("Annotation worker %s started", self.worker_id)
+        while not self._stop.is_set():
+            if self.run_once():
+                continue
+            if burst:
+                break
+            self._stop.wait(self.poll_interval)
+        logger.info("Annotation worker %s stopped", self.worker_id)
@@ -29,6 +29,7 @@ export class Job {
       case 'in_progress': status = 'in progress'; break;
       case 'success': status = 'success'; break;
       case 'failed': status = 'failed'; break;
+      case 'cancelled': status = 'cancelled'; break;
     }
 
     return new Job(
@@ -45,7 +46,7 @@ export class Job {
   }
 }
 
-export type JobStatus = 'waiting' | 'in progress' | 'success' | 'failed';
+export type JobStatus = 'waiting' | 'in progress' | 'success' | 'failed' | 'cancelled';
 
 export function getStatusClassName(status: string): string {
   switch (status) {
@@ -53,6 +54,7 @@ export function getStatusClassName(status: string): string {
     case 'in progress': return 'in-progress-status';
     case 'success': return 'success-status';
     case 'failed': return 'fail-status';
+    case 'cancelled': return 'fail-status';
   }
   return '';
 }